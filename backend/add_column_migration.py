@@ -3,27 +3,52 @@ import sqlite3
 # Hardcoding DB name since it's the default in config.py and easy to target for migration
 DB_NAME = "anomalyse.db"
 
-def add_notification_column():
+# (column, DDL type, optional index name) added to `transactions` since the first release
+TRANSACTION_COLUMNS = [
+    ("notification_sent", "BOOLEAN DEFAULT 0", None),
+    ("model_version", "VARCHAR(64)", "ix_transactions_model_version"),
+    ("batch_id", "VARCHAR(64)", "ix_transactions_batch_id"),
+    ("explanation", "VARCHAR(2000)", None),
+    ("dedup_key", "VARCHAR(32)", None),  # unique index below; fill with `python dedup.py --backfill`
+]
+TRANSACTION_INDEXES = [
+    ("ix_transactions_user_id_timestamp", "user_id, timestamp"),
+]
+TRANSACTION_UNIQUE_INDEXES = [
+    ("ix_transactions_dedup_key", "dedup_key"),
+]
+
+def add_missing_columns():
     print(f"Connecting to {DB_NAME}...")
     try:
         conn = sqlite3.connect(DB_NAME)
         cursor = conn.cursor()
         
-        # Check if column exists
+        # Check which columns exist
         cursor.execute("PRAGMA table_info(transactions)")
         columns = [info[1] for info in cursor.fetchall()]
         
-        if 'notification_sent' not in columns:
-            print("Adding 'notification_sent' column to transactions table...")
-            cursor.execute("ALTER TABLE transactions ADD COLUMN notification_sent BOOLEAN DEFAULT 0")
-            conn.commit()
-            print("Column added successfully.")
-        else:
-            print("'notification_sent' column already exists.")
+        for name, ddl, index_name in TRANSACTION_COLUMNS:
+            if name not in columns:
+                print(f"Adding '{name}' column to transactions table...")
+                cursor.execute(f"ALTER TABLE transactions ADD COLUMN {name} {ddl}")
+            else:
+                print(f"'{name}' column already exists.")
+            if index_name:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON transactions ({name})")
+        for index_name, cols in TRANSACTION_INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON transactions ({cols})")
+        for index_name, cols in TRANSACTION_UNIQUE_INDEXES:
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON transactions ({cols})")
+        conn.commit()
+        print("Migration complete.")
             
         conn.close()
     except Exception as e:
         print(f"Migration failed: {e}")
 
+# Kept for existing callers
+add_notification_column = add_missing_columns
+
 if __name__ == "__main__":
-    add_notification_column()
+    add_missing_columns()
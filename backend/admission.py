@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import settings
+
+# Admission control for the scoring endpoints. A request holds one of
+# ADMISSION_MAX_CONCURRENT slots while it runs; each lane (endpoint class) also
+# has its own cap, so bulk uploads can never take every slot. Requests that find
+# no free slot wait in one short queue ordered by lane priority, which lets a
+# single /predict go ahead of uploads that arrived earlier. A request is shed at
+# once, with 503 and Retry-After, when the queue is full or when the estimated
+# wait (work queued ahead of it, from each lane's recent service times) exceeds
+# its lane's max wait; a request whose wait runs past that deadline is shed too.
+# Shedding early keeps the latency of admitted requests flat under overload.
+# State is per process, like the concurrency it protects.
+
+EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    def __init__(self, lane: str, reason: str, retry_after: float):
+        super().__init__(f"{lane}: {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class Lane:
+    name: str
+    priority: int  # lower is served first
+    max_concurrent: int
+    max_wait_sec: float
+    service_sec: float  # EWMA of recent service times, seeded with a guess
+    active: int = 0
+    admitted: int = 0
+    rejected: Dict[str, int] = field(default_factory=lambda: {"queue_full": 0, "wait_estimate": 0, "timeout": 0})
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    lane: Lane = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, lanes: List[Lane]):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.lanes = {lane.name: lane for lane in lanes}
+        for lane in lanes:
+            lane.max_concurrent = max(1, lane.max_concurrent)
+        self.active = 0
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _has_room(self, lane: Lane) -> bool:
+        return self.active < self.max_concurrent and lane.active < lane.max_concurrent
+
+    def estimated_wait(self, lane: Lane) -> float:
+        # Work queued ahead of a new request in this lane, drained by every slot it can use
+        ahead = sum(w.lane.service_sec for w in self._waiting if w.priority <= lane.priority)
+        if self._has_room(lane) and not ahead:
+            return 0.0
+        return (ahead + lane.service_sec) / min(self.max_concurrent, lane.max_concurrent)
+
+    def _reject(self, lane: Lane, reason: str, retry_after: float) -> Rejected:
+        lane.rejected[reason] += 1
+        return Rejected(lane.name, reason, max(1.0, retry_after))
+
+    async def acquire(self, name: str) -> None:
+        lane = self.lanes[name]
+        if self._has_room(lane):
+            # Waiters only remain queued while their own lane is full, so none of them could take this slot
+            self._start(lane)
+            return
+        if len(self._waiting) >= self.max_queue:
+            raise self._reject(lane, "queue_full", self.estimated_wait(lane))
+        estimate = self.estimated_wait(lane)
+        if estimate > lane.max_wait_sec:
+            raise self._reject(lane, "wait_estimate", estimate)
+        waiter = _Waiter(lane.priority, next(self._seq), lane, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=lane.max_wait_sec)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                return  # admitted in the same tick the deadline fired
+            self._waiting.remove(waiter)
+            raise self._reject(lane, "timeout", self.estimated_wait(lane))
+        except BaseException:
+            # Client went away: give the slot back if it was already handed over
+            if waiter.future.done():
+                self.release(name, None)
+            else:
+                self._waiting.remove(waiter)
+            raise
+
+    def _start(self, lane: Lane) -> None:
+        self.active += 1
+        lane.active += 1
+        lane.admitted += 1
+
+    def release(self, name: str, service_sec: Optional[float]) -> None:
+        lane = self.lanes[name]
+        self.active -= 1
+        lane.active -= 1
+        if service_sec is not None:
+            lane.service_sec += EWMA_ALPHA * (service_sec - lane.service_sec)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Hand free slots to the best-placed waiters whose lane still has room
+        self._waiting.sort()
+        i = 0
+        while i < len(self._waiting) and self.active < self.max_concurrent:
+            waiter = self._waiting[i]
+            if waiter.lane.active < waiter.lane.max_concurrent:
+                del self._waiting[i]
+                self._start(waiter.lane)
+                waiter.future.set_result(None)
+            else:
+                i += 1
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        await self.acquire(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(name, time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "active": self.active,
+            "queued": len(self._waiting),
+            "maxQueue": self.max_queue,
+            "lanes": {
+                lane.name: {
+                    "priority": lane.priority,
+                    "active": lane.active,
+                    "maxConcurrent": lane.max_concurrent,
+                    "queued": sum(1 for w in self._waiting if w.lane is lane),
+                    "admitted": lane.admitted,
+                    "rejected": dict(lane.rejected),
+                    "serviceSec": round(lane.service_sec, 4),
+                    "estimatedWaitSec": round(self.estimated_wait(lane), 4),
+                }
+                for lane in self.lanes.values()
+            },
+        }
+
+
+def retry_after_header(exc: Rejected) -> Dict[str, str]:
+    return {"Retry-After": str(int(math.ceil(exc.retry_after)))}
+
+
+def default_controller() -> AdmissionController:
+    cpus = os.cpu_count() or 1
+    total = settings.ADMISSION_MAX_CONCURRENT or 2 * cpus
+    return AdmissionController(
+        total,
+        settings.ADMISSION_MAX_QUEUE,
+        [
+            Lane("predict", 0, settings.ADMISSION_PREDICT_CONCURRENCY or total,
+                 settings.ADMISSION_PREDICT_MAX_WAIT_SEC, 0.05),
+            Lane("upload", 1, settings.ADMISSION_UPLOAD_CONCURRENCY or max(1, cpus // 2),
+                 settings.ADMISSION_UPLOAD_MAX_WAIT_SEC, 2.0),
+        ],
+    )
+
+
+controller = default_controller()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, delete, select, tuple_
+from sqlalchemy.orm import Session
+
+import heavy_hitters
+from config import settings
+from database import SessionLocal
+from models import Transaction
+
+# Cold storage: transactions older than the retention horizon live in
+# <ARCHIVE_DIR>/date=YYYY-MM-DD/part-*.parquet and are removed from the hot table.
+# Reads prune partitions by directory name before opening any file.
+
+PARTITION_PREFIX = "date="
+DEFAULT_CHUNK_ROWS = 20_000
+_COLUMNS = list(Transaction.__table__.columns)
+
+
+def archive_dir() -> Path:
+    return Path(settings.ARCHIVE_DIR)
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    fields = []
+    for col in _COLUMNS:
+        if isinstance(col.type, DateTime):
+            t = pa.timestamp("us")
+        elif isinstance(col.type, Boolean):
+            t = pa.bool_()
+        elif isinstance(col.type, Integer):
+            t = pa.int64()
+        elif isinstance(col.type, Float):
+            t = pa.float64()
+        else:
+            t = pa.string()
+        fields.append((col.name, t))
+    return pa.schema(fields)
+
+
+def _partition_date(path: Path) -> Optional[date]:
+    if not path.name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return date.fromisoformat(path.name[len(PARTITION_PREFIX):])
+    except ValueError:
+        return None
+
+
+def partitions(start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Path]:
+    root = archive_dir()
+    if not root.exists():
+        return []
+    out = []
+    for p in sorted(root.iterdir()):
+        d = _partition_date(p)
+        if d is None or not p.is_dir():
+            continue
+        if start is not None and d < start.date():
+            continue
+        if end is not None and d > end.date():
+            continue
+        out.append(p)
+    return out
+
+
+def _recover_pending(db: Session) -> None:
+    # A pending file is renamed into place only after its rows were deleted and
+    # committed. If the rows are still hot the run died before the commit.
+    import pyarrow.parquet as pq
+    for pending in archive_dir().glob(f"{PARTITION_PREFIX}*/*.parquet.pending"):
+        ids = pq.read_table(pending, columns=["id"]).column("id").to_pylist()
+        still_hot = db.scalar(select(Transaction.id).where(Transaction.id.in_(ids[:100])).limit(1))
+        if still_hot:
+            pending.unlink()
+        else:
+            os.replace(pending, pending.with_suffix(""))
+
+
+def archive_before(cutoff: datetime, chunk_rows: int = DEFAULT_CHUNK_ROWS, log=print) -> Dict[str, Any]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    root = archive_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    moved, files = 0, 0
+    with SessionLocal() as db:
+        _recover_pending(db)
+    after = None
+    while True:
+        with SessionLocal() as db:
+            q = select(*_COLUMNS).where(Transaction.timestamp < cutoff)
+            if after is not None:
+                q = q.where(tuple_(Transaction.timestamp, Transaction.id) > after)
+            rows = db.execute(q.order_by(Transaction.timestamp, Transaction.id).limit(chunk_rows)).all()
+            if not rows:
+                break
+            by_day: Dict[date, List[Any]] = {}
+            for r in rows:
+                by_day.setdefault(r.timestamp.date(), []).append(r)
+            pending: List[Path] = []
+            for day, day_rows in by_day.items():
+                part = root / f"{PARTITION_PREFIX}{day.isoformat()}"
+                part.mkdir(exist_ok=True)
+                cols = list(zip(*day_rows))
+                table = pa.Table.from_arrays(
+                    [pa.array(list(c), type=schema.field(i).type) for i, c in enumerate(cols)], schema=schema
+                )
+                path = part / f"part-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet.pending"
+                pq.write_table(table, path, compression="zstd")
+                pending.append(path)
+            db.execute(delete(Transaction).where(Transaction.id.in_([r.id for r in rows])))
+            db.commit()
+            for path in pending:
+                os.replace(path, path.with_suffix(""))
+        after = (rows[-1].timestamp, rows[-1].id)
+        moved += len(rows)
+        files += len(pending)
+        log(f"archived {len(rows)} rows into {len(pending)} partition file(s) (through {rows[-1].timestamp})")
+    if moved:
+        heavy_hitters.store.invalidate()  # the dashboard only counts the hot table
+    return {"cutoff": cutoff.isoformat(), "rowsArchived": moved, "filesWritten": files}
+
+
+def archive_old_transactions(retention_days: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+    days = settings.ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+    return archive_before(cutoff, **kwargs)
+
+
+def iter_archive_tables(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[Any]:
+    # Yields one pyarrow Table per archived file inside the pruned date range
+    import pyarrow.parquet as pq
+
+    filters = []
+    if start is not None:
+        filters.append(("timestamp", ">=", start))
+    if end is not None:
+        filters.append(("timestamp", "<", end))
+    if status:
+        filters.append(("status", "in", list(status)))
+    for part in partitions(start, end):
+        for path in sorted(part.glob("*.parquet")):
+            table = pq.read_table(path, columns=list(columns) if columns else None, filters=filters or None)
+            if table.num_rows:
+                yield table
+
+
+def read_archive_rows(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[tuple]:
+    for table in iter_archive_tables(start, end, status, columns):
+        cols = [table.column(i).to_pylist() for i in range(table.num_columns)]
+        yield from zip(*cols)
+
+
+def read_archive_records(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    for table in iter_archive_tables(start, end, status):
+        yield from table.to_pylist()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Move old transactions to date-partitioned Parquet files")
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help=f"Keep this many days hot (default: ARCHIVE_RETENTION_DAYS={settings.ARCHIVE_RETENTION_DAYS})")
+    parser.add_argument("--before", type=datetime.fromisoformat, help="Archive everything before this timestamp instead")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    if args.before:
+        stats = archive_before(args.before, chunk_rows=args.chunk_rows)
+    else:
+        stats = archive_old_transactions(args.retention_days, chunk_rows=args.chunk_rows)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import atexit
+import json
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import AuditLog
+
+# Buffered audit trail. Request handlers append to an in-memory list (a lock and a
+# dict, no I/O); one background thread writes the list with a multi-row INSERT
+# when it reaches AUDIT_FLUSH_ROWS or AUDIT_FLUSH_INTERVAL_SEC has passed, and on
+# shutdown. Timestamps are taken when the event is recorded and rows are inserted
+# in record order, so ids and timestamps keep the order the handlers saw.
+
+MAX_BUFFERED = 100_000  # beyond this, while the database is unreachable, the oldest events are dropped
+
+
+class AuditWriter:
+    def __init__(self, flush_rows: Optional[int] = None, flush_interval_sec: Optional[float] = None,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.flush_rows = flush_rows or settings.AUDIT_FLUSH_ROWS
+        self.flush_interval_sec = settings.AUDIT_FLUSH_INTERVAL_SEC if flush_interval_sec is None else flush_interval_sec
+        self.session_factory = session_factory
+        self._buffer: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time keeps insert order
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.stats = {"recorded": 0, "written": 0, "flushes": 0, "dropped": 0, "errors": 0}
+
+    def record(self, user_email: Optional[str], action: str, resource: str,
+               resource_id: Optional[str] = None, details: Any = None) -> None:
+        if details is not None and not isinstance(details, str):
+            details = json.dumps(details, default=str)
+        row = {
+            "timestamp": datetime.utcnow(), "user_email": user_email or "", "action": action,
+            "resource": resource, "resource_id": resource_id, "details": details,
+        }
+        with self._cond:
+            self._buffer.append(row)
+            self.stats["recorded"] += 1
+            if len(self._buffer) > MAX_BUFFERED:
+                del self._buffer[: len(self._buffer) - MAX_BUFFERED]
+                self.stats["dropped"] += 1
+            if len(self._buffer) >= self.flush_rows:
+                self._cond.notify()
+        if self._thread is None:
+            self.start()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout=10)
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.flush_rows:
+                    self._cond.wait(self.flush_interval_sec)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._cond:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                with self.session_factory() as db:
+                    db.execute(insert(AuditLog), rows)
+                    db.commit()
+            except Exception as e:
+                # Keep the events (ahead of anything recorded meanwhile) for the next attempt
+                with self._cond:
+                    self._buffer[:0] = rows
+                self.stats["errors"] += 1
+                print(f"Audit flush failed, {len(rows)} events kept: {e}")
+                return 0
+            self.stats["written"] += len(rows)
+            self.stats["flushes"] += 1
+            return len(rows)
+
+
+writer = AuditWriter()
+record = writer.record
+atexit.register(writer.stop)
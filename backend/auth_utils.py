@@ -1,7 +1,13 @@
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+import time
+from sqlalchemy import event, inspect
 from config import settings
+from models import User
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -21,4 +27,71 @@ def create_access_token(subject: str, expires_minutes: int = 60) -> str:
 
 
 def decode_token(token: str) -> dict:
-    return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
\ No newline at end of file
+    return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+
+
+class TTLCache:
+    # Bounded LRU map whose entries also carry an absolute expiry (epoch seconds).
+    # Dependencies declared with plain `def` run in the threadpool, hence the lock.
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, float(expires_at))
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+claims_cache = TTLCache(settings.AUTH_CACHE_MAXSIZE, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAXSIZE, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def snapshot_user(user: User) -> User:
+    # Detached copy that is safe to share across sessions and threads
+    return User(id=user.id, email=user.email, password_hash=user.password_hash, role=user.role)
+
+
+def invalidate_user(email: Optional[str]) -> None:
+    if email:
+        user_cache.invalidate(email)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_changed_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.email)
+    # An email change must also drop the entry cached under the old address
+    for old_email in inspect(target).attrs.email.history.deleted or ():
+        invalidate_user(old_email)
@@ -0,0 +1,142 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+import dedup
+import heavy_hitters
+from database import SessionLocal
+from models import Transaction, UploadBatch
+from model import registry
+from scoring import FLAGGED_STATUSES, flags_to_columns, risk_scores, rule_flags
+
+# Upload batches: every /upload stamps its rows with a batch id so one bad file can
+# be listed, re-scored or removed without touching the rest of the table. Deletes
+# run as short id-keyed chunks, each in its own transaction, so SQLite readers get
+# the lock between chunks instead of waiting for one table-wide DELETE.
+
+DEFAULT_DELETE_CHUNK = 2000
+
+
+def delete_transactions(
+    batch_id: Optional[str] = None,
+    chunk_rows: int = DEFAULT_DELETE_CHUNK,
+    pause_sec: float = 0.0,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    # batch_id=None deletes every transaction (the /transactions/clear path)
+    deleted = 0
+    while True:
+        with session_factory() as db:
+            q = select(Transaction.id)
+            if batch_id is not None:
+                q = q.where(Transaction.batch_id == batch_id)
+            ids = list(db.scalars(q.limit(chunk_rows)))
+            if not ids:
+                break
+            db.execute(delete(Transaction).where(Transaction.id.in_(ids)), execution_options={"synchronize_session": False})
+            db.commit()
+        deleted += len(ids)
+        if pause_sec:
+            time.sleep(pause_sec)
+    return deleted
+
+
+def delete_batch(batch_id: str, **kwargs) -> Optional[int]:
+    with SessionLocal() as db:
+        if db.get(UploadBatch, batch_id) is None and not db.scalar(
+            select(Transaction.id).where(Transaction.batch_id == batch_id).limit(1)
+        ):
+            return None
+    deleted = delete_transactions(batch_id, **kwargs)
+    with SessionLocal() as db:
+        db.execute(delete(UploadBatch).where(UploadBatch.id == batch_id))
+        db.commit()
+    dedup.index.reset()
+    heavy_hitters.store.invalidate()
+    return deleted
+
+
+def clear_all(**kwargs) -> int:
+    deleted = delete_transactions(None, **kwargs)
+    with SessionLocal() as db:
+        db.execute(delete(UploadBatch))
+        db.commit()
+    dedup.index.reset()
+    heavy_hitters.store.invalidate()
+    return deleted
+
+
+def list_batches(db: Session) -> List[Dict[str, Any]]:
+    flagged = func.sum(case((Transaction.status.in_(FLAGGED_STATUSES), 1), else_=0))
+    stats = {
+        r.batch_id: r
+        for r in db.execute(
+            select(
+                Transaction.batch_id,
+                func.count().label("rows"),
+                flagged.label("flagged"),
+                func.avg(Transaction.risk_score).label("avg_risk"),
+                func.min(Transaction.timestamp).label("first_ts"),
+                func.max(Transaction.timestamp).label("last_ts"),
+            )
+            .where(Transaction.batch_id.isnot(None))
+            .group_by(Transaction.batch_id)
+        )
+    }
+    out = []
+    for b in db.scalars(select(UploadBatch).order_by(UploadBatch.created_at.desc())):
+        s = stats.get(b.id)
+        out.append({
+            "id": b.id,
+            "filename": b.filename,
+            "uploadedBy": b.uploaded_by,
+            "createdAt": b.created_at.isoformat() if b.created_at else None,
+            "modelVersion": b.model_version,
+            "rows": int(s.rows) if s else 0,
+            "flagged": int(s.flagged or 0) if s else 0,
+            "avgRiskScore": round(float(s.avg_risk), 2) if s and s.avg_risk is not None else 0.0,
+            "firstTimestamp": s.first_ts.isoformat() if s and s.first_ts else None,
+            "lastTimestamp": s.last_ts.isoformat() if s and s.last_ts else None,
+        })
+    return out
+
+
+def rescore_batch(batch_id: str, model_path=registry.MODEL_PATH) -> Optional[Dict[str, Any]]:
+    # The batch is scored as one frame, the same context /upload gave it
+    import pandas as pd
+
+    pipeline = registry.load_pipeline(model_path)
+    version = registry.model_version(model_path)
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Transaction.id, Transaction.timestamp, Transaction.user_id, Transaction.amount,
+                   Transaction.city, Transaction.category, Transaction.dedup_key, Transaction.flag_type)
+            .where(Transaction.batch_id == batch_id)
+            .order_by(Transaction.timestamp, Transaction.id)
+        ).all()
+        if not rows:
+            return None
+        df = pd.DataFrame({
+            "Timestamp": [r.timestamp for r in rows],
+            "UserID": [r.user_id for r in rows],
+            "Amount": [r.amount for r in rows],
+            "City": [r.city for r in rows],
+            "Category": [r.category for r in rows],
+        })
+        risks, flags = risk_scores(pipeline, df), rule_flags(df)
+        updates = [
+            {"id": r.id, "risk_score": int(risk), "model_version": version, "explanation": None,
+             **dedup.rescored_columns(flags_to_columns(f), r.dedup_key, r.flag_type)}
+            for r, risk, f in zip(rows, risks, flags)
+        ]
+        db.execute(update(Transaction), updates)
+        n_flagged = sum(1 for u in updates if u["status"] in FLAGGED_STATUSES)
+        db.execute(
+            update(UploadBatch).where(UploadBatch.id == batch_id)
+            .values(rows=len(updates), flagged=n_flagged, model_version=version)
+        )
+        db.commit()
+    heavy_hitters.store.invalidate()  # flagged counts may have moved
+    return {"batchId": batch_id, "rowsRescored": len(updates), "flagged": n_flagged, "modelVersion": version}
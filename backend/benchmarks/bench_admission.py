@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import httpx
+import numpy as np
+from sqlalchemy import delete
+
+import admission
+import main
+from database import SessionLocal
+from init_db import init_db
+from models import Transaction
+
+# /predict latency while bulk uploads saturate the worker, with the admission
+# controller as configured and with limits so large that nothing is ever queued
+# or shed. Runs the app in-process (ASGI transport, real threadpool and database)
+# against the trained model in model/model.pkl.
+
+
+def _upload_csv(prefix: str, rows: int, seed: int) -> str:
+    rng = np.random.default_rng(seed)
+    lines = ["Timestamp,UserID,Amount,City,Category"]
+    for i in range(rows):
+        lines.append(f"2025-02-01 {i % 24:02d}:{i % 60:02d}:{(i // 60) % 60:02d},{prefix}{rng.integers(0, 200)},"
+                     f"{rng.lognormal(5, 1):.2f},Mumbai,Food")
+    return "\n".join(lines) + "\n"
+
+
+async def run(label: str, duration: float, predict_rate: float, uploaders: int, upload_rows: int, prefix: str):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post("/auth/login", json={"email": "analyst@anomalyse.bank",
+                                                        "password": "password123"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        stop = time.monotonic() + duration
+        latencies, shed, uploads = [], 0, {"ok": 0, "shed": 0}
+
+        async def uploader(n):
+            seq = 0
+            while time.monotonic() < stop:
+                seq += 1
+                body = _upload_csv(f"{prefix}{n}-{seq}-", upload_rows, seed=n * 1000 + seq)
+                res = await client.post("/upload", headers=headers, files={"file": ("b.csv", body, "text/csv")})
+                uploads["ok" if res.status_code == 200 else "shed"] += 1
+                if res.status_code == 503:
+                    await asyncio.sleep(float(res.headers.get("Retry-After", 1)))
+
+        async def one_predict(i):
+            nonlocal shed
+            t0 = time.perf_counter()
+            res = await client.post("/predict", json={
+                "timestamp": "2025-02-01 10:00:00", "amount": 120.0, "user_id": f"{prefix}p{i % 50}",
+                "city": "Mumbai", "category": "Food",
+            }, timeout=60)
+            if res.status_code == 200:
+                latencies.append(time.perf_counter() - t0)
+            elif res.status_code == 503:
+                shed += 1
+
+        background = [asyncio.create_task(uploader(n)) for n in range(uploaders)]
+        predicts, i = [], 0
+        while time.monotonic() < stop:
+            predicts.append(asyncio.create_task(one_predict(i)))
+            i += 1
+            await asyncio.sleep(1.0 / predict_rate)
+        await asyncio.gather(*predicts, *background)
+    ms = np.array(latencies) * 1000.0
+    return {
+        "mode": label,
+        "predictSent": i,
+        "predictAdmitted": len(latencies),
+        "predictShed": shed,
+        "predictP50Ms": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+        "predictP99Ms": round(float(np.percentile(ms, 99)), 1) if len(ms) else None,
+        "uploadsDone": uploads["ok"],
+        "uploadsShed": uploads["shed"],
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Admitted /predict latency under upload overload")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--predict-rate", type=float, default=50.0, help="/predict calls started per second")
+    parser.add_argument("--uploaders", type=int, default=4, help="Clients uploading back to back")
+    parser.add_argument("--upload-rows", type=int, default=5000)
+    parser.add_argument("--json", type=Path, help="Write results here as well")
+    args = parser.parse_args()
+
+    init_db()
+    prefix = f"bench-adm-{uuid.uuid4().hex[:6]}-"
+    results = []
+    try:
+        unbounded = admission.AdmissionController(10_000, 10_000, [
+            admission.Lane("predict", 0, 10_000, 3600.0, 0.02), admission.Lane("upload", 1, 10_000, 3600.0, 1.0),
+        ])
+        for label, ctl in (("unbounded", unbounded), ("admission", admission.default_controller())):
+            admission.controller = ctl
+            results.append(asyncio.run(run(label, args.duration, args.predict_rate, args.uploaders,
+                                           args.upload_rows, prefix)))
+            print(json.dumps(results[-1]))
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id.like(prefix + "%")))
+            db.commit()
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+
+from bench_features import RAW_COLUMNS, synthetic
+from model.feature_pipeline import INGEST_DTYPES, MODEL_BACKENDS, train_and_export
+
+# Classifier backends side by side, each trained with its build_pipeline defaults
+# on the same split train_and_export uses. Reports the pickled model's size and
+# load time, single-row predict_proba latency (feature engineering included, as
+# /predict pays it), batch latency per row on a synthetic frame, and accuracy /
+# macro F1 on the held-out 20%.
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return float(np.median(samples))
+
+
+def measure(backend: str, input_csv: Path, batch: pd.DataFrame, repeat: int, workdir: Path) -> dict:
+    path = workdir / f"model_{backend}.pkl"
+    t0 = time.perf_counter()
+    info = train_and_export(input_csv, path, backend=backend)
+    fit_s = time.perf_counter() - t0
+
+    load_ms = _median_ms(lambda: joblib.load(path), max(3, repeat // 10))
+    pipe = joblib.load(path)
+
+    df = pd.read_csv(input_csv, dtype=INGEST_DTYPES)
+    X, y = df[RAW_COLUMNS], df['Fraud_Type']
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    pred = pipe.predict(X_test)
+
+    one = X_test.iloc[:1]
+    single_ms = _median_ms(lambda: pipe.predict_proba(one), repeat)
+    batch_ms = _median_ms(lambda: pipe.predict_proba(batch), 3)
+    return {
+        'backend': backend,
+        'model_bytes': path.stat().st_size,
+        'load_ms': round(load_ms, 2),
+        'fit_s': round(fit_s, 3),
+        'single_row_ms': round(single_ms, 3),
+        'batch_ms_per_row': round(batch_ms / len(batch), 5),
+        'accuracy': round(float(accuracy_score(y_test, pred)), 4),
+        'f1_macro': round(float(f1_score(y_test, pred, average='macro')), 4),
+        'samples_test': info['samples_test'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Size, latency and accuracy of the classifier backends")
+    parser.add_argument('--input', type=Path, default=BASE_DIR / 'dummy_train.csv')
+    parser.add_argument('--backends', nargs='+', choices=MODEL_BACKENDS, default=list(MODEL_BACKENDS))
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=50, help="Single-row predictions per backend")
+    parser.add_argument('--json', type=Path, help="Write results here as well")
+    args = parser.parse_args()
+
+    batch = synthetic(args.batch_rows)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            results.append(measure(backend, args.input, batch, args.repeat, Path(tmp)))
+            print(json.dumps(results[-1]))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
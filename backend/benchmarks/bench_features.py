@@ -0,0 +1,75 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+import pandas as pd
+
+from model.feature_pipeline import CITY_COORDS, FeatureEngineer
+
+RAW_COLUMNS = ['Timestamp', 'UserID', 'Amount', 'City', 'Category']
+
+
+def synthetic(n_rows: int, n_users: int = 5000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cities = list(CITY_COORDS) + ['New York', 'Paris']
+    categories = ['Food', 'Travel', 'Grocery', 'Electronics', 'Luxury', 'Utilities', 'Entertainment', 'Health']
+    start = np.datetime64('2025-01-01T00:00:00')
+    return pd.DataFrame({
+        'Timestamp': start + rng.integers(0, 90 * 86400, n_rows).astype('timedelta64[s]'),
+        'UserID': (1000 + rng.integers(0, n_users, n_rows)).astype(str),
+        'Amount': np.round(rng.lognormal(5, 1.2, n_rows), 2),
+        'City': rng.choice(cities, n_rows),
+        'Category': rng.choice(categories, n_rows),
+    })
+
+
+def datasets(sizes):
+    yield 'dummy_train.csv', pd.read_csv(BASE_DIR / 'dummy_train.csv')[RAW_COLUMNS]
+    yield 'live_test_data.csv', pd.read_csv(BASE_DIR / 'live_test_data.csv')[RAW_COLUMNS]
+    for n in sizes:
+        yield f'synthetic_{n}', synthetic(n)
+
+
+def measure(df: pd.DataFrame, windows=None) -> dict:
+    fe = FeatureEngineer() if windows is None else FeatureEngineer(velocity_windows=windows)
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fe.fit_transform(df)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows': len(df),
+        'seconds': round(elapsed, 3),
+        'peak_mb': round(peak / 1024 ** 2, 1),
+        'output_mb': round(out.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time and peak memory of FeatureEngineer.transform")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[100_000, 500_000])
+    parser.add_argument('--window-sweep', action='store_true',
+                        help="Time 1, 2, 4 and 8 velocity windows on the largest synthetic size")
+    args = parser.parse_args()
+    if args.window_sweep:
+        df = synthetic(max(args.sizes))
+        windows = ('30min', '5min', '1h', '24h', '1min', '15min', '6h', '7d')
+        for k in (1, 2, 4, 8):
+            print(json.dumps({'windows': list(windows[:k]), **measure(df, windows[:k])}))
+        return
+    for name, df in datasets(args.sizes):
+        print(json.dumps({'dataset': name, **measure(df)}))
+
+
+if __name__ == '__main__':
+    main()
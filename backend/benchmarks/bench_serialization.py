@@ -0,0 +1,98 @@
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import fastjson
+import main
+from models import Base, Transaction as TransactionModel
+
+# /transactions serialization, old path against new: ORM objects -> pydantic
+# Transaction -> response_model re-validation -> json.dumps, versus Core rows ->
+# dicts -> fastjson (orjson) with optional compression. Both run as real FastAPI
+# routes over an in-memory SQLite table, so the query cost is included and
+# reported separately.
+
+
+def _seed(n_rows: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    start = datetime(2025, 1, 1)
+    flags = json.dumps([{"type": "Velocity", "reason": "last gap 12s between consecutive transactions."}])
+    with engine.begin() as conn:
+        conn.execute(insert(TransactionModel), [{
+            "id": str(uuid.uuid4()), "timestamp": start + timedelta(seconds=37 * i), "amount": 10.0 + i % 997,
+            "user_id": f"user-{i % 5000}", "city": "Mumbai", "category": "Food", "risk_score": i % 100,
+            "status": "Suspicious" if i % 10 == 0 else "Safe", "flag_type": flags if i % 10 == 0 else None,
+            "flag_reason": None, "is_training_data": False, "notification_sent": False,
+        } for i in range(n_rows)])
+    return sessionmaker(bind=engine)
+
+
+def _app(Session) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/old", response_model=List[main.Transaction])
+    def old():
+        with Session() as db:
+            return [main._to_transaction(r) for r in db.scalars(select(TransactionModel)).all()]
+
+    @app.get("/new")
+    def new(request: Request):
+        with Session() as db:
+            return fastjson.response(request, [main._transaction_dict(r) for r in db.execute(select(*main.TRANSACTION_COLUMNS))])
+
+    @app.get("/query")
+    def query():
+        with Session() as db:
+            return {"rows": len(db.execute(select(*main.TRANSACTION_COLUMNS)).all())}
+
+    return app
+
+
+def _best(client: TestClient, path: str, encoding: str, repeat: int):
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = client.get(path, headers={"Accept-Encoding": encoding})
+        best = min(best, time.perf_counter() - t0)
+        size = res.num_bytes_downloaded  # bytes on the wire, before httpx decodes gzip/br
+    return best, size
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Serialization throughput of /transactions, old path against new")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"orjson: {fastjson.orjson is not None}, brotli: {fastjson.brotli is not None}")
+    encodings = ["identity", "gzip"] + (["br"] if fastjson.brotli is not None else [])
+    results = []
+    for n in args.rows:
+        client = TestClient(_app(_seed(n)))
+        query_sec, _ = _best(client, "/query", "identity", args.repeat)
+        runs = [("old", "identity")] + [("new", e) for e in encodings]
+        for path, encoding in runs:
+            sec, size = _best(client, f"/{path}", encoding, args.repeat)
+            row = {"rows": n, "path": path, "encoding": encoding, "seconds": round(sec, 3),
+                   "rowsPerSec": int(n / sec), "bytes": size, "querySeconds": round(query_sec, 3)}
+            results.append(row)
+            print(json.dumps(row))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
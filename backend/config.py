@@ -5,6 +5,49 @@ class Settings(BaseSettings):
     DATABASE_URL: Optional[str] = None
     JWT_SECRET: str = "super-secret-key-change-me"
     JWT_ALGORITHM: str = "HS256"
+    AUTH_CACHE_MAXSIZE: int = 4096
+    AUTH_CACHE_TTL_SECONDS: int = 300
+    # Set to false when `python init_db.py` runs once per deployment
+    DB_INIT_ON_STARTUP: bool = True
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_RETENTION_DAYS: int = 90
+    # Optional JSON file overriding rules.DEFAULT_RULES
+    RULES_PATH: Optional[str] = None
+    # Notification dispatcher: "log", "memory" or "smtp"
+    NOTIFY_TRANSPORT: str = "log"
+    NOTIFY_DEFAULT_RECIPIENT: str = "admin@anomalyse.bank"
+    NOTIFY_RATE_PER_SEC: float = 5.0
+    NOTIFY_BURST: int = 10
+    NOTIFY_DIGEST_WINDOW_SEC: float = 1.0
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025
+    SMTP_FROM: str = "alerts@anomalyse.bank"
+    # Audit log buffer: flushed at this many events or after this many seconds
+    AUDIT_FLUSH_ROWS: int = 500
+    AUDIT_FLUSH_INTERVAL_SEC: float = 1.0
+    # Feature contributions returned per explained row (largest first)
+    EXPLAIN_TOP_FEATURES: int = 5
+    # Feature drift: live sketch files, sketch size (memory ~3k values per feature),
+    # how often each process saves them and folds exited workers' files into one,
+    # and the KS distance reported as drifted
+    DRIFT_DIR: str = "drift"
+    DRIFT_SKETCH_K: int = 200
+    DRIFT_SAVE_INTERVAL_SEC: float = 10.0
+    DRIFT_COMPACT_INTERVAL_SEC: float = 300.0
+    DRIFT_KS_THRESHOLD: float = 0.2
+    # Dashboard heavy hitters: counters kept per dimension, and how often each
+    # process merges its newly ingested rows into the shared summaries
+    HEAVY_HITTERS_CAPACITY: int = 1000
+    HEAVY_HITTERS_FLUSH_INTERVAL_SEC: float = 2.0
+    # Admission control per process: scoring slots shared by /predict and /upload,
+    # each lane's own cap and longest acceptable queue wait, and the queue length.
+    # Scoring is CPU-bound, so 0 means two slots per CPU and uploads get half the CPUs.
+    ADMISSION_MAX_CONCURRENT: int = 0
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_PREDICT_CONCURRENCY: int = 0
+    ADMISSION_PREDICT_MAX_WAIT_SEC: float = 0.25
+    ADMISSION_UPLOAD_CONCURRENCY: int = 0
+    ADMISSION_UPLOAD_MAX_WAIT_SEC: float = 10.0
 
     def db_url(self) -> str:
         # Prefer MySQL if provided; fallback to local SQLite
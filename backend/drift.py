@@ -0,0 +1,278 @@
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from model import registry
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Feature drift monitoring. train_and_export stores one KLL sketch per engineered
+# numeric feature of the training rows next to the model (the reference, see
+# model.sketch.save_reference). Every process keeps its own live sketches, updated
+# with the features of each scored batch, and writes them to
+# <DRIFT_DIR>/live-<host>-<pid>.json every few seconds, stamped with the version of
+# the model that scored them. A process starts over when that version changes.
+# The /drift endpoint merges the live files of the current model version (so every
+# worker, and workers that have since been recycled, count) and compares each
+# feature to the reference.
+# Every DRIFT_COMPACT_INTERVAL_SEC a saving process folds the files of exited
+# processes on its host into live-compacted.json and deletes them, along with
+# exited processes' files from other model versions. Files of running processes,
+# and of other hosts, are never folded: their owners rewrite their whole state, so
+# folding them in would count rows twice. Compaction needs flock and signal-0
+# liveness checks, so it is POSIX only; elsewhere the files are left as written.
+# model.sketch (numpy) is imported on first use to keep API startup cheap.
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+COMPACTED_FILE = "live-compacted.json"
+LOCK_FILE = ".compact.lock"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge_into(merged: Dict[str, Any], features: Dict[str, Any]) -> None:
+    from model.sketch import KLLSketch
+    for name, raw in features.items():
+        sketch = KLLSketch.from_dict(raw)
+        merged[name] = merged[name].merge(sketch) if name in merged else sketch
+
+
+class DriftMonitor:
+    def __init__(self, directory: Optional[str] = None, k: Optional[int] = None,
+                 save_interval_sec: Optional[float] = None, compact_interval_sec: Optional[float] = None,
+                 model_path: Path = registry.MODEL_PATH):
+        self.directory = directory
+        self.k = k or settings.DRIFT_SKETCH_K
+        self.save_interval_sec = settings.DRIFT_SAVE_INTERVAL_SEC if save_interval_sec is None else save_interval_sec
+        self.compact_interval_sec = (settings.DRIFT_COMPACT_INTERVAL_SEC
+                                     if compact_interval_sec is None else compact_interval_sec)
+        self.model_path = model_path
+        self._lock = threading.Lock()
+        self._sketches: Dict[str, Any] = {}
+        self._version: Optional[str] = None
+        self._pid: Optional[int] = None
+        self._dirty = False
+        self._saved_at = 0.0
+        self._compacted_at = time.monotonic()
+
+    @property
+    def dir(self) -> Path:
+        return Path(self.directory or settings.DRIFT_DIR)
+
+    def _own_file(self) -> Path:
+        return self.dir / f"live-{socket.gethostname()}-{os.getpid()}.json"
+
+    def _check_fork(self) -> None:
+        # A forked worker starts with its own empty sketches, not the master's
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._sketches = {}
+            self._dirty = False
+
+    def update(self, features_df, model_version: Optional[str] = None) -> None:
+        import numpy as np
+        from model.sketch import KLLSketch
+        if not len(features_df):
+            return
+        with self._lock:
+            self._check_fork()
+            if model_version != self._version:
+                # A reloaded model: its features are compared to its own reference only
+                self._sketches = {}
+                self._version = model_version
+            for name in features_df.columns:
+                if features_df[name].dtype.kind not in "biuf":
+                    continue
+                sketch = self._sketches.get(name)
+                if sketch is None:
+                    sketch = self._sketches[name] = KLLSketch(self.k)
+                sketch.update(features_df[name].to_numpy(dtype=np.float64))
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= self.save_interval_sec
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._check_fork()
+            if not self._dirty:
+                return
+            data = {"pid": os.getpid(), "host": socket.gethostname(), "model_version": self._version,
+                    "updated_at": time.time(), "features": {name: s.to_dict() for name, s in self._sketches.items()}}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+            due = time.monotonic() - self._compacted_at >= self.compact_interval_sec
+        from model.sketch import write_json
+        try:
+            write_json(self._own_file(), data)
+        except OSError as e:
+            print(f"Drift sketches not saved: {e}")
+            return
+        if due:
+            self._compacted_at = time.monotonic()
+            try:
+                self.compact()
+            except Exception as e:
+                # Housekeeping only: never fail the request that triggered the save
+                print(f"Drift files not compacted: {e}")
+
+    def _live_files(self):
+        for path in sorted(self.dir.glob("live-*.json")) if self.dir.exists() else []:
+            try:
+                yield path, json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+    def compact(self) -> Dict[str, int]:
+        # Folds the files of exited processes on this host into COMPACTED_FILE (see top)
+        if fcntl is None:
+            return {"folded": 0, "removed": 0}
+        from model.sketch import write_json
+        version = registry.model_version(self.model_path)
+        host = socket.gethostname()
+        folded = removed = 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / LOCK_FILE, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {"folded": 0, "removed": 0}  # another process is compacting
+            compacted = self.dir / COMPACTED_FILE
+            merged: Dict[str, Any] = {}
+            dead: List[Path] = []
+            for path, data in self._live_files():
+                if path == compacted:
+                    if data.get("model_version") == version:
+                        _merge_into(merged, data.get("features", {}))
+                    continue
+                pid = data.get("pid")
+                if data.get("host", host) != host or not isinstance(pid, int) or _alive(pid):
+                    continue
+                if data.get("model_version") == version:
+                    _merge_into(merged, data.get("features", {}))
+                    folded += 1
+                else:
+                    removed += 1
+                dead.append(path)
+            if folded:
+                write_json(compacted, {"model_version": version, "updated_at": time.time(),
+                                       "features": {name: s.to_dict() for name, s in merged.items()}})
+            elif compacted.exists() and not merged:
+                compacted.unlink()  # written for an older model
+            for path in dead:
+                path.unlink(missing_ok=True)
+        return {"folded": folded, "removed": removed}
+
+    def merged(self, model_version: Optional[str] = None) -> Dict[str, Any]:
+        # Every process's last saved state for model_version (None: any version);
+        # this process's own file is replaced by its in-memory sketches, which may be newer
+        from model.sketch import KLLSketch
+        own = self._own_file()
+        merged: Dict[str, Any] = {}
+        files = 0
+        for path, data in self._live_files():
+            if path == own or (model_version is not None and data.get("model_version") != model_version):
+                continue
+            files += 1
+            _merge_into(merged, data.get("features", {}))
+        with self._lock:
+            self._check_fork()
+            mine = {}
+            if model_version is None or self._version == model_version:
+                mine = {name: KLLSketch.from_dict(s.to_dict()) for name, s in self._sketches.items()}
+        if mine:
+            files += 1
+        for name, sketch in mine.items():
+            merged[name] = merged[name].merge(sketch) if name in merged else sketch
+        return {"sources": files, "features": merged}
+
+    def reset(self) -> int:
+        with self._lock:
+            self._check_fork()
+            self._sketches = {}
+            self._dirty = False
+        removed = 0
+        for path in self.dir.glob("live-*.json") if self.dir.exists() else []:
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+def report(model_path: Path = registry.MODEL_PATH, live: Optional[DriftMonitor] = None) -> Optional[Dict[str, Any]]:
+    from model.sketch import ks_distance, load_reference
+    reference = load_reference(model_path)
+    if reference is None:
+        return None
+    version = registry.model_version(model_path)
+    current = (live or monitor).merged(version)
+    features: List[Dict[str, Any]] = []
+    for name, ref in reference["features"].items():
+        sketch = current["features"].get(name)
+        ks = ks_distance(ref, sketch) if sketch is not None else None
+        features.append({
+            "feature": name,
+            "ks": round(ks, 4) if ks is not None else None,
+            "liveCount": sketch.n if sketch is not None else 0,
+            "referenceQuantiles": _quantiles(ref),
+            "liveQuantiles": _quantiles(sketch),
+        })
+    features.sort(key=lambda f: -1.0 if f["ks"] is None else -f["ks"])
+    threshold = settings.DRIFT_KS_THRESHOLD
+    return {
+        "modelVersion": version,
+        "referenceRows": reference["rows"],
+        "liveSources": current["sources"],
+        "threshold": threshold,
+        "drifted": [f["feature"] for f in features if f["ks"] is not None and f["ks"] >= threshold],
+        "features": features,
+    }
+
+
+def _quantiles(sketch) -> Optional[Dict[str, float]]:
+    if sketch is None or not sketch.size:
+        return None
+    values = sketch.quantile(QUANTILES)
+    return {f"p{int(q * 100):02d}": round(float(v), 4) for q, v in zip(QUANTILES, values)}
+
+
+monitor = DriftMonitor()
+atexit.register(monitor.save)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Feature drift: print the report, or capture a reference for an existing model")
+    parser.add_argument("--model", type=Path, default=registry.MODEL_PATH)
+    parser.add_argument("--reference-from", type=Path, help="Training CSV to sketch as the reference for --model")
+    args = parser.parse_args(argv)
+    if args.reference_from:
+        import pandas as pd
+        from model.feature_pipeline import INGEST_DTYPES
+        from model.sketch import save_reference
+        pipeline = registry.load_pipeline(args.model)
+        df = pd.read_csv(args.reference_from, dtype=INGEST_DTYPES)
+        path = save_reference(pipeline.named_steps["features"].transform(df), args.model, settings.DRIFT_SKETCH_K)
+        print(f"Reference written to {path}")
+        return
+    print(json.dumps(report(args.model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+# In-process fan-out for the live dashboard feed (/transactions/stream). Each
+# connected client owns a bounded queue; a slow client loses its oldest events
+# rather than holding memory or blocking publishers. With no subscribers a
+# publish is a set-length check, so idle dashboards cost nothing.
+#
+# Events only reach clients connected to the same worker process.
+
+DEFAULT_QUEUE_SIZE = 256
+PING_INTERVAL_SEC = 15.0
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def _put(self, data: str) -> None:
+        while self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+    def offer(self, data: str) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(data)
+        else:
+            # Published from a worker thread (threadpool endpoint, background job)
+            self.loop.call_soon_threadsafe(self._put, data)
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+
+    def publish(self, event: str, payload: Dict[str, Any]) -> int:
+        if not self._subscribers:
+            return 0
+        # Serialise once; every client receives the same frame
+        data = f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        subs = list(self._subscribers)
+        for sub in subs:
+            sub.offer(data)
+        return len(subs)
+
+
+async def sse_stream(
+    broadcaster: Broadcaster,
+    ping_interval: float = PING_INTERVAL_SEC,
+    max_events: Optional[int] = None,
+) -> AsyncIterator[str]:
+    # Subscribes on first iteration so a client that never starts reading leaves
+    # nothing behind. Comment-only pings keep proxies from closing a silent stream.
+    sub = broadcaster.subscribe()
+    sent = 0
+    try:
+        yield "retry: 2000\n\n"
+        while max_events is None or sent < max_events:
+            try:
+                data = await asyncio.wait_for(sub.queue.get(), timeout=ping_interval)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield data
+            sent += 1
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,321 @@
+import argparse
+import csv
+import io
+import itertools
+import sys
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+import archive
+from database import engine
+from models import Transaction
+
+EXPORT_COLUMNS = [
+    "id", "timestamp", "amount", "user_id", "city", "category",
+    "risk_score", "status", "flag_type", "notification_sent",
+]
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("application/gzip", "csv.gz"),
+    "ndjson": ("application/x-ndjson", "ndjson"),  # one JSON object per row; compressed per Accept-Encoding
+}
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def _filters(start: Optional[datetime], end: Optional[datetime], status: Optional[Sequence[str]]) -> list:
+    where = []
+    if start is not None:
+        where.append(Transaction.timestamp >= start)
+    if end is not None:
+        where.append(Transaction.timestamp < end)
+    if status:
+        where.append(Transaction.status.in_(list(status)))
+    return where
+
+
+def _export_query(start: Optional[datetime], end: Optional[datetime], status: Optional[Sequence[str]], by_user: bool):
+    stmt = select(*[getattr(Transaction, c) for c in EXPORT_COLUMNS])
+    where = _filters(start, end, status)
+    if by_user:
+        # Feature engineering needs each user's whole history, contiguous and in time
+        # order: every row of each user with a matching row (see _feature_frames)
+        if where:
+            stmt = stmt.where(Transaction.user_id.in_(select(Transaction.user_id).where(*where).distinct()))
+        return stmt.order_by(Transaction.user_id, Transaction.timestamp, Transaction.id)
+    return stmt.where(*where).order_by(Transaction.timestamp, Transaction.id)
+
+
+def iter_row_batches(
+    conn: Connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    user_aligned: bool = False,
+) -> Iterator[List[tuple]]:
+    # Server-side cursor: only one batch of rows is materialised at a time
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        _export_query(start, end, status, user_aligned)
+    )
+    if not user_aligned:
+        for part in result.partitions(batch_size):
+            yield [tuple(r) for r in part]
+        return
+    # Hold back the trailing user of each batch so no user straddles two batches
+    user_idx = EXPORT_COLUMNS.index("user_id")
+    carry: List[tuple] = []
+    for part in result.partitions(batch_size):
+        rows = carry + [tuple(r) for r in part]
+        last_user = rows[-1][user_idx]
+        cut = len(rows)
+        while cut > 0 and rows[cut - 1][user_idx] == last_user:
+            cut -= 1
+        if cut == 0:
+            carry = rows
+            continue
+        carry = rows[cut:]
+        yield rows[:cut]
+    if carry:
+        yield carry
+
+
+def iter_archive_batches(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[List[tuple]]:
+    batch: List[tuple] = []
+    for row in archive.read_archive_rows(start, end, status, columns=EXPORT_COLUMNS):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _with_features(rows: List[tuple]):
+    import pandas as pd
+    from model.feature_pipeline import FeatureEngineer
+
+    df = pd.DataFrame.from_records(rows, columns=EXPORT_COLUMNS)
+    raw = pd.DataFrame({
+        "Timestamp": df["timestamp"],
+        "UserID": df["user_id"],
+        "Amount": df["amount"],
+        "City": df["city"],
+        "Category": df["category"],
+    })
+    fe = FeatureEngineer()
+    feats = fe.fit_transform(raw)[fe._numeric_features].drop(columns=["Amount"])
+    return pd.concat([df, feats], axis=1)
+
+
+def _feature_frames(
+    batches: Iterator[List[tuple]],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+):
+    # Features over each user's full history, then the export filters, so a row's
+    # features do not depend on which other rows the filter lets through
+    import pandas as pd
+
+    for rows in batches:
+        frame = _with_features(rows)
+        keep = pd.Series(True, index=frame.index)
+        if start is not None:
+            keep &= frame["timestamp"] >= start
+        if end is not None:
+            keep &= frame["timestamp"] < end
+        if status:
+            keep &= frame["status"].isin(list(status))
+        if keep.any():
+            yield frame[keep].reset_index(drop=True)
+
+
+def _arrow_schema(with_features: bool):
+    import pyarrow as pa
+    from model.feature_pipeline import FeatureEngineer
+
+    fields = [
+        ("id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("amount", pa.float64()),
+        ("user_id", pa.string()),
+        ("city", pa.string()),
+        ("category", pa.string()),
+        ("risk_score", pa.int64()),
+        ("status", pa.string()),
+        ("flag_type", pa.string()),
+        ("notification_sent", pa.bool_()),
+    ]
+    if with_features:
+        for name in FeatureEngineer()._numeric_features:
+            if name != "Amount":
+                fields.append((name, pa.int64() if name.startswith("Txn_Count") else pa.float64()))
+    return pa.schema(fields)
+
+
+class _ChunkSink:
+    # Minimal writable file object: pyarrow writes into it and we drain after each batch
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def _to_record_batch(rows, schema, with_features: bool):
+    import pyarrow as pa
+
+    if with_features:
+        return pa.RecordBatch.from_pandas(rows, schema=schema, preserve_index=False)
+    cols = list(zip(*rows)) if rows else [()] * len(EXPORT_COLUMNS)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(list(c), type=schema.field(i).type) for i, c in enumerate(cols)], schema=schema
+    )
+
+
+def _stream_arrow(batches: Iterator, with_features: bool, parquet: bool) -> Iterator[bytes]:
+    # batches: row lists, or the DataFrames of _feature_frames when with_features
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow is required for Arrow and Parquet exports")
+
+    schema = _arrow_schema(with_features)
+    sink = _ChunkSink()
+    if parquet:
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        write = lambda b: writer.write_table(pa.Table.from_batches([b]))  # one row group per batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    for rows in batches:
+        write(_to_record_batch(rows, schema, with_features))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def _stream_csv(batches: Iterator, with_features: bool) -> Iterator[bytes]:
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    header_written = False
+    for rows in batches:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        if with_features:
+            frame = rows
+            if not header_written:
+                w.writerow(frame.columns)
+            w.writerows(frame.itertuples(index=False, name=None))
+        else:
+            if not header_written:
+                w.writerow(EXPORT_COLUMNS)
+            w.writerows(rows)
+        header_written = True
+        chunk = gz.compress(buf.getvalue().encode("utf-8"))
+        if chunk:
+            yield chunk
+    if not header_written:
+        buf = io.StringIO()
+        csv.writer(buf).writerow(EXPORT_COLUMNS)
+        yield gz.compress(buf.getvalue().encode("utf-8"))
+    yield gz.flush()
+
+
+def _stream_ndjson(batches: Iterator, with_features: bool, encoding: Optional[str]) -> Iterator[bytes]:
+    from fastjson import Compressor, dumps
+
+    out = Compressor(encoding)
+    for rows in batches:
+        if with_features:
+            frame = rows
+            columns = list(frame.columns)
+            records = frame.itertuples(index=False, name=None)
+        else:
+            columns, records = EXPORT_COLUMNS, rows
+        chunk = out.compress(b"".join(dumps(dict(zip(columns, r))) + b"\n" for r in records))
+        if chunk:
+            yield chunk
+    yield out.flush()
+
+
+def stream_export(
+    fmt: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[Sequence[str]] = None,
+    with_features: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    include_archive: bool = True,
+    encoding: Optional[str] = None,
+) -> Iterator[bytes]:
+    # encoding (ndjson only): "gzip", "br" or None, the response's Content-Encoding
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    with engine.connect() as conn:
+        batches = iter_row_batches(conn, start, end, status, batch_size, user_aligned=with_features)
+        if with_features:
+            batches = _feature_frames(batches, start, end, status)
+        # Archived rows are all older than the hot table, so they go first. Feature
+        # exports stay hot-only: per-user context cannot span the two stores cheaply.
+        if include_archive and not with_features:
+            batches = itertools.chain(iter_archive_batches(start, end, status, batch_size), batches)
+        if fmt == "csv":
+            yield from _stream_csv(batches, with_features)
+        elif fmt == "ndjson":
+            yield from _stream_ndjson(batches, with_features, encoding)
+        else:
+            yield from _stream_arrow(batches, with_features, parquet=(fmt == "parquet"))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export scored transactions")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--out", help="Output file (default: stdout)")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--status", action="append")
+    parser.add_argument("--features", action="store_true", help="Include engineered features")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--hot-only", action="store_true", help="Skip archived Parquet partitions")
+    args = parser.parse_args(argv)
+
+    chunks = stream_export(args.format, args.start, args.end, args.status, args.features, args.batch_size,
+                           include_archive=not args.hot_only)
+    if args.out:
+        with open(Path(args.out), "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    else:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Fast path for large JSON responses. Endpoints that return many rows build plain
+# dicts from Core result rows and hand them to response() instead of returning
+# pydantic models: FastAPI then skips re-validating against response_model and
+# the body is encoded once, by orjson when it is installed (several times faster
+# than the stdlib encoder, which is the fallback). Bodies above
+# MIN_COMPRESS_BYTES are compressed with the best encoding the client accepts:
+# brotli if the optional brotli package is installed, else gzip.
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # higher levels cost far more CPU than they save bytes on JSON
+
+
+def _default(obj: Any) -> Any:
+    # Same output for both encoders: ISO timestamps, numpy scalars as numbers
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: Any) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class Compressor:
+    # Incremental encoder for streamed bodies; encoding=None passes data through
+    def __init__(self, encoding: Optional[str]):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data)
+        if self.encoding == "gzip":
+            return self._gz.compress(data)
+        return data
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        if self.encoding == "gzip":
+            return self._gz.flush()
+        return b""
+
+
+def encoding_headers(encoding: Optional[str]) -> Dict[str, str]:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    body = dumps(payload)
+    encoding = negotiate(request.headers.get("accept-encoding", "")) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        c = Compressor(encoding)
+        body = c.compress(body) + c.flush()
+    return Response(body, status_code=status_code, media_type="application/json", headers=encoding_headers(encoding))
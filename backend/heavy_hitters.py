@@ -0,0 +1,290 @@
+import atexit
+import heapq
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import SketchState, Transaction
+from scoring import FLAGGED_STATUSES
+
+# Dashboard heavy hitters: the most frequent users, cities and categories, overall
+# and among flagged rows, without a GROUP BY over the whole table per request.
+# Each dimension keeps a Space-Saving summary (Metwally et al. 2005) of at most
+# HEAVY_HITTERS_CAPACITY counters; an item's count overestimates its true count by
+# at most its recorded error, and any item with more than n/capacity rows is kept.
+# The summaries live in one sketch_states row shared by every worker and host.
+# Writers count their own rows exactly in memory and merge them into the stored
+# summaries every few seconds (optimistic update on the row version). Readers
+# cache the ranked summaries per version, so top-K is a slice of a sorted list.
+# Counters cannot be decremented: deletes, re-scoring and archiving invalidate
+# the row and the next read rebuilds it from the table. Rows committed while a
+# rebuild runs may be missed or counted twice; exact=True re-counts the listed items.
+
+STATE_NAME = "heavy_hitters"
+DIMENSIONS = {"user": Transaction.user_id, "city": Transaction.city, "category": Transaction.category}
+SUMMARIES = tuple(DIMENSIONS) + tuple(f"flagged_{d}" for d in DIMENSIONS)
+FLUSH_RETRIES = 5
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def _reheap(self) -> None:
+        self._heap = [(c, item) for item, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> int:
+        # The heap holds stale (count, item) pairs for items that were bumped or
+        # evicted since; skip them until the top matches a live counter
+        while self._heap:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                del self.counts[item]
+                del self.errors[item]
+                return count
+        self._reheap()
+        return self._pop_min()
+
+    def add(self, item: str, weight: int = 1) -> None:
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            # The newcomer takes over the smallest counter and inherits its count as error
+            floor = self._pop_min()
+            self.counts[item] = floor + weight
+            self.errors[item] = floor
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._reheap()
+
+    def update(self, counts: Mapping[str, int]) -> None:
+        for item, weight in counts.items():
+            self.add(item, weight)
+
+    def _floor(self) -> int:
+        # Upper bound on the count of any item this summary no longer tracks
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        floor_a, floor_b = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, floor_a) + other.counts.get(item, floor_b)
+            errors[item] = self.errors.get(item, floor_a) + other.errors.get(item, floor_b)
+        keep = heapq.nlargest(self.capacity, counts, key=counts.__getitem__)
+        self.counts = {item: counts[item] for item in keep}
+        self.errors = {item: errors[item] for item in keep}
+        self._reheap()
+        return self
+
+    def ranked(self) -> List[Tuple[str, int, int]]:
+        return sorted(((item, c, self.errors[item]) for item, c in self.counts.items()), key=lambda r: (-r[1], r[0]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SpaceSaving':
+        summary = cls(data.get("capacity", settings.HEAVY_HITTERS_CAPACITY))
+        summary.counts = {k: int(v) for k, v in data.get("counts", {}).items()}
+        summary.errors = {k: int(data.get("errors", {}).get(k, 0)) for k in summary.counts}
+        summary._reheap()
+        return summary
+
+
+def _key(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+class HeavyHitters:
+    def __init__(self, capacity: Optional[int] = None, flush_interval_sec: Optional[float] = None,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.capacity = capacity or settings.HEAVY_HITTERS_CAPACITY
+        self.flush_interval_sec = (settings.HEAVY_HITTERS_FLUSH_INTERVAL_SEC
+                                   if flush_interval_sec is None else flush_interval_sec)
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._pending: Dict[str, Counter] = {}
+        self._pending_since: Optional[datetime] = None
+        self._flushed_at = 0.0
+        self._cache: Optional[Tuple[int, Dict[str, List[Tuple[str, int, int]]]]] = None
+
+    def _check_fork(self) -> None:
+        # Rows counted by the master before a fork are its own to flush
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._pending_since = None
+            self._cache = None
+
+    def record(self, rows: Iterable[Tuple[Any, Any, Any, Any]]) -> None:
+        # rows: committed (user_id, city, category, status) tuples
+        with self._lock:
+            self._check_fork()
+            if self._pending_since is None:
+                self._pending_since = datetime.utcnow()
+            for user, city, category, status in rows:
+                values = {"user": _key(user), "city": _key(city), "category": _key(category)}
+                flagged = status in FLAGGED_STATUSES
+                for dim, value in values.items():
+                    self._pending.setdefault(dim, Counter())[value] += 1
+                    if flagged:
+                        self._pending.setdefault(f"flagged_{dim}", Counter())[value] += 1
+            due = time.monotonic() - self._flushed_at >= self.flush_interval_sec
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._check_fork()
+            pending, since = self._pending, self._pending_since
+            self._pending, self._pending_since = {}, None
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        for _ in range(FLUSH_RETRIES):
+            with self.session_factory() as db:
+                state = db.get(SketchState, STATE_NAME)
+                if state is None or state.data is None or since < state.rebuilt_at:
+                    # The (next) rebuild reads these rows from the table
+                    return
+                summaries = self._decode(state.data)
+                for name, counts in pending.items():
+                    summaries[name].update(counts)
+                result = db.execute(
+                    update(SketchState)
+                    .where(SketchState.name == STATE_NAME, SketchState.version == state.version)
+                    .values(data=self._encode(summaries), version=state.version + 1, updated_at=datetime.utcnow()),
+                    execution_options={"synchronize_session": False},
+                )
+                db.commit()
+                if result.rowcount:
+                    return
+        print(f"Heavy hitters: dropped {sum(sum(c.values()) for c in pending.values())} counts after repeated write conflicts")
+
+    def rebuild(self) -> None:
+        # Exact counts of the top `capacity` items per summary, straight from the table
+        started = datetime.utcnow()
+        summaries = {}
+        with self.session_factory() as db:
+            for name in SUMMARIES:
+                column = DIMENSIONS[name.removeprefix("flagged_")]
+                q = select(column, func.count()).group_by(column).order_by(func.count().desc()).limit(self.capacity)
+                if name.startswith("flagged_"):
+                    q = q.where(Transaction.status.in_(FLAGGED_STATUSES))
+                summary = SpaceSaving(self.capacity)
+                summary.update({_key(value): int(n) for value, n in db.execute(q)})
+                summaries[name] = summary
+            values = {"data": self._encode(summaries), "rebuilt_at": started, "updated_at": datetime.utcnow()}
+            result = db.execute(
+                update(SketchState).where(SketchState.name == STATE_NAME)
+                .values(version=SketchState.version + 1, **values),
+                execution_options={"synchronize_session": False},
+            )
+            if not result.rowcount:
+                db.add(SketchState(name=STATE_NAME, version=1, **values))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # another process created the row at the same moment; its counts are as fresh
+
+    def invalidate(self) -> None:
+        # Marks the summaries stale (the version bump also drops every reader's cache)
+        with self.session_factory() as db:
+            db.execute(update(SketchState).where(SketchState.name == STATE_NAME)
+                       .values(data=None, version=SketchState.version + 1, updated_at=datetime.utcnow()))
+            db.commit()
+
+    def _ranked(self) -> Dict[str, List[Tuple[str, int, int]]]:
+        with self.session_factory() as db:
+            row = db.execute(
+                select(SketchState.version, SketchState.data.is_(None)).where(SketchState.name == STATE_NAME)
+            ).first()
+        if row is None or row[1]:
+            self.rebuild()
+            return self._ranked()
+        cached = self._cache
+        if cached is not None and cached[0] == row[0]:
+            return cached[1]
+        with self.session_factory() as db:
+            state = db.get(SketchState, STATE_NAME)
+            if state is None or state.data is None:
+                return self._ranked()
+            version, summaries = state.version, self._decode(state.data)
+        ranked = {name: s.ranked() for name, s in summaries.items()}
+        self._cache = (version, ranked)
+        return ranked
+
+    def top(self, dimension: str, k: int = 5, flagged: bool = False, exact: bool = False) -> List[Dict[str, Any]]:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        self.flush()  # this process's latest rows are visible to its own reads
+        ranked = self._ranked()[f"flagged_{dimension}" if flagged else dimension]
+        items, runner_up = ranked[:k], (ranked[k][1] if len(ranked) > k else 0)
+        out = [
+            # guaranteed: even at its lowest possible count the item beats every item outside the top k
+            {"value": item, "count": count, "error": error, "guaranteed": count - error >= runner_up}
+            for item, count, error in items
+        ]
+        if exact and out:
+            column = DIMENSIONS[dimension]
+            q = select(column, func.count()).where(column.in_([r["value"] for r in out])).group_by(column)
+            if flagged:
+                q = q.where(Transaction.status.in_(FLAGGED_STATUSES))
+            with self.session_factory() as db:
+                actual = {_key(value): int(n) for value, n in db.execute(q)}
+            for r in out:
+                r["exactCount"] = actual.get(r["value"], 0)
+            out.sort(key=lambda r: (-r["exactCount"], r["value"]))
+        return out
+
+    def _decode(self, raw: Optional[str]) -> Dict[str, SpaceSaving]:
+        data = json.loads(raw) if raw else {}
+        return {name: SpaceSaving.from_dict(data[name]) if name in data else SpaceSaving(self.capacity)
+                for name in SUMMARIES}
+
+    @staticmethod
+    def _encode(summaries: Dict[str, SpaceSaving]) -> str:
+        return json.dumps({name: s.to_dict() for name, s in summaries.items()})
+
+
+store = HeavyHitters()
+atexit.register(store.flush)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Rebuild or print the dashboard heavy-hitter summaries")
+    parser.add_argument("--rebuild", action="store_true", help="Recount from the transactions table first")
+    parser.add_argument("--dimension", choices=list(DIMENSIONS), default="user")
+    parser.add_argument("--flagged", action="store_true")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--exact", action="store_true", help="Verify the listed counts against the table")
+    args = parser.parse_args(argv)
+    from init_db import init_db
+    init_db()
+    if args.rebuild:
+        store.rebuild()
+    print(json.dumps(store.top(args.dimension, args.k, flagged=args.flagged, exact=args.exact), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import dedup
+import drift
+import heavy_hitters
+from database import SessionLocal
+from models import IngestOffset, Transaction
+from model import registry
+from scoring import flags_to_columns, risk_scores, rule_flags
+
+# Long-running consumer for a transaction feed: a tailed file, a named pipe or
+# stdin, one NDJSON object or CSV row per line. A reader thread fills a bounded
+# queue (so a slow database pushes back on the reader), the main loop scores
+# micro-batches with each user's recent history as feature context, and every
+# batch is committed together with the source offset it reaches. A restart
+# continues from that offset, so no line is stored twice.
+
+DEFAULT_BATCH_ROWS = 500
+DEFAULT_MAX_WAIT_SEC = 0.5
+DEFAULT_QUEUE_BATCHES = 4
+DEFAULT_CONTEXT_ROWS = 50  # same history depth /predict uses
+DEFAULT_CONTEXT_USERS = 100_000
+POLL_INTERVAL_SEC = 0.2
+RAW_COLUMNS = ["Timestamp", "UserID", "Amount", "City", "Category"]
+# Accept the training-file headers as well as the API/DB field names
+_ALIASES = {
+    "timestamp": "Timestamp", "user_id": "UserID", "userid": "UserID", "amount": "Amount",
+    "city": "City", "category": "Category",
+}
+_EOF = object()
+
+
+def _normalise(record: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for key, value in record.items():
+        name = key if key in RAW_COLUMNS else _ALIASES.get(str(key).strip().lower())
+        if name:
+            out[name] = value
+    missing = [c for c in RAW_COLUMNS if c not in out]
+    if missing:
+        raise ValueError(f"missing fields {missing}")
+    return {
+        "Timestamp": datetime.fromisoformat(str(out["Timestamp"]).replace("Z", "+00:00")).replace(tzinfo=None),
+        "UserID": str(out["UserID"]),
+        "Amount": float(out["Amount"]),
+        "City": str(out["City"]),
+        "Category": str(out["Category"]),
+    }
+
+
+class _LineParser:
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+
+    def set_header(self, line: bytes) -> None:
+        self.header = next(csv.reader([line.decode("utf-8").strip()]))
+
+    def parse(self, line: bytes) -> Optional[Dict[str, Any]]:
+        text = line.decode("utf-8").strip()
+        if not text or text.startswith("#"):
+            return None
+        if self.fmt == "ndjson":
+            return _normalise(json.loads(text))
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = values
+            return None
+        return _normalise(dict(zip(self.header, values)))
+
+
+def _is_regular_file(path: Path) -> bool:
+    try:
+        return stat.S_ISREG(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class _Reader(threading.Thread):
+    # Produces (position after line, raw line) into a bounded queue. Regular files
+    # are positioned by byte offset; pipes and stdin by line count.
+    def __init__(self, source: str, stream: Optional[IO[bytes]], parser: _LineParser, out: "queue.Queue",
+                 start: int, follow: bool, stop: threading.Event, log: Callable[[str], None]):
+        super().__init__(daemon=True)
+        self.source, self.stream, self.parser, self.out = source, stream, parser, out
+        self.start_pos, self.follow, self.stop, self.log = start, follow, stop, log
+        self.error: Optional[BaseException] = None
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.out.put(item, timeout=POLL_INTERVAL_SEC)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self) -> None:
+        try:
+            if self.stream is None:
+                self._tail_file(Path(self.source))
+            else:
+                self._read_stream(self.stream)
+        except BaseException as e:  # surfaced by the consumer
+            self.error = e
+        finally:
+            self._put(_EOF)
+
+    def _open(self, path: Path, position: int):
+        fh = open(path, "rb")
+        if self.parser.fmt == "csv":
+            self.parser.set_header(fh.readline())
+            position = max(position, fh.tell())
+        fh.seek(position)
+        return fh
+
+    def _tail_file(self, path: Path) -> None:
+        fh = self._open(path, self.start_pos)
+        pending = b""
+        try:
+            while not self.stop.is_set():
+                line = fh.readline()
+                if not line:
+                    if not self.follow:
+                        break
+                    try:
+                        rotated = os.stat(path).st_size < fh.tell() or os.stat(path).st_ino != os.fstat(fh.fileno()).st_ino
+                    except FileNotFoundError:
+                        rotated = False
+                    if rotated:
+                        self.log(f"{path} was truncated or replaced; reading it from the start")
+                        fh.close()
+                        fh = self._open(path, 0)
+                        pending = b""
+                        continue
+                    time.sleep(POLL_INTERVAL_SEC)
+                    continue
+                if not line.endswith(b"\n") and self.follow:
+                    # A writer is mid-line; the offset only moves past complete lines
+                    pending += line
+                    continue
+                if not self._put((fh.tell(), pending + line)):
+                    break
+                pending = b""
+        finally:
+            fh.close()
+
+    def _read_stream(self, stream: IO[bytes]) -> None:
+        count = 0
+        for line in stream:
+            if self.stop.is_set():
+                break
+            count += 1
+            if count == 1 and self.parser.fmt == "csv":
+                self.parser.set_header(line)
+                continue
+            if count <= self.start_pos:
+                continue
+            if not self._put((count, line)):
+                break
+
+
+class _UserContext:
+    # Recent rows per user, LRU-bounded; users seen for the first time are loaded
+    # from the database in one windowed query per batch.
+    def __init__(self, depth: int, max_users: int):
+        self.depth = depth
+        self.max_users = max_users
+        self._rows: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+
+    def load_missing(self, db: Session, user_ids: Iterable[str]) -> None:
+        missing = [u for u in set(user_ids) if u not in self._rows]
+        if not missing or not self.depth:
+            for u in missing:
+                self._rows[u] = deque(maxlen=self.depth)
+            return
+        rn = func.row_number().over(partition_by=Transaction.user_id, order_by=Transaction.timestamp.desc()).label("rn")
+        for i in range(0, len(missing), 500):
+            part = missing[i:i + 500]
+            ranked = (
+                select(Transaction.timestamp, Transaction.user_id, Transaction.amount, Transaction.city,
+                       Transaction.category, rn)
+                .where(Transaction.user_id.in_(part))
+                .subquery()
+            )
+            rows = db.execute(
+                select(ranked).where(ranked.c.rn <= self.depth).order_by(ranked.c.user_id, ranked.c.timestamp)
+            ).all()
+            for u in part:
+                self._rows[u] = deque(maxlen=self.depth)
+            for r in rows:
+                self._rows[r.user_id].append({
+                    "Timestamp": r.timestamp, "UserID": r.user_id, "Amount": r.amount,
+                    "City": r.city, "Category": r.category,
+                })
+
+    def history(self, user_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for u in dict.fromkeys(user_ids):
+            self._rows.move_to_end(u)
+            out.extend(self._rows[u])
+        return out
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        for rec in records:
+            self._rows.setdefault(rec["UserID"], deque(maxlen=self.depth)).append(rec)
+        while len(self._rows) > self.max_users:
+            self._rows.popitem(last=False)
+
+
+def _score_batch(pipeline: Any, history: List[Dict[str, Any]], records: List[Dict[str, Any]],
+                 version: Optional[str] = None):
+    import pandas as pd
+    from model.feature_pipeline import FeatureEngineer
+    df = pd.DataFrame(history + records, columns=RAW_COLUMNS)
+    n = len(records)
+    risks = risk_scores(pipeline, df)[-n:]
+    features = FeatureEngineer().fit_transform(df)
+    flags = rule_flags(df, features)[-n:]
+    drift.monitor.update(features.iloc[-n:], model_version=version)
+    return risks, flags
+
+
+def _source_key(source: str) -> str:
+    return source if source == "-" else str(Path(source).resolve())
+
+
+def ingest(
+    source: str,
+    fmt: Optional[str] = None,
+    follow: bool = True,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    max_wait_sec: float = DEFAULT_MAX_WAIT_SEC,
+    queue_batches: int = DEFAULT_QUEUE_BATCHES,
+    context_rows: int = DEFAULT_CONTEXT_ROWS,
+    skip_committed_lines: bool = False,
+    stream: Optional[IO[bytes]] = None,
+    name: Optional[str] = None,
+    stop: Optional[threading.Event] = None,
+    model_path: Path = registry.MODEL_PATH,
+    session_factory: Callable[[], Session] = SessionLocal,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    fmt = fmt or ("csv" if str(source).lower().endswith(".csv") else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unsupported format: {fmt}")
+    key = name or _source_key(source)
+    if stream is None and source == "-":
+        stream = sys.stdin.buffer
+    elif stream is None and not _is_regular_file(Path(source)):
+        # Named pipe (or other non-seekable file): read it as a stream
+        stream = open(source, "rb")
+    seekable = stream is None
+
+    with session_factory() as db:
+        saved = db.get(IngestOffset, key)
+        start, committed_rows = (saved.position, saved.rows) if saved else (0, 0)
+    if not seekable and not skip_committed_lines:
+        # A pipe cannot be re-read; only skip lines when the producer replays from the start
+        start = 0
+    if start:
+        log(f"Resuming {key} at {'byte' if seekable else 'line'} {start} ({committed_rows} rows committed)")
+
+    pipeline = registry.load_pipeline(model_path)
+    version = registry.model_version(model_path)
+    stop = stop or threading.Event()
+    lines: "queue.Queue" = queue.Queue(maxsize=max(1, batch_rows * queue_batches))
+    parser = _LineParser(fmt)
+    reader = _Reader(source, stream, parser, lines, start if (seekable or skip_committed_lines) else 0,
+                     follow and seekable, stop, log)
+    reader.start()
+    context = _UserContext(context_rows, DEFAULT_CONTEXT_USERS)
+    stats = {"source": key, "rows": 0, "batches": 0, "bad_lines": 0, "duplicates": 0, "position": start}
+    position = start
+    done = False
+    try:
+        while not done:
+            records: List[Dict[str, Any]] = []
+            deadline = None
+            while len(records) < batch_rows:
+                timeout = POLL_INTERVAL_SEC if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = lines.get(timeout=timeout)
+                except queue.Empty:
+                    if deadline is not None or stop.is_set():
+                        break
+                    continue
+                if item is _EOF:
+                    done = True
+                    break
+                position, raw = item
+                try:
+                    rec = parser.parse(raw)
+                except (ValueError, KeyError, TypeError) as e:
+                    stats["bad_lines"] += 1
+                    log(f"skipping line before position {position}: {e}")
+                    continue
+                if rec is not None:
+                    records.append(rec)
+                    if deadline is None:
+                        deadline = time.monotonic() + max_wait_sec
+            if stop.is_set() and not records:
+                break
+            if not records and position == stats["position"]:
+                continue
+            keys = [dedup.dedup_key(r["UserID"], r["Timestamp"], r["Amount"], r["City"], r["Category"]) for r in records]
+            for exact in (False, True):
+                stored: List[tuple] = []  # (dedup_key, user_id, city, category, status) per new row
+                with session_factory() as db:
+                    # Replayed lines and rows already uploaded are dropped, like /upload's skip mode
+                    keep = dedup.plan(db, keys, "skip", exact=exact)["keep"]
+                    fresh = [records[i] for i in keep]
+                    context.load_missing(db, (r["UserID"] for r in fresh))
+                    if fresh:
+                        risks, flags = _score_batch(pipeline, context.history(r["UserID"] for r in fresh), fresh, version)
+                        txns = [
+                            Transaction(
+                                id=str(uuid.uuid4()), timestamp=rec["Timestamp"], amount=rec["Amount"],
+                                user_id=rec["UserID"], city=rec["City"], category=rec["Category"],
+                                risk_score=int(risk), **flags_to_columns(f), is_training_data=False,
+                                notification_sent=False, model_version=version, dedup_key=keys[i],
+                            )
+                            for i, rec, risk, f in zip(keep, fresh, risks, flags)
+                        ]
+                        db.add_all(txns)
+                        stored = [(t.dedup_key, t.user_id, t.city, t.category, t.status) for t in txns]
+                    db.merge(IngestOffset(source=key, position=position, rows=committed_rows + len(records),
+                                          updated_at=datetime.utcnow()))
+                    try:
+                        db.commit()
+                    except IntegrityError:
+                        if exact:
+                            raise
+                        # Another writer stored some of these keys after our filter was built
+                        db.rollback()
+                        dedup.index.reset()
+                        continue
+                break
+            committed_rows += len(records)
+            dedup.index.add(s[0] for s in stored)
+            heavy_hitters.store.record(s[1:] for s in stored)
+            context.extend(fresh)
+            stats["rows"] += len(fresh)
+            stats["duplicates"] += len(records) - len(fresh)
+            stats["batches"] += 1
+            stats["position"] = position
+            if records:
+                log(f"batch {stats['batches']}: stored {len(fresh)} rows (position {position})")
+    finally:
+        stop.set()
+        reader.join(timeout=5)
+        drift.monitor.save()
+        heavy_hitters.store.flush()
+    if reader.error is not None:
+        raise reader.error
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a continuous transaction feed (file tail, named pipe or stdin)")
+    parser.add_argument("source", help="File to tail, a named pipe, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="Default: by file extension, else ndjson")
+    parser.add_argument("--once", action="store_true", help="Stop at end of file instead of following it")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT_SEC, help="Seconds a partial batch may wait")
+    parser.add_argument("--queue-batches", type=int, default=DEFAULT_QUEUE_BATCHES, help="Batches buffered ahead of the database")
+    parser.add_argument("--context-rows", type=int, default=DEFAULT_CONTEXT_ROWS, help="Per-user history used for features")
+    parser.add_argument("--name", help="Offset key (default: resolved path, or - for stdin)")
+    parser.add_argument("--skip-committed-lines", action="store_true",
+                        help="For pipes/stdin: skip the committed line count (producer replays from the start)")
+    args = parser.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    stats = ingest(args.source, args.format, follow=not args.once, batch_rows=args.batch_rows,
+                   max_wait_sec=args.max_wait, queue_batches=args.queue_batches, context_rows=args.context_rows,
+                   skip_committed_lines=args.skip_committed_lines, name=args.name, log=log)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,28 @@
+from sqlalchemy import select
+from database import engine, SessionLocal
+from models import Base, User
+from auth_utils import hash_password
+
+DEFAULT_USER_EMAIL = "analyst@anomalyse.bank"
+DEFAULT_USER_PASSWORD = "password123"
+
+_initialized = False
+
+
+def init_db(force: bool = False) -> None:
+    # Schema creation and seeding are deployment steps; a process only needs them once.
+    global _initialized
+    if _initialized and not force:
+        return
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.scalar(select(User.id).where(User.email == DEFAULT_USER_EMAIL))
+        if not existing:
+            db.add(User(email=DEFAULT_USER_EMAIL, password_hash=hash_password(DEFAULT_USER_PASSWORD), role="analyst"))
+            db.commit()
+    _initialized = True
+
+
+if __name__ == "__main__":
+    init_db(force=True)
+    print("Database schema ready.")
@@ -1,46 +1,54 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
-from pathlib import Path
+from contextlib import asynccontextmanager
 import json
 from datetime import datetime
 import uuid
-import joblib
-import pandas as pd
+from types import SimpleNamespace
 
-from sqlalchemy import select, func, text, case, delete, inspect
+from sqlalchemy import delete, select, func, text, case, inspect
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from config import settings
 from database import engine, SessionLocal
-from models import Base, User, Transaction as TransactionModel, AuditLog
-from auth_utils import hash_password, verify_password, create_access_token, decode_token
-from model.feature_pipeline import FeatureEngineer
-from fpdf import FPDF
-
-app = FastAPI(title="Anomalyse Backend", version="0.3.0")
-
-def compute_rule_reasons(features_row: dict, amount: float) -> List[Dict[str, str]]:
-    flags: List[Dict[str, str]] = []
-    try:
-        gv = float(features_row.get('Geo_Velocity_Check', 0))
-        z = float(features_row.get('Amount_Z_Score', 0))
-        cnt = int(features_row.get('Txn_Count_30_Min', 0))
-        tsl = float(features_row.get('Time_Since_Last_TXN_Sec', 0))
-    except Exception:
-        gv, z, cnt, tsl = 0.0, 0.0, 0, 0.0
-    # Fast Location: mirror Rule_Reason pattern from ML_Model_Final_.ipynb
-    # Uses geospatial velocity check (> 1 implies required travel time exceeds observed gap)
-    if gv > 1.0:
-        flags.append({"type": "Fast Location", "reason": f"Geospatial anomaly: travel too fast (ratio {gv:.2f})."})
-    # High Value: mirror Rule_Reason pattern
-    # Trigger on extreme z-score or absolute amount threshold
-    if z >= 3.0 or amount >= 100000:
-        flags.append({"type": "High Value", "reason": f"Amount deviation detected (z-score {z:.2f})."})
-    # Velocity: only flag those with time difference > 0 and < 10 seconds
-    if (tsl > 0.0) and (tsl < 10.0):
-        flags.append({"type": "Velocity", "reason": f"last gap {int(tsl)}s between consecutive transactions."})
-    return flags
+from models import User, Transaction as TransactionModel, UploadBatch
+from auth_utils import verify_password, create_access_token, decode_token, claims_cache, user_cache, snapshot_user
+from init_db import init_db
+from model import registry
+from scoring import FLAGGED_STATUSES, compute_rule_reasons, explained_risk_scores, predict_row, risk_scores, rule_flags, flags_to_columns
+import admission
+import archive
+import audit
+import batches
+import dedup
+import drift
+import events
+import export
+import fastjson
+import heavy_hitters
+import notifications
+
+# pandas, joblib, scikit-learn and fpdf are imported inside the endpoints that use
+# them so that importing this module (worker spawn, test collection) stays cheap.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_INIT_ON_STARTUP:
+        init_db()
+    notifications.dispatcher.start()
+    yield
+    await notifications.dispatcher.stop(drain=True)
+    audit.writer.stop()
+    drift.monitor.save()
+    heavy_hitters.store.flush()
+
+
+app = FastAPI(title="Anomalyse Backend", version="0.3.0", lifespan=lifespan)
 
 # CORS: allow frontend on Vite default port
 app.add_middleware(
@@ -51,18 +59,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-MODEL_PATH = Path(__file__).parent / "model" / "model.pkl"
+MODEL_PATH = registry.MODEL_PATH
 # META_PATH is no longer strictly needed as pipeline handles features, but we can keep it if we want
 # META_PATH = Path(__file__).parent / "model_meta.json" 
 
-Base.metadata.create_all(bind=engine)
 
-# Seed default user if missing
-with SessionLocal() as db:
-    existing = db.scalar(select(User).where(User.email == "analyst@anomalyse.bank"))
-    if not existing:
-        db.add(User(email="analyst@anomalyse.bank", password_hash=hash_password("password123"), role="analyst"))
-        db.commit()
+def load_pipeline():
+    return registry.load_pipeline(MODEL_PATH)
+
+
+def current_model_version() -> Optional[str]:
+    return registry.model_version(MODEL_PATH)
 
 
 class LoginRequest(BaseModel):
@@ -87,6 +94,15 @@ class Transaction(BaseModel):
     flag_reason: Optional[str] = None
     flags: List[Dict[str, str]] = []
     notification_sent: bool = False
+    explanation: Optional[Dict[str, Any]] = None
+
+class BulkNotifyRequest(BaseModel):
+    ids: List[str] = []
+    email: Optional[str] = None
+    # Alternatively select by status, e.g. every flagged row not yet notified
+    status: Optional[List[str]] = None
+    only_unsent: bool = True
+    limit: int = 50_000
 
 class PredictionRequest(BaseModel):
     timestamp: str
@@ -100,6 +116,8 @@ class PredictionResponse(BaseModel):
     risk_score: float
     status: str
     flags: List[Dict[str, str]] = []
+    # ?explain=true: {"base": ..., "contributions": [{"feature", "value", "contribution"}, ...]}
+    explain: Optional[Dict[str, Any]] = None
 
 
 class MetricsResponse(BaseModel):
@@ -114,6 +132,7 @@ class MetricsResponse(BaseModel):
     mostActiveUser: Optional[str] = None
     fraudTypeCounts: Dict[str, int] = {}
     topUsers: List[Dict[str, Any]] = []
+    topCities: List[Dict[str, Any]] = []
     avgAmountFraud: float = 0.0
     avgAmountSafe: float = 0.0
 
@@ -126,20 +145,32 @@ def get_db():
         db.close()
 
 
+def _claims_expiry(claims: dict) -> Optional[float]:
+    exp = claims.get("exp")
+    if isinstance(exp, datetime):
+        return exp.timestamp()
+    return float(exp) if exp is not None else None
+
+
 def require_token(authorization: str = Header(default="", alias="Authorization")):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
-    token = authorization.replace("Bearer ", "").strip()
-    
+    return _authenticate(authorization.replace("Bearer ", "").strip())
+
+
+def _authenticate(token: str) -> dict:
     # Allow hardcoded dev token for easier frontend/backend synchronization
     if token == "hardcoded-dev-token-for-deployment":
         return {"email": "analyst@anomalyse.bank", "role": "analyst", "dev": True}
 
-    try:
-        claims = decode_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    return {"email": claims.get("sub")}
+    claims = claims_cache.get(token)
+    if claims is None:
+        try:
+            claims = decode_token(token)
+        except Exception:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        claims_cache.set(token, claims, expires_at=_claims_expiry(claims))
+    return {"email": claims.get("sub"), "exp": _claims_expiry(claims)}
 
 def get_current_user(user_ctx: dict = Depends(require_token), db: Session = Depends(get_db)) -> User:
     email = user_ctx.get("email")
@@ -148,74 +179,180 @@ def get_current_user(user_ctx: dict = Depends(require_token), db: Session = Depe
     if user_ctx.get("dev"):
         u = User(email=email, password_hash="", role=user_ctx.get("role", "analyst"))
         return u
+    cached = user_cache.get(email)
+    if cached is not None:
+        return cached
     user = db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=401, detail="Unknown user")
-    return user
+    cached = snapshot_user(user)
+    user_cache.set(email, cached, expires_at=user_ctx.get("exp"))
+    return cached
 
 
 @app.post("/auth/login", response_model=TokenResponse)
 async def login(payload: LoginRequest, db: Session = Depends(get_db)):
     user = db.scalar(select(User).where(User.email == payload.email))
-    if not user or not verify_password(payload.password, user.password_hash):
+    # pbkdf2 is deliberately slow; keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, payload.password, user.password_hash):
+        audit.record(payload.email, "login_failed", "auth")
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    audit.record(payload.email, "login", "auth")
     token = create_access_token(subject=payload.email)
     return TokenResponse(access_token=token)
 
 
+def _to_transaction(r: Any) -> Transaction:
+    return Transaction(**_transaction_dict(r))
+
+
+def _transaction_dict(r: Any) -> Dict[str, Any]:
+    # The Transaction model's fields as a plain dict (fast path for list responses)
+    flags_list, primary_type, primary_reason = _parse_flags(r.flag_type, r.flag_reason)
+    return {
+        "id": r.id,
+        "timestamp": r.timestamp.isoformat() if r.timestamp else "",
+        "amount": r.amount,
+        "user_id": r.user_id,
+        "city": r.city,
+        "category": r.category,
+        "status": r.status,
+        "flag_type": primary_type,
+        "flag_reason": primary_reason,
+        "flags": flags_list,
+        "notification_sent": bool(r.notification_sent),
+        "explanation": _parse_explanation(getattr(r, "explanation", None)),
+    }
+
+
+# Columns read for list responses; Core rows, no ORM identity map
+TRANSACTION_COLUMNS = [
+    TransactionModel.id, TransactionModel.timestamp, TransactionModel.amount, TransactionModel.user_id,
+    TransactionModel.city, TransactionModel.category, TransactionModel.status, TransactionModel.flag_type,
+    TransactionModel.flag_reason, TransactionModel.notification_sent, TransactionModel.explanation,
+]
+
+
+def _parse_explanation(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    try:
+        return fastjson.loads(raw)
+    except ValueError:
+        return None
+
+
+def _load_explainer():
+    explainer = registry.load_explainer(MODEL_PATH)
+    if explainer is None:
+        raise HTTPException(status_code=400, detail="Explanations need a tree-ensemble model")
+    return explainer
+
+
 @app.get("/transactions", response_model=List[Transaction])
-async def get_transactions(_: None = Depends(require_token), db: Session = Depends(get_db)):
-    rows = db.scalars(select(TransactionModel).order_by(TransactionModel.timestamp.asc())).all()
-    out: List[Transaction] = []
-    for r in rows:
-        flags_list = []
-        primary_type = r.flag_type
-        primary_reason = r.flag_reason
-        
-        # Try to parse flag_type as JSON (new format)
-        if r.flag_type and (r.flag_type.startswith('[') or r.flag_type.startswith('{')):
-            try:
-                parsed = json.loads(r.flag_type)
-                if isinstance(parsed, list):
-                    flags_list = parsed
-                    # Use first flag as primary for backward compatibility if needed
-                    if flags_list:
-                        primary_type = flags_list[0].get('type')
-                        primary_reason = flags_list[0].get('reason')
-            except:
-                # Fallback to legacy string format
-                flags_list = [{"type": r.flag_type, "reason": r.flag_reason or ""}]
-        elif r.flag_type:
-             # Legacy format
-             flags_list = [{"type": r.flag_type, "reason": r.flag_reason or ""}]
-
-        out.append(Transaction(
-            id=r.id,
-            timestamp=r.timestamp.isoformat() if r.timestamp else "",
-            amount=r.amount,
-            user_id=r.user_id,
-            city=r.city,
-            category=r.category,
-            status=r.status,
-            flag_type=primary_type,
-            flag_reason=primary_reason,
-            flags=flags_list,
-            notification_sent=r.notification_sent
-        ))
-    return out
+def get_transactions(
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    _: None = Depends(require_token),
+    db: Session = Depends(get_db),
+):
+    # Plain dicts from Core rows, encoded once (see fastjson); runs in the threadpool
+    stmt = select(*TRANSACTION_COLUMNS).order_by(TransactionModel.timestamp.asc())
+    if start is not None:
+        stmt = stmt.where(TransactionModel.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(TransactionModel.timestamp < end)
+    out: List[Dict[str, Any]] = []
+    if start is not None or end is not None:
+        # A date range may reach into cold storage; archived rows predate the hot table
+        out.extend(_transaction_dict(SimpleNamespace(**rec)) for rec in archive.read_archive_records(start, end))
+        out.sort(key=lambda t: t["timestamp"])
+    out.extend(_transaction_dict(r) for r in db.execute(stmt))
+    return fastjson.response(request, out)
+
+
+@app.get("/transactions/export")
+def export_transactions(
+    request: Request,
+    format: str = Query("parquet"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[List[str]] = Query(None),
+    features: bool = False,
+    batch_size: int = Query(export.DEFAULT_BATCH_SIZE, ge=1, le=500_000),
+    _: None = Depends(require_token),
+):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {sorted(export.FORMATS)}")
+    if format in ("arrow", "parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="pyarrow is not installed; use format=csv or ndjson")
+    media_type, ext = export.FORMATS[format]
+    filename = f"anomalyse_transactions_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    encoding = None
+    if format == "ndjson":
+        encoding = fastjson.negotiate(request.headers.get("accept-encoding", ""))
+        headers.update(fastjson.encoding_headers(encoding))
+    return StreamingResponse(
+        export.stream_export(format, start, end, status, features, batch_size, encoding=encoding),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+# Live feed: rows beyond this many per upload are announced by count only and the
+# client refetches /transactions
+STREAM_PREVIEW_ROWS = 500
+
+
+@app.get("/transactions/stream")
+async def stream_transactions(
+    token: Optional[str] = Query(None),
+    authorization: str = Header(default="", alias="Authorization"),
+):
+    # EventSource cannot send headers, so the token may also come as ?token=
+    if token:
+        _authenticate(token)
+    else:
+        require_token(authorization)
+    return StreamingResponse(
+        events.sse_stream(events.broadcaster),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _scored_event(rows: List[Any]) -> Optional[Dict[str, Any]]:
+    # Build before commit: committed ORM rows expire and would reload one by one
+    if not events.broadcaster.subscriber_count or not rows:
+        return None
+    flagged = sum(1 for r in rows if r.status in FLAGGED_STATUSES)
+    return {
+        "transactions": [_to_transaction(r).model_dump() for r in rows[:STREAM_PREVIEW_ROWS]],
+        "truncated": len(rows) > STREAM_PREVIEW_ROWS,
+        "metrics": {
+            "totalTransactions": len(rows),
+            "flaggedTransactions": flagged,
+            "amount": round(sum(float(r.amount or 0.0) for r in rows), 2),
+        },
+    }
 
 
 @app.get("/dashboard/metrics", response_model=MetricsResponse)
-async def get_metrics(_: None = Depends(require_token), db: Session = Depends(get_db)):
+def get_metrics(request: Request, _: None = Depends(require_token), db: Session = Depends(get_db)):
     total = db.scalar(select(func.count()).select_from(TransactionModel)) or 0
-    flagged = db.scalar(select(func.count()).where(TransactionModel.status == "Suspicious")) or 0
+    flagged = db.scalar(select(func.count()).where(TransactionModel.status.in_(FLAGGED_STATUSES))) or 0
     avg_risk = (float(flagged) / float(total) * 100.0) if total else 0.0
     avg_amount = float(db.scalar(select(func.avg(TransactionModel.amount))) or 0.0)
 
     rows = db.execute(
         select(
             func.date(TransactionModel.timestamp).label("date"),
-            func.sum(case((TransactionModel.status.in_(["Suspicious", "Fake/Suspicious"]), 1), else_=0)).label("fraudCount"),
+            func.sum(case((TransactionModel.status.in_(FLAGGED_STATUSES), 1), else_=0)).label("fraudCount"),
             func.sum(case((TransactionModel.status == "Safe", 1), else_=0)).label("safeCount")
         )
         .group_by(func.date(TransactionModel.timestamp))
@@ -233,30 +370,19 @@ async def get_metrics(_: None = Depends(require_token), db: Session = Depends(ge
     fraud_percent = (float(flagged) / float(total) * 100.0) if total else 0.0
     safe_percent = (float(safe_count) / float(total) * 100.0) if total else 0.0
 
-    most_active_user_row = db.execute(
-        select(TransactionModel.user_id, func.count().label("cnt"))
-        .group_by(TransactionModel.user_id)
-        .order_by(func.count().desc())
-        .limit(1)
-    ).first()
-    most_active_user = most_active_user_row[0] if most_active_user_row else None
-
-    # Top 5 Users
-    top_users_rows = db.execute(
-        select(TransactionModel.user_id, func.count().label("cnt"))
-        .group_by(TransactionModel.user_id)
-        .order_by(func.count().desc())
-        .limit(5)
-    ).all()
-    top_users = [{"user_id": r[0], "count": r[1]} for r in top_users_rows]
+    # Top 5 users and cities from the heavy-hitter summaries (no per-request GROUP BY)
+    top_users = [{"user_id": r["value"], "count": r["count"]} for r in heavy_hitters.store.top("user", 5)]
+    top_cities = [{"city": r["value"], "count": r["count"]} for r in heavy_hitters.store.top("city", 5)]
+    most_active_user = top_users[0]["user_id"] if top_users else None
 
     # Avg Amount Fraud vs Safe
-    avg_fraud = db.scalar(select(func.avg(TransactionModel.amount)).where(TransactionModel.status.in_(["Suspicious", "Fake/Suspicious"]))) or 0.0
+    avg_fraud = db.scalar(select(func.avg(TransactionModel.amount)).where(TransactionModel.status.in_(FLAGGED_STATUSES))) or 0.0
     avg_safe = db.scalar(select(func.avg(TransactionModel.amount)).where(TransactionModel.status == "Safe")) or 0.0
 
-    flagged_rows = db.scalars(
-        select(TransactionModel).where(TransactionModel.status.in_(["Suspicious", "Fake/Suspicious"]))
-    ).all()
+    flagged_rows = db.execute(
+        select(TransactionModel.flag_type, TransactionModel.flag_reason)
+        .where(TransactionModel.status.in_(FLAGGED_STATUSES))
+    )
     type_counts: Dict[str, int] = {"Fast Location": 0, "Velocity": 0, "High Value": 0}
     for r in flagged_rows:
         flags_list, primary_type, _ = _parse_flags(r.flag_type, r.flag_reason)
@@ -265,7 +391,7 @@ async def get_metrics(_: None = Depends(require_token), db: Session = Depends(ge
             if t in type_counts:
                 type_counts[t] += 1
 
-    return MetricsResponse(
+    return fastjson.response(request, MetricsResponse(
         totalTransactions=int(total),
         flaggedTransactions=int(flagged),
         overallRiskScore=float(avg_risk) if avg_risk else 0.0,
@@ -277,9 +403,29 @@ async def get_metrics(_: None = Depends(require_token), db: Session = Depends(ge
         mostActiveUser=most_active_user,
         fraudTypeCounts=type_counts,
         topUsers=top_users,
+        topCities=top_cities,
         avgAmountFraud=round(float(avg_fraud), 2),
         avgAmountSafe=round(float(avg_safe), 2),
-    )
+    ).model_dump())
+
+@app.get("/dashboard/heavy-hitters")
+async def get_heavy_hitters(
+    dimension: str = Query("user", pattern="^(user|city|category)$"),
+    k: int = Query(10, ge=1, le=100),
+    flagged: bool = False,
+    exact: bool = False,
+    _: None = Depends(require_token),
+):
+    # Approximate counts with their error bound; exact=true also counts the listed items in the table
+    items = await run_in_threadpool(heavy_hitters.store.top, dimension, k, flagged, exact)
+    return {"dimension": dimension, "flagged": flagged, "items": items}
+
+
+@app.post("/dashboard/heavy-hitters/rebuild")
+async def rebuild_heavy_hitters(user_ctx: dict = Depends(require_token)):
+    await run_in_threadpool(heavy_hitters.store.rebuild)
+    audit.record(user_ctx.get("email"), "heavy_hitters_rebuild", "dashboard")
+    return {"success": True}
 
 @app.get("/health/db")
 def health_db():
@@ -307,48 +453,127 @@ def health_app():
 @app.get("/health/pdf")
 def health_pdf():
     try:
+        from fpdf import FPDF
         _ = FPDF()
         ok = True
     except Exception:
         ok = False
     return {"pdf_lib_ready": ok}
 @app.post("/transactions/clear")
-async def clear_transactions(_: None = Depends(require_token), db: Session = Depends(get_db)):
-    res = db.execute(delete(TransactionModel))
-    db.commit()
-    deleted = res.rowcount or 0
+async def clear_transactions(user_ctx: dict = Depends(require_token)):
+    # Chunked so readers are not locked out for the whole delete
+    deleted = await run_in_threadpool(batches.clear_all)
+    audit.record(user_ctx.get("email"), "clear_transactions", "transactions", details={"deleted": deleted})
     return {"success": True, "deleted": int(deleted)}
+
+
+@app.get("/batches")
+async def list_upload_batches(_: None = Depends(require_token), db: Session = Depends(get_db)):
+    return batches.list_batches(db)
+
+
+@app.delete("/batches/{batch_id}")
+async def delete_upload_batch(batch_id: str, user_ctx: dict = Depends(require_token)):
+    deleted = await run_in_threadpool(batches.delete_batch, batch_id)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    audit.record(user_ctx.get("email"), "delete_batch", "batch", batch_id, {"deleted": deleted})
+    return {"success": True, "batchId": batch_id, "deleted": deleted}
+
+
+@app.post("/batches/{batch_id}/rescore")
+async def rescore_upload_batch(batch_id: str, user_ctx: dict = Depends(require_token)):
+    if not MODEL_PATH.exists():
+        raise HTTPException(status_code=400, detail="Model not found. Please train using model/train.py first.")
+    result = await run_in_threadpool(batches.rescore_batch, batch_id, MODEL_PATH)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    audit.record(user_ctx.get("email"), "rescore_batch", "batch", batch_id, result)
+    return {"success": True, **result}
+
+
+@app.get("/drift")
+async def feature_drift(_: None = Depends(require_token)):
+    # Live feature distributions (merged across workers) against the training reference
+    result = await run_in_threadpool(drift.report, MODEL_PATH)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No drift reference. Retrain with model/train.py to capture one.")
+    return result
+
+
+@app.post("/drift/reset")
+async def reset_drift(user_ctx: dict = Depends(require_token)):
+    removed = await run_in_threadpool(drift.monitor.reset)
+    audit.record(user_ctx.get("email"), "drift_reset", "drift", None, {"files": removed})
+    return {"success": True, "removedSources": removed}
+
 @app.post("/transactions/notify")
-async def notify_transaction(payload: Dict, _: None = Depends(require_token), db: Session = Depends(get_db)):
+async def notify_transaction(payload: Dict, user_ctx: dict = Depends(require_token), db: Session = Depends(get_db)):
     txn_id = payload.get("id")
-    email_to = payload.get("email", "admin@anomalyse.bank") # Default to admin if not provided
-    
+    email_to = payload.get("email") or settings.NOTIFY_DEFAULT_RECIPIENT
+
     if not txn_id:
         raise HTTPException(status_code=400, detail="Missing transaction id")
-        
-    txn = db.scalar(select(TransactionModel).where(TransactionModel.id == txn_id))
-    if not txn:
+
+    if not db.scalar(select(TransactionModel.id).where(TransactionModel.id == txn_id)):
         raise HTTPException(status_code=404, detail="Transaction not found")
-        
-    # Mock Email Sending
-    # In a real app, integrate with SMTP or SendGrid here.
-    # For now, we simulate success.
-    print(f"Sending email to {email_to} for transaction {txn_id}...")
-    
-    txn.notification_sent = True
-    db.commit()
-    
-    return {"success": True, "message": f"Notification sent to {email_to}"}
+
+    # Sent (and notification_sent set) by the background dispatcher
+    notifications.dispatcher.enqueue(email_to, [txn_id])
+    audit.record(user_ctx.get("email"), "notify", "transaction", txn_id, {"recipient": email_to})
+    return {"success": True, "message": f"Notification queued for {email_to}"}
+
+
+@app.post("/transactions/notify/bulk", status_code=202)
+async def notify_transactions_bulk(payload: BulkNotifyRequest, user_ctx: dict = Depends(require_token), db: Session = Depends(get_db)):
+    if not payload.ids and not payload.status:
+        raise HTTPException(status_code=400, detail="Provide ids or status")
+    email_to = payload.email or settings.NOTIFY_DEFAULT_RECIPIENT
+    found: List[str] = []
+    if payload.ids:
+        for i in range(0, len(payload.ids), 500):
+            found.extend(db.scalars(select(TransactionModel.id).where(TransactionModel.id.in_(payload.ids[i:i + 500]))))
+    else:
+        q = select(TransactionModel.id).where(TransactionModel.status.in_(payload.status))
+        if payload.only_unsent:
+            q = q.where(TransactionModel.notification_sent.isnot(True))
+        found = list(db.scalars(q.order_by(TransactionModel.timestamp).limit(payload.limit)))
+    queued = notifications.dispatcher.enqueue(email_to, found)
+    missing = sorted(set(payload.ids) - set(found)) if payload.ids else []
+    audit.record(user_ctx.get("email"), "notify_bulk", "transactions", details={
+        "recipient": email_to, "queued": queued, "matched": len(found), "status": payload.status,
+    })
+    return {"success": True, "queued": queued, "matched": len(found), "missing": missing, "recipient": email_to}
+
+@app.exception_handler(admission.Rejected)
+async def _shed(request, exc: admission.Rejected):
+    return JSONResponse(status_code=503, headers=admission.retry_after_header(exc),
+                        content={"detail": f"Server busy ({exc.reason}), retry later", "lane": exc.lane})
+
+
+@app.get("/health/admission")
+def health_admission():
+    # Queue depth, active slots and rejection counters of this worker
+    return admission.controller.stats()
+
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_fraud(txn: PredictionRequest, db: Session = Depends(get_db)):
+async def predict_fraud(txn: PredictionRequest, explain: bool = False, db: Session = Depends(get_db)):
+    # Scoring runs in the threadpool so the event loop keeps admitting and shedding meanwhile
+    async with admission.controller.slot("predict"):
+        return await run_in_threadpool(_predict, txn, explain, db)
+
+
+def _predict(txn: PredictionRequest, explain: bool, db: Session) -> PredictionResponse:
     if not MODEL_PATH.exists():
         raise HTTPException(status_code=500, detail="Model not found. Please train using train_model.py first.")
-    
+    import pandas as pd
+    from model.feature_pipeline import FeatureEngineer
     try:
-        pipeline = joblib.load(MODEL_PATH)
+        pipeline = load_pipeline()
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to load model")
+    explainer = _load_explainer() if explain else None
 
     # Fetch recent history for context (e.g. last 50 txns)
     try:
@@ -391,33 +616,27 @@ async def predict_fraud(txn: PredictionRequest, db: Session = Depends(get_db)):
     df = pd.DataFrame(history_data)
     
     try:
-        preds_all = pipeline.predict(df)
-        probs_all = pipeline.predict_proba(df)
-        pred = preds_all[-1]
-        probs = probs_all[-1]
-        
-        classes = pipeline.classes_
-        if 0 in classes:
-            normal_idx = list(classes).index(0)
-            safe_prob = float(probs[normal_idx])
-        else:
-            safe_prob = 0.0
-            
-        fe = FeatureEngineer()
-        features_df = fe.fit_transform(df)
+        risk_score, is_fraud, explanation = predict_row(
+            pipeline, df, explainer, top=settings.EXPLAIN_TOP_FEATURES
+        )
+        # Rules and drift read the default feature set, whatever the model was trained with
+        features_df = FeatureEngineer().fit_transform(df)
+        drift.monitor.update(features_df.iloc[-1:], current_model_version())
         features_row = features_df.iloc[-1].to_dict()
         flags = compute_rule_reasons(features_row, txn.amount)
         status = "Suspicious" if flags else "Safe"
-        risk_score = round((1.0 - safe_prob) * 100.0, 2)
-        fe = FeatureEngineer()
-        is_fraud = pred != 0
 
-        return PredictionResponse(
+        result = PredictionResponse(
             is_fraud=bool(is_fraud),
             risk_score=float(risk_score),
             status=status,
-            flags=flags
+            flags=flags,
+            explain=explanation,
         )
+        if events.broadcaster.subscriber_count:
+            # /predict does not store the transaction, so it carries no metric delta
+            events.broadcaster.publish("prediction", {**txn.model_dump(), **result.model_dump()})
+        return result
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
@@ -428,7 +647,7 @@ def _parse_flags(flag_type: Optional[str], flag_reason: Optional[str]) -> List[D
     primary_reason = flag_reason
     if flag_type and (flag_type.startswith('[') or flag_type.startswith('{')):
         try:
-            parsed = json.loads(flag_type)
+            parsed = fastjson.loads(flag_type)
             if isinstance(parsed, list):
                 flags_list = parsed
                 if flags_list:
@@ -443,9 +662,10 @@ def _parse_flags(flag_type: Optional[str], flag_reason: Optional[str]) -> List[D
 @app.get("/reports/fraud.pdf")
 async def download_fraud_report(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     rows = db.scalars(
-        select(TransactionModel).where(TransactionModel.status.in_(["Suspicious", "Fake/Suspicious"]))
+        select(TransactionModel).where(TransactionModel.status.in_(FLAGGED_STATUSES))
         .order_by(TransactionModel.timestamp.asc())
     ).all()
+    from fpdf import FPDF
     pdf = FPDF(orientation="P", unit="mm", format="A4")
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -498,35 +718,34 @@ async def download_fraud_report(current_user: User = Depends(get_current_user),
     filename = f"anomalyse_fraud_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
     out_buf = pdf.output(dest="S")
     pdf_bytes = bytes(out_buf) if isinstance(out_buf, (bytes, bytearray)) else str(out_buf).encode("latin1")
-    try:
-        db.add(AuditLog(
-            user_email=current_user.email,
-            action="download_report",
-            resource="fraud_report",
-            resource_id=filename,
-            details=json.dumps({"count": total_count})
-        ))
-        db.commit()
-    except Exception:
-        db.rollback()
-    from fastapi.responses import Response
+    audit.record(current_user.email, "download_report", "fraud_report", filename, {"count": total_count})
     return Response(content=pdf_bytes, media_type="application/pdf", headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @app.post("/upload")
-async def upload_csv(file: UploadFile = File(...), _: None = Depends(require_token), db: Session = Depends(get_db)):
+async def upload_csv(file: UploadFile = File(...), explain: bool = False,
+                     duplicates: str = Query("skip", pattern="^(skip|flag|replace)$"),
+                     user_ctx: dict = Depends(require_token), db: Session = Depends(get_db)):
+    async with admission.controller.slot("upload"):
+        return await run_in_threadpool(_upload, file, explain, duplicates, user_ctx, db)
+
+
+def _upload(file: UploadFile, explain: bool, duplicates: str, user_ctx: dict, db: Session) -> Dict[str, Any]:
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
     if not MODEL_PATH.exists():
         raise HTTPException(status_code=400, detail="Model not found. Please train using model/train.py first.")
+    import pandas as pd
+    from model.feature_pipeline import INGEST_DTYPES, FeatureEngineer
 
     try:
-        pipeline = joblib.load(MODEL_PATH)
+        pipeline = load_pipeline()
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to load model")
 
     try:
-        df = pd.read_csv(file.file, comment="#", skip_blank_lines=True)
+        # Key columns are categorical from the start: one copy of each distinct string
+        df = pd.read_csv(file.file, comment="#", skip_blank_lines=True, dtype=INGEST_DTYPES)
     except Exception:
          raise HTTPException(status_code=400, detail="Unable to read CSV")
 
@@ -536,52 +755,88 @@ async def upload_csv(file: UploadFile = File(...), _: None = Depends(require_tok
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
 
+    # Rows already stored (or repeated in this file) are dropped before scoring so
+    # they do not inflate the velocity features of the rest of the batch
+    keys = dedup.frame_keys(df)
+    plan = dedup.plan(db, keys, duplicates)
+    if len(plan["keep"]) < len(df):
+        df = df.iloc[plan["keep"]].reset_index(drop=True)
+        keys = [keys[i] for i in plan["keep"]]
+    if df.empty:
+        return {"success": True, "message": "Every row was already stored.", "rowsProcessed": 0, "batchId": None,
+                "duplicates": plan["counts"]}
+
+    explainer = _load_explainer() if explain else None
+    explanations = [None] * len(df)
     try:
-        preds = pipeline.predict(df)
-        probs = pipeline.predict_proba(df)
-        classes = pipeline.classes_
-        normal_idx = list(classes).index(0) if 0 in classes else -1
+        if explainer is not None:
+            risks, explanations = explained_risk_scores(pipeline, explainer, df, top=settings.EXPLAIN_TOP_FEATURES)
+        else:
+            risks = risk_scores(pipeline, df)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
 
-    fe = FeatureEngineer()
-    features_df = fe.fit_transform(df)
+    features_df = FeatureEngineer().fit_transform(df)
+    flags_per_row = rule_flags(df, features_df)
+    version = current_model_version()
+    drift.monitor.update(features_df, version)
+    timestamps = pd.to_datetime(df["Timestamp"])
+    batch_id = str(uuid.uuid4())
 
     new_txns = []
-    for i, pred in enumerate(preds):
-        if normal_idx != -1:
-            safe_prob = float(probs[i][normal_idx])
-        else:
-            safe_prob = 0.0
-            
-        risk = round((1.0 - safe_prob) * 100.0, 2)
-        amount = float(df.iloc[i]["Amount"])
-        features_row = features_df.iloc[i].to_dict()
-        flags = compute_rule_reasons(features_row, amount)
-        status = "Suspicious" if flags else "Safe"
-        flags_json = json.dumps(flags) if flags else None
-
+    for i, (risk, flags, expl) in enumerate(zip(risks, flags_per_row, explanations)):
+        columns = flags_to_columns(flags)
+        is_duplicate = plan["duplicate"][i]
         new_txns.append(TransactionModel(
             id=str(uuid.uuid4()),
-            timestamp=pd.to_datetime(df.iloc[i]["Timestamp"]).to_pydatetime(),
-            amount=amount,
+            timestamp=timestamps.iloc[i].to_pydatetime(),
+            amount=float(df.iloc[i]["Amount"]),
             user_id=str(df.iloc[i]["UserID"]),
             city=str(df.iloc[i]["City"]),
             category=str(df.iloc[i]["Category"]),
             risk_score=int(risk),
-            status=status,
-            flag_type=flags_json,
-            flag_reason=None, # Explicitly setting flag_reason to None as it's not being used with the new JSON format
+            # flag_reason stays None: reasons live in the JSON flags stored in flag_type
+            **(dedup.flag_columns(columns) if is_duplicate else columns),
             is_training_data=False,
-            notification_sent=False
+            notification_sent=False,
+            model_version=version,
+            batch_id=batch_id,
+            explanation=json.dumps(expl) if expl else None,
+            dedup_key=None if is_duplicate else keys[i],
         ))
         
+    event = _scored_event(new_txns)
+    # Plain tuples: the ORM objects expire on commit
+    stored = [(t.dedup_key, t.user_id, t.city, t.category, t.status) for t in new_txns]
     # Bulk save
     try:
+        for i in range(0, len(plan["replace"]), dedup.LOOKUP_CHUNK):
+            db.execute(delete(TransactionModel).where(
+                TransactionModel.dedup_key.in_(plan["replace"][i:i + dedup.LOOKUP_CHUNK])))
+        db.add(UploadBatch(
+            id=batch_id, filename=file.filename, uploaded_by=user_ctx.get("email"), rows=len(new_txns),
+            flagged=sum(1 for t in new_txns if t.status in FLAGGED_STATUSES), model_version=version,
+        ))
         db.add_all(new_txns)
         db.commit()
+    except IntegrityError:
+        # Another worker stored some of these rows after this process built its filter
+        db.rollback()
+        dedup.index.reset()
+        raise HTTPException(status_code=409, detail="Some rows were stored by a concurrent upload; retry the upload.")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    return {"success": True, "message": "File processed and transactions stored.", "rowsProcessed": len(new_txns)}
+    dedup.index.add(s[0] for s in stored)
+    if plan["replace"]:
+        heavy_hitters.store.invalidate()
+    else:
+        heavy_hitters.store.record(s[1:] for s in stored)
+    if event:
+        events.broadcaster.publish("transactions", event)
+    audit.record(user_ctx.get("email"), "upload", "batch", batch_id, {
+        "filename": file.filename, "rows": len(new_txns), "modelVersion": version,
+    })
+    return {"success": True, "message": "File processed and transactions stored.", "rowsProcessed": len(new_txns),
+            "batchId": batch_id, "duplicates": plan["counts"]}
@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+# Per-row feature attributions for the random forest (Saabas path attribution).
+# Every split moves the predicted risk from the parent node's value to the child's;
+# that difference is credited to the feature the parent split on. A row's
+# contributions are the sum of those deltas along its path in every tree,
+# averaged over the forest, so base + sum(contributions) equals the model's risk score.
+#
+# The deltas are computed once per model as a sparse (all nodes x input features)
+# matrix: one-hot columns fold back into their City/Category column. Explaining a
+# batch is then decision_path() and a sparse product, with no Python loop over
+# rows or trees.
+
+
+class ForestExplainer:
+    def __init__(self, pipeline: Any):
+        pre = pipeline.named_steps['preprocess']
+        clf = pipeline.named_steps['clf']
+        self.feature_names, column_of = _input_columns(pre)
+        classes = list(clf.classes_)
+        safe_idx = classes.index(0) if 0 in classes else None
+
+        rows, cols, vals = [], [], []
+        bases = []
+        offset = 0
+        n_trees = len(clf.estimators_)
+        for est in clf.estimators_:
+            tree = est.tree_
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1)
+            totals[totals == 0] = 1.0
+            # Risk on the API's 0-100 scale, as scoring.risk_scores computes it
+            risk = 100.0 * (1.0 - value[:, safe_idx] / totals) if safe_idx is not None else np.full(len(value), 100.0)
+            parent = np.full(tree.node_count, -1)
+            inner = np.flatnonzero(tree.children_left >= 0)
+            parent[tree.children_left[inner]] = inner
+            parent[tree.children_right[inner]] = inner
+            child = np.flatnonzero(parent >= 0)
+            rows.append(child + offset)
+            cols.append(column_of[tree.feature[parent[child]]])
+            vals.append((risk[child] - risk[parent[child]]) / n_trees)
+            bases.append(risk[0])
+            offset += tree.node_count
+
+        self.clf = clf
+        self.base = float(np.mean(bases))
+        self._node_contrib = sparse.csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(offset, len(self.feature_names)),
+        )
+
+    @classmethod
+    def supports(cls, pipeline: Any) -> bool:
+        steps = getattr(pipeline, 'named_steps', None)
+        if not steps or 'preprocess' not in steps or 'clf' not in steps:
+            return False
+        estimators = getattr(steps['clf'], 'estimators_', None)
+        return bool(estimators) and all(hasattr(e, 'tree_') for e in estimators)
+
+    def contributions(self, Xt) -> np.ndarray:
+        # Xt is the preprocessed matrix the classifier sees
+        paths, _ = self.clf.decision_path(Xt)
+        return np.asarray((paths @ self._node_contrib).todense())
+
+    def explain(self, Xt, features_df, top: Optional[int] = None) -> List[Dict[str, Any]]:
+        contrib = self.contributions(Xt)
+        order = np.argsort(-np.abs(contrib), axis=1, kind='stable')
+        if top:
+            order = order[:, :top]
+        values = {name: features_df[name].tolist() for name in self.feature_names}
+        out = []
+        for i in range(len(contrib)):
+            out.append({
+                "base": round(self.base, 2),
+                "contributions": [
+                    {"feature": self.feature_names[j], "value": _plain(values[self.feature_names[j]][i]),
+                     "contribution": round(float(contrib[i, j]), 2)}
+                    for j in order[i]
+                ],
+            })
+        return out
+
+
+def _input_columns(pre: Any):
+    # Map every ColumnTransformer output column to the input column it came from
+    names: List[str] = []
+    column_of: List[int] = []
+    for name, trans, cols in pre.transformers_:
+        if name == 'remainder' or trans == 'drop':
+            continue
+        s = pre.output_indices_[name]
+        width = s.stop - s.start
+        sizes = [1] * len(cols) if width == len(cols) else _onehot_widths(trans[-1])
+        if sum(sizes) != width:
+            raise ValueError(f"Cannot map the {width} '{name}' output columns back to {list(cols)}")
+        for col, size in zip(cols, sizes):
+            column_of.extend([len(names)] * size)
+            names.append(col)
+    return names, np.asarray(column_of)
+
+
+def _onehot_widths(enc: Any) -> List[int]:
+    # Output columns per input column: one per category, less a dropped one, with
+    # infrequent categories (min_frequency / max_categories) sharing a single column
+    infrequent = getattr(enc, 'infrequent_categories_', None) or [None] * len(enc.categories_)
+    drop_idx = enc.drop_idx_ if enc.drop_idx_ is not None else [None] * len(enc.categories_)
+    return [
+        len(cats) - (len(rare) - 1 if rare is not None else 0) - (dropped is not None)
+        for cats, rare, dropped in zip(enc.categories_, infrequent, drop_idx)
+    ]
+
+
+def _plain(v: Any) -> Any:
+    if isinstance(v, (np.floating, float)):
+        return None if np.isnan(v) else round(float(v), 4)
+    if isinstance(v, np.integer):
+        return int(v)
+    return v if v is None or isinstance(v, (int, str)) else str(v)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model.feature_pipeline import INGEST_DTYPES, SPLIT_SEED, TEST_SIZE, FeatureEngineer, split_rows
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "feature_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+RAW_COLUMNS = ['Timestamp', 'UserID', 'Amount', 'City', 'Category']
+_CHUNK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def feature_code_version() -> str:
+    # Any edit to the feature code invalidates previously cached matrices
+    import model.feature_pipeline as fp
+    return hashlib.sha256(Path(fp.__file__).read_bytes()).hexdigest()[:16]
+
+
+# Content-addressed store of engineered feature matrices. Each entry is a directory
+# holding one transposed .npy block per dtype (so a memory-mapped load is a zero-copy
+# DataFrame), int32 codes for the categorical columns and, optionally, the target.
+class FeatureCache:
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def key_for(self, input_path: Path, engineer: Optional[FeatureEngineer] = None,
+                target_col: Optional[str] = None, split: Optional[Tuple[float, int]] = None) -> str:
+        engineer = engineer or FeatureEngineer()
+        parts = [file_digest(Path(input_path)), feature_code_version(),
+                 json.dumps(engineer.get_params(), sort_keys=True, default=str), str(target_col)]
+        if split is not None:
+            parts.append(f"split={split[0]},{split[1]}")
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+    def load(self, key: str) -> Optional[Tuple[pd.DataFrame, Optional[np.ndarray]]]:
+        entry = self.root / key
+        meta_path = entry / 'meta.json'
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        frames = []
+        for block in meta['blocks']:
+            arr = np.load(entry / block['file'], mmap_mode='r')
+            frames.append(pd.DataFrame(arr.T, columns=block['columns'], copy=False))
+        X = pd.concat(frames, axis=1, copy=False) if frames else pd.DataFrame(index=range(meta['n_rows']))
+        for name, cats in meta['categorical'].items():
+            codes = np.load(entry / f'cat_{name}.npy')
+            X[name] = pd.Categorical.from_codes(codes, categories=cats)
+        # Columns are grouped by dtype block; reordering them would copy out of the mmap
+        y = np.load(entry / 'target.npy', allow_pickle=False) if meta.get('has_target') else None
+        os.utime(meta_path)  # recency for LRU eviction
+        return X, y
+
+    def store(self, key: str, X: pd.DataFrame, y: Optional[np.ndarray] = None) -> None:
+        entry = self.root / key
+        tmp = self.root / f'.{key}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        blocks, categorical = [], {}
+        by_dtype: Dict[str, list] = {}
+        for name in X.columns:
+            col = X[name]
+            if isinstance(col.dtype, pd.CategoricalDtype) or col.dtype == object:
+                cat = pd.Categorical(col)
+                np.save(tmp / f'cat_{name}.npy', cat.codes.astype(np.int32))
+                categorical[name] = [str(c) for c in cat.categories]
+            else:
+                by_dtype.setdefault(col.dtype.str, []).append(name)
+        for i, (dtype, names) in enumerate(by_dtype.items()):
+            fname = f'block{i}.npy'
+            np.save(tmp / fname, np.ascontiguousarray(X[names].to_numpy(dtype=np.dtype(dtype)).T))
+            blocks.append({'file': fname, 'columns': names})
+        if y is not None:
+            np.save(tmp / 'target.npy', np.asarray(y))
+        meta = {
+            'columns': list(X.columns), 'n_rows': len(X), 'blocks': blocks,
+            'categorical': categorical, 'has_target': y is not None, 'created': time.time(),
+        }
+        (tmp / 'meta.json').write_text(json.dumps(meta))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.evict(keep=key)
+
+    def get_or_compute(self, input_path: Path, engineer: Optional[FeatureEngineer] = None,
+                       target_col: Optional[str] = 'Fraud_Type') -> Tuple[pd.DataFrame, Optional[np.ndarray]]:
+        engineer = engineer or FeatureEngineer()
+        key = self.key_for(input_path, engineer, target_col)
+        hit = self.load(key)
+        if hit is not None:
+            return hit
+        df = pd.read_csv(input_path, dtype=INGEST_DTYPES)
+        missing = [c for c in RAW_COLUMNS if c not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        X = engineer.fit_transform(df[RAW_COLUMNS]).reset_index(drop=True)
+        y = df[target_col].to_numpy() if target_col and target_col in df.columns else None
+        self.store(key, X, y)
+        return X, y
+
+    def get_or_compute_split(self, input_path: Path, engineer: Optional[FeatureEngineer] = None,
+                             target_col: str = 'Fraud_Type'):
+        # train_and_export's split (split_rows) with each side engineered from its own
+        # rows, as Pipeline.fit and score would: X_train, X_test, y_train, y_test
+        engineer = engineer or FeatureEngineer()
+        key = self.key_for(input_path, engineer, target_col, split=(TEST_SIZE, SPLIT_SEED))
+        train, test = self.load(f'{key}-train'), self.load(f'{key}-test')
+        if train is not None and test is not None:
+            return train[0], test[0], train[1], test[1]
+        X_train, X_test, y_train, y_test = split_rows(pd.read_csv(input_path, dtype=INGEST_DTYPES), target_col)
+        F_train = engineer.fit_transform(X_train).reset_index(drop=True)
+        F_test = engineer.transform(X_test).reset_index(drop=True)
+        self.store(f'{key}-train', F_train, y_train.to_numpy())
+        self.store(f'{key}-test', F_test, y_test.to_numpy())
+        return F_train, F_test, y_train.to_numpy(), y_test.to_numpy()
+
+    def entries(self):
+        if not self.root.exists():
+            return []
+        out = []
+        for entry in self.root.iterdir():
+            meta = entry / 'meta.json'
+            if entry.is_dir() and meta.exists():
+                size = sum(p.stat().st_size for p in entry.iterdir())
+                out.append((meta.stat().st_mtime, size, entry))
+        return sorted(out)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -1,17 +1,20 @@
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, List, Optional, Sequence, Tuple
 import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 import joblib
 import json
 
+from model.sketch import save_reference
+
 CITY_COORDS = {
     'Mumbai': (19.0760, 72.8777),
     'Delhi': (28.7041, 77.1025),
@@ -25,7 +28,26 @@ CITY_COORDS = {
 
 MAX_SPEED_KMH = 1000
 MAX_SPEED_KMS = MAX_SPEED_KMH / 3600
-WINDOW_SIZE = '30min'
+# Look-back windows for the velocity features (count and amount of the user's
+# earlier transactions in [t - window, t)). 30min is the original Txn_Count_30_Min.
+DEFAULT_VELOCITY_WINDOWS = ('5min', '30min', '1h', '24h')
+BASE_NUMERIC_FEATURES = [
+    'Amount',
+    'User_Mean_Amount',
+    'User_Std_Amount',
+    'Time_Since_Last_TXN_Sec',
+    'Time_Since_Last_TXN_Hrs',
+    'Amount_Z_Score',
+    'Geo_Velocity_Check',
+    'Category_Usage_Score'
+]
+MODEL_BACKENDS = ('rf', 'hgb', 'logreg')
+DEFAULT_BACKEND = 'rf'
+# Read key columns as categoricals at ingest so strings are stored once per value
+INGEST_DTYPES = {'UserID': 'category', 'City': 'category', 'Category': 'category'}
+# Held-out split of train_and_export (and the feature cache entries built for it)
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
 
 def haversine_distance(coord1, coord2):
     R = 6371
@@ -37,119 +59,309 @@ def haversine_distance(coord1, coord2):
     c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     return R * c
 
-def _lookback_count(group: pd.DataFrame) -> pd.Series:
-    g = group.sort_values('Timestamp')
-    idx = g.index
-    gi = g.set_index('Timestamp')
-    s = gi['Amount'].rolling(WINDOW_SIZE, closed='left').count().fillna(0)
-    return pd.Series(s.values, index=idx)
-
-def _category_ratio(group: pd.DataFrame) -> pd.Series:
-    g = group.sort_values('Timestamp').copy()
-    cum = pd.Series(range(len(g)), index=g.index).shift(1).fillna(0)
-    g['Count'] = range(len(g))
-    g['Category_Count'] = g.groupby('Category')['Count'].cumcount()
-    g['Past_Category_Count'] = g['Category_Count'].shift(1).fillna(0)
-    eps = 1e-6
-    return g['Past_Category_Count'] / (cum + eps)
+def _window_label(window: pd.Timedelta) -> str:
+    sec = int(window.total_seconds())
+    if sec % 3600 == 0:
+        return f'{sec // 3600}_Hr'
+    if sec % 60 == 0:
+        return f'{sec // 60}_Min'
+    return f'{sec}_Sec'
+
+def velocity_windows(windows: Sequence[str]) -> List[Tuple[str, pd.Timedelta]]:
+    out = []
+    for w in windows:
+        td = pd.Timedelta(w)
+        if td <= pd.Timedelta(0):
+            raise ValueError(f"Velocity window must be positive, got {w!r}")
+        out.append((_window_label(td), td))
+    return out
+
+def velocity_feature_names(windows: Sequence[str] = DEFAULT_VELOCITY_WINDOWS) -> List[str]:
+    names = []
+    for label, _ in velocity_windows(windows):
+        names += [f'Txn_Count_{label}', f'Txn_Amount_{label}']
+    return names
+
+def _velocity(u: np.ndarray, t: np.ndarray, amt: np.ndarray, windows: Sequence[str]) -> dict:
+    # Rows are sorted by (user, time). Each user's timestamps are laid out on one
+    # int64 axis, offset by user code times a stride wider than the time span plus
+    # the longest window, so one global searchsorted never crosses into the
+    # previous user. A window is then one more searchsorted of (key - window) over
+    # the same key array; counts and amount sums are differences of row positions
+    # and of one prefix sum. Ties with the current timestamp are excluded, like the
+    # old rolling(closed='left').
+    spec = velocity_windows(windows)
+    n = len(u)
+    out = {}
+    if n == 0 or not spec:
+        for label, _ in spec:
+            out[f'Txn_Count_{label}'] = np.zeros(0, dtype=np.int32)
+            out[f'Txn_Amount_{label}'] = np.zeros(0)
+        return out
+    t_rel = t - t.min()
+    longest = max(w.value for _, w in spec)
+    n_users = int(u.max()) + 1
+    # Coarsen the time unit (ns, us, ms, s) only when the offsets would overflow
+    for unit in (1, 1_000, 1_000_000, 1_000_000_000):
+        stride = int(t_rel.max()) // unit + longest // unit + 2
+        if n_users * stride < 2 ** 62:
+            break
+    key = u.astype(np.int64) * stride + t_rel // unit
+    hi = np.searchsorted(key, key, side='left')
+    csum = np.zeros(n + 1)
+    np.cumsum(amt, out=csum[1:])
+    for label, w in spec:
+        lo = np.searchsorted(key, key - w.value // unit, side='left')
+        out[f'Txn_Count_{label}'] = (hi - lo).astype(np.int32)
+        out[f'Txn_Amount_{label}'] = csum[hi] - csum[lo]
+    return out
+
+def _city_coords(cities: pd.Categorical):
+    # Per-category coordinates plus a trailing (0, 0) slot, so code -1 (missing city)
+    # indexes it directly; unknown cities map to (0, 0) like CITY_COORDS.get
+    coords = [CITY_COORDS.get(c, (0, 0)) for c in cities.categories] + [(0, 0)]
+    lat, lon = np.array(coords, dtype=np.float64).reshape(-1, 2).T
+    return lat, lon
+
+def _expanding_user_stats(u: np.ndarray, keys: pd.Index, amt: np.ndarray, first: np.ndarray,
+                          prior: Optional[pd.DataFrame] = None):
+    # Past-only per-user mean/std over rows already sorted by (user code, time).
+    # Sums run over deviations from a per-user shift (the prior mean, else the
+    # user's first amount) so the variance does not cancel catastrophically.
+    # `prior` holds per-user aggregates (n, mean, m2) indexed by UserID; it lets a
+    # chunk continue exactly where the previous chunk's user_aggregates left off.
+    n_users = len(keys)
+    n0 = np.zeros(n_users)
+    m2_0 = np.zeros(n_users)
+    shift = amt[first]
+    if prior is not None and len(prior):
+        p = prior.set_axis(prior.index.astype(str)).reindex(keys.astype(str))
+        has = p['n'].fillna(0).to_numpy() > 0
+        n0 = np.where(has, p['n'].to_numpy(dtype=np.float64), 0.0)
+        m2_0 = np.where(has, p['m2'].to_numpy(dtype=np.float64), 0.0)
+        shift = np.where(has, p['mean'].to_numpy(dtype=np.float64), shift)
+    d = amt - shift[u]
+    sums = pd.DataFrame({'UserID': u, 'd': d, 'dd': d * d}, copy=False)
+    inc = sums.groupby('UserID', sort=False)[['d', 'dd']].cumsum().to_numpy()
+    past = np.zeros_like(inc)
+    past[1:] = inc[:-1]
+    past[first] = 0.0
+    pos = np.arange(len(u)) - np.flatnonzero(first)[u]
+    n = n0[u] + pos
+    sd = past[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(n > 0, shift[u] + sd / n, amt)
+        m2 = m2_0[u] + past[:, 1] - sd * sd / np.maximum(n, 1)
+        std = np.sqrt(np.where(n > 1, np.maximum(m2, 0.0) / (n - 1), 0.0))
+
+    last = np.empty_like(first)
+    last[:-1] = first[1:]
+    last[-1:] = True
+    tot_n = n0 + (pos[last] + 1)
+    tot = inc[last]
+    final = pd.DataFrame({
+        'n': tot_n,
+        'mean': shift + tot[:, 0] / tot_n,
+        'm2': m2_0 + tot[:, 1] - tot[:, 0] ** 2 / tot_n,
+    }, index=keys)
+    return mean, std, final
+
+def _sort_by_user_time(X: pd.DataFrame):
+    ts = X['Timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts)
+    ts_ns = ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    # Keys become integer codes once; everything downstream works on codes, not strings
+    user, keys = pd.factorize(X['UserID'])
+    user = user.astype(np.int32)
+    # Stable sort by (user, time); results are scattered back to the caller's order
+    order = np.lexsort((ts_ns, user))
+    u = user[order]
+    first = np.empty(len(u), dtype=bool)
+    first[:1] = True
+    first[1:] = u[1:] != u[:-1]
+    return order, u, pd.Index(keys), ts_ns[order], first
+
+def user_aggregates(X: pd.DataFrame, prior: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    # Per-user (n, mean, m2) after X, carrying forward users only seen in `prior`.
+    # Pass the result as `prior` when transforming the next chunk in expanding mode.
+    order, u, keys, _, first = _sort_by_user_time(X)
+    amt = X['Amount'].to_numpy(dtype=np.float64)[order]
+    final = _expanding_user_stats(u, keys, amt, first, prior)[2]
+    final.index = final.index.astype(str)
+    final.index.name = 'UserID'
+    if prior is not None and len(prior):
+        rest = prior.set_axis(prior.index.astype(str))
+        final = pd.concat([rest[~rest.index.isin(final.index)][['n', 'mean', 'm2']], final])
+    return final
 
 class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        self._numeric_features = [
-            'Amount',
-            'User_Mean_Amount',
-            'User_Std_Amount',
-            'Time_Since_Last_TXN_Sec',
-            'Time_Since_Last_TXN_Hrs',
-            'Amount_Z_Score',
-            'Geo_Velocity_Check',
-            'Txn_Count_30_Min',
-            'Category_Usage_Score'
-        ]
+    # user_stats='batch' describes each user by all of their rows in the frame (the
+    # trained model's definition); 'expanding' uses only rows strictly before each
+    # transaction, optionally continued from prior aggregates (see user_aggregates).
+    # velocity_windows adds Txn_Count_<window> / Txn_Amount_<window> per window.
+    def __init__(self, user_stats: str = 'batch', velocity_windows: Sequence[str] = DEFAULT_VELOCITY_WINDOWS):
+        if user_stats not in ('batch', 'expanding'):
+            raise ValueError(f"user_stats must be 'batch' or 'expanding', got {user_stats!r}")
+        self.user_stats = user_stats
+        self.velocity_windows = tuple(velocity_windows)
         self._categorical_features = ['City', 'Category']
 
+    @property
+    def _numeric_features(self) -> List[str]:
+        # Derived from velocity_windows so set_params() and old pickles stay consistent
+        return BASE_NUMERIC_FEATURES + velocity_feature_names(self.velocity_windows)
+
+    def __setstate__(self, state):
+        # Pipelines pickled before user_stats / velocity_windows existed keep their behaviour
+        super().__setstate__(state)
+        self.__dict__.setdefault('user_stats', 'batch')
+        self.__dict__.setdefault('velocity_windows', ('30min',))
+
     def fit(self, X: pd.DataFrame, y: Optional[pd.Series] = None) -> 'FeatureEngineer':
         return self
 
-    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
-        df = X.copy()
-        if not pd.api.types.is_datetime64_any_dtype(df['Timestamp']):
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-        df = df.sort_values(['UserID', 'Timestamp'])
-        stats = df.groupby('UserID')['Amount'].agg(['mean', 'std']).reset_index()
-        stats.columns = ['UserID', 'User_Mean_Amount', 'User_Std_Amount']
-        df = df.merge(stats, on='UserID', how='left')
-        df['User_Std_Amount'] = df['User_Std_Amount'].fillna(0)
+    def transform(self, X: pd.DataFrame, prior: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         eps = 1e-6
-        df['Amount_Z_Score'] = (df['Amount'] - df['User_Mean_Amount']) / (df['User_Std_Amount'] + eps)
-        df['Prev_Timestamp'] = df.groupby('UserID')['Timestamp'].shift(1)
-        df['Time_Since_Last_TXN_Sec'] = (df['Timestamp'] - df['Prev_Timestamp']).dt.total_seconds().fillna(0)
-        df['Time_Since_Last_TXN_Hrs'] = df['Time_Since_Last_TXN_Sec'] / 3600
-        df['Prev_City'] = df.groupby('UserID')['City'].shift(1)
-        df['Prev_City'] = df['Prev_City'].fillna(df['City'])
-        def _dist_row(row):
-            c1 = CITY_COORDS.get(row['Prev_City'], (0, 0))
-            c2 = CITY_COORDS.get(row['City'], (0, 0))
-            if c1 == (0, 0) or c2 == (0, 0):
-                return 0.0
-            return haversine_distance(c1, c2)
-        df['Distance_Km'] = df.apply(_dist_row, axis=1)
-        df['Min_Travel_Time_Sec'] = df['Distance_Km'] / MAX_SPEED_KMS
-        df['Geo_Velocity_Check'] = df['Min_Travel_Time_Sec'] / (df['Time_Since_Last_TXN_Sec'] + eps)
-        counts = df.groupby('UserID', group_keys=False)[['Timestamp', 'Amount']].apply(_lookback_count)
-        if isinstance(counts, pd.DataFrame):
-            counts = counts.iloc[:, 0]
-        df['Txn_Count_30_Min'] = counts
-        df['Txn_Count_30_Min'] = df['Txn_Count_30_Min'].astype(float).fillna(0).astype(int)
-        cat = df.groupby('UserID', group_keys=False)[['Timestamp', 'Category']].apply(_category_ratio)
-        if isinstance(cat, pd.DataFrame):
-            cat = cat.iloc[:, 0]
-        df['Category_Usage_Score'] = cat
-        df['Category_Usage_Score'] = df['Category_Usage_Score'].clip(upper=1.0)
-        cols = self._numeric_features + self._categorical_features
-        return df[cols].copy()
-
-def build_pipeline() -> Pipeline:
-    numeric = [
-        'Amount',
-        'User_Mean_Amount',
-        'User_Std_Amount',
-        'Time_Since_Last_TXN_Sec',
-        'Time_Since_Last_TXN_Hrs',
-        'Amount_Z_Score',
-        'Geo_Velocity_Check',
-        'Txn_Count_30_Min',
-        'Category_Usage_Score'
-    ]
+        order, u, keys, t, first = _sort_by_user_time(X)
+        city = pd.Categorical(X['City'])
+        category = pd.Categorical(X['Category'])
+        amount = X['Amount'].to_numpy(dtype=np.float64)
+        amt = amount[order]
+        city_codes = city.codes[order]
+        cat_codes = category.codes[order]
+
+        df = pd.DataFrame({'UserID': u, 'Amount': amt, 'Category': cat_codes}, copy=False)
+        by_user = df.groupby('UserID', sort=False)
+        if self.user_stats == 'expanding':
+            user_mean, user_std, _ = _expanding_user_stats(u, keys, amt, first, prior)
+            # No spread yet (first or identical past amounts): no deviation either
+            z = np.where(user_std > 0, (amt - user_mean) / (user_std + eps), 0.0)
+        else:
+            user_mean = by_user['Amount'].transform('mean').to_numpy()
+            user_std = by_user['Amount'].transform('std').fillna(0).to_numpy()
+            z = (amt - user_mean) / (user_std + eps)
+
+        gap = np.zeros(len(u), dtype=np.float64)
+        gap[1:] = (t[1:] - t[:-1]) / 1e9
+        gap[first] = 0.0
+
+        prev_city = np.empty_like(city_codes)
+        prev_city[1:] = city_codes[:-1]
+        prev_city[first] = city_codes[first]
+        lat, lon = _city_coords(city)
+        known = ((lat[city_codes] != 0) | (lon[city_codes] != 0)) & ((lat[prev_city] != 0) | (lon[prev_city] != 0))
+        dist = np.where(
+            known,
+            haversine_distance((lat[prev_city], lon[prev_city]), (lat[city_codes], lon[city_codes])),
+            0.0,
+        )
+        geo = (dist / MAX_SPEED_KMS) / (gap + eps)
+
+        velocity = _velocity(u, t, amt, self.velocity_windows)
+
+        # Category usage: occurrences of the previous row's category before it, over
+        # the number of earlier transactions (legacy Rule_Reason definition)
+        cat_seen = df.groupby(['UserID', 'Category'], sort=False).cumcount().to_numpy()
+        pos = by_user.cumcount().to_numpy()
+        past_cat = np.zeros(len(u), dtype=np.float64)
+        past_cat[1:] = cat_seen[:-1]
+        past_cat[first] = 0.0
+        usage = np.minimum(past_cat / (np.maximum(pos - 1, 0) + eps), 1.0)
+
+        inv = np.empty_like(order)
+        inv[order] = np.arange(len(order))
+        columns = {
+            'Amount': amount,
+            'User_Mean_Amount': user_mean[inv],
+            'User_Std_Amount': user_std[inv],
+            'Time_Since_Last_TXN_Sec': gap[inv],
+            'Time_Since_Last_TXN_Hrs': (gap[inv] / 3600).astype(np.float32),
+            'Amount_Z_Score': z[inv],
+            'Geo_Velocity_Check': geo[inv],
+            'Category_Usage_Score': usage[inv].astype(np.float32),
+        }
+        columns.update({name: values[inv] for name, values in velocity.items()})
+        columns['City'] = city
+        columns['Category'] = category
+        return pd.DataFrame(columns, index=X.index)
+
+def build_pipeline(velocity_windows: Sequence[str] = DEFAULT_VELOCITY_WINDOWS, backend: str = DEFAULT_BACKEND) -> Pipeline:
+    # rf: random forest over one-hot categories (the explainer needs its trees).
+    # hgb: histogram gradient boosting; City/Category go in as ordinal codes and are
+    # split on natively, numeric NaNs are routed by the trees, so no imputing or scaling.
+    # logreg: linear baseline over the same encoding as rf.
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"backend must be one of {MODEL_BACKENDS}, got {backend!r}")
+    numeric = BASE_NUMERIC_FEATURES + velocity_feature_names(velocity_windows)
     categorical = ['City', 'Category']
-    pre = ColumnTransformer(
-        transformers=[
-            ('num', Pipeline(steps=[('imputer', SimpleImputer(strategy='median')), ('scaler', StandardScaler())]), numeric),
-            ('cat', Pipeline(steps=[('imputer', SimpleImputer(strategy='most_frequent')), ('onehot', OneHotEncoder(handle_unknown='ignore'))]), categorical)
-        ],
-        remainder='drop'
-    )
-    clf = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=-1)
-    pipe = Pipeline(steps=[('features', FeatureEngineer()), ('preprocess', pre), ('clf', clf)])
+    if backend == 'hgb':
+        pre = ColumnTransformer(
+            transformers=[
+                ('num', 'passthrough', numeric),
+                ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan), categorical)
+            ],
+            remainder='drop'
+        )
+        cat_idx = list(range(len(numeric), len(numeric) + len(categorical)))
+        clf = HistGradientBoostingClassifier(categorical_features=cat_idx, random_state=42)
+    else:
+        pre = ColumnTransformer(
+            transformers=[
+                ('num', Pipeline(steps=[('imputer', SimpleImputer(strategy='median')), ('scaler', StandardScaler())]), numeric),
+                ('cat', Pipeline(steps=[('imputer', SimpleImputer(strategy='most_frequent')), ('onehot', OneHotEncoder(handle_unknown='ignore'))]), categorical)
+            ],
+            remainder='drop'
+        )
+        if backend == 'logreg':
+            clf = LogisticRegression(max_iter=1000)
+        else:
+            clf = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=-1)
+    pipe = Pipeline(steps=[('features', FeatureEngineer(velocity_windows=velocity_windows)), ('preprocess', pre), ('clf', clf)])
     return pipe
 
-def train_and_export(input_csv: Path, output_pkl: Path) -> dict:
-    df = pd.read_csv(input_csv)
-    req = ['Timestamp', 'UserID', 'Amount', 'City', 'Category', 'Fraud_Type']
+def split_rows(df: pd.DataFrame, target_col: str = 'Fraud_Type'):
+    # Raw rows split before any feature engineering, so the held-out rows never feed
+    # the training rows' per-user stats or velocity counts
+    req = ['Timestamp', 'UserID', 'Amount', 'City', 'Category', target_col]
     missing = [c for c in req if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
-    X = df[['Timestamp', 'UserID', 'Amount', 'City', 'Category']].copy()
-    y = df['Fraud_Type'].copy()
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-    pipe = build_pipeline()
-    pipe.fit(X_train, y_train)
+    y = df[target_col]
+    return train_test_split(df[req[:-1]], y, test_size=TEST_SIZE, random_state=SPLIT_SEED, stratify=y)
+
+def train_and_export(input_csv: Path, output_pkl: Path, cache: Optional[Any] = None, params: Optional[dict] = None,
+                     velocity_windows: Sequence[str] = DEFAULT_VELOCITY_WINDOWS, backend: str = DEFAULT_BACKEND) -> dict:
+    pipe = build_pipeline(velocity_windows, backend)
+    if params:
+        pipe.set_params(**params)
+    if cache is not None:
+        # Reuse the engineered matrices of this file's split; only preprocess + clf are fitted
+        X_train, X_test, y_train, y_test = cache.get_or_compute_split(input_csv, pipe.named_steps['features'])
+        model = pipe[1:]
+        model.fit(X_train, y_train)
+        accuracy = float(model.score(X_test, y_test))
+        train_features = X_train
+    else:
+        X_train, X_test, y_train, y_test = split_rows(pd.read_csv(input_csv, dtype=INGEST_DTYPES))
+        pipe.fit(X_train, y_train)
+        accuracy = float(pipe.score(X_test, y_test))
+        train_features = pipe.named_steps['features'].transform(X_train)
     joblib.dump(pipe, output_pkl)
-    return {'samples_train': len(X_train), 'samples_test': len(X_test), 'model_path': str(output_pkl)}
+    # Training distribution of every engineered feature, for drift monitoring
+    reference = save_reference(train_features, output_pkl)
+    return {'backend': backend, 'samples_train': len(X_train), 'samples_test': len(X_test),
+            'test_accuracy': round(accuracy, 4), 'model_path': str(output_pkl), 'drift_reference': str(reference)}
 
 if __name__ == "__main__":
+    import sys
     base = Path(__file__).parent.parent
+    sys.path.insert(0, str(base))
+    # Import through the package so the pickled FeatureEngineer resolves as
+    # model.feature_pipeline.FeatureEngineer rather than __main__.FeatureEngineer
+    from model.feature_pipeline import train_and_export as _train_and_export
+    from model.feature_cache import FeatureCache
     inp = base / "dummy_train.csv"
     out = Path(__file__).parent / "model.pkl"
-    info = train_and_export(inp, out)
+    info = _train_and_export(inp, out, cache=FeatureCache())
     print(json.dumps(info))
@@ -0,0 +1,78 @@
+import hashlib
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+MODEL_PATH = Path(__file__).parent / "model.pkl"
+
+_lock = Lock()
+_versions: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_pipelines: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+_explainers: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+
+def _stat_key(path: Path) -> Tuple[int, int]:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def model_version(path: Path = MODEL_PATH) -> Optional[str]:
+    # Content hash of the pickled pipeline; stamped on every scored row so a
+    # retrained model can tell which rows are stale.
+    path = Path(path)
+    try:
+        key = _stat_key(path)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _versions.get(str(path))
+        if cached and cached[0] == key:
+            return cached[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    version = h.hexdigest()[:16]
+    with _lock:
+        _versions[str(path)] = (key, version)
+    return version
+
+
+def load_pipeline(path: Path = MODEL_PATH) -> Any:
+    # Deserialise once per file revision instead of on every request
+    import joblib
+    path = Path(path)
+    key = _stat_key(path)
+    with _lock:
+        cached = _pipelines.get(str(path))
+        if cached and cached[0] == key:
+            return cached[1]
+    pipeline = joblib.load(path)
+    with _lock:
+        _pipelines[str(path)] = (key, pipeline)
+    return pipeline
+
+
+def load_explainer(path: Path = MODEL_PATH) -> Optional[Any]:
+    # Contribution tables are built once per file revision, next to the pipeline.
+    # None when the model is not a tree ensemble the explainer understands.
+    from model.explain import ForestExplainer
+    path = Path(path)
+    key = _stat_key(path)
+    with _lock:
+        cached = _explainers.get(str(path))
+        if cached and cached[0] == key:
+            return cached[1]
+    pipeline = load_pipeline(path)
+    explainer = ForestExplainer(pipeline) if ForestExplainer.supports(pipeline) else None
+    with _lock:
+        _explainers[str(path)] = (key, explainer)
+    return explainer
+
+
+def clear() -> None:
+    with _lock:
+        _versions.clear()
+        _pipelines.clear()
+        _explainers.clear()
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# KLL quantile sketch (Karnin, Lang, Liberty 2016). Items live in a stack of
+# compactors; an item at level h stands for 2**h input values. When a level
+# outgrows its capacity it is sorted and every other item (random offset) moves up
+# one level, so memory stays around 3k values however many rows are added, and
+# rank error stays around 1.7/k. Two sketches merge by concatenating levels and
+# compacting, so per-worker sketches can be combined in any order.
+
+DEFAULT_K = 200
+_C = 2.0 / 3.0
+
+
+class KLLSketch:
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = max(8, int(k))
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * _C ** depth)))
+
+    def update(self, values: Iterable[float]) -> None:
+        x = np.asarray(values, dtype=np.float64).ravel()
+        x = x[np.isfinite(x)]
+        if not len(x):
+            return
+        self.n += len(x)
+        self.levels[0] = np.concatenate((self.levels[0], x))
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) >= self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so total weight is preserved
+                keep = items[:1] if len(items) % 2 else items[:0]
+                rest = items[len(keep):]
+                promoted = rest[self._rng.integers(0, 2)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+                # Deeper levels are now bigger relative to their capacity; rescan from the bottom
+                h = 0
+                continue
+            h += 1
+
+    @property
+    def size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def cdf(self, x) -> np.ndarray:
+        # Estimated fraction of input values <= x
+        x = np.asarray(x, dtype=np.float64)
+        if not self.size:
+            return np.full(x.shape, np.nan)
+        values, cum = self._weighted()
+        idx = np.searchsorted(values, x, side='right')
+        out = np.where(idx > 0, cum[np.maximum(idx - 1, 0)], 0.0)
+        return out / cum[-1]
+
+    def quantile(self, q) -> np.ndarray:
+        q = np.asarray(q, dtype=np.float64)
+        if not self.size:
+            return np.full(q.shape, np.nan)
+        values, cum = self._weighted()
+        idx = np.searchsorted(cum, q * cum[-1], side='left')
+        return values[np.minimum(idx, len(values) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KLLSketch':
+        sketch = cls(data.get("k", DEFAULT_K))
+        sketch.n = int(data.get("n", 0))
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data.get("levels", [[]])] or [np.empty(0)]
+        return sketch
+
+
+def ks_distance(a: KLLSketch, b: KLLSketch) -> Optional[float]:
+    # Largest gap between the two estimated CDFs, checked at every retained item
+    if not a.size or not b.size:
+        return None
+    points = np.concatenate(a.levels + b.levels)
+    return float(np.max(np.abs(a.cdf(points) - b.cdf(points))))
+
+
+def sketch_frame(df, columns: Iterable[str], k: int = DEFAULT_K) -> Dict[str, KLLSketch]:
+    out = {}
+    for name in columns:
+        sketch = KLLSketch(k)
+        sketch.update(df[name].to_numpy(dtype=np.float64))
+        out[name] = sketch
+    return out
+
+
+def reference_path(model_path: Path) -> Path:
+    # Training-distribution sketches live next to the model they describe
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}_drift_reference.json")
+
+
+def write_json(path: Path, data: Dict[str, Any]) -> None:
+    # Readers in other processes must never see a half-written file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def save_reference(features_df, model_path: Path, k: int = DEFAULT_K) -> Path:
+    columns = [c for c in features_df.columns if features_df[c].dtype.kind in "biuf"]
+    path = reference_path(model_path)
+    write_json(path, {
+        "rows": len(features_df),
+        "created_at": time.time(),
+        "features": {name: s.to_dict() for name, s in sketch_frame(features_df, columns, k).items()},
+    })
+    return path
+
+
+def load_reference(model_path: Path) -> Optional[Dict[str, Any]]:
+    path = reference_path(model_path)
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text())
+    data["features"] = {name: KLLSketch.from_dict(s) for name, s in data["features"].items()}
+    return data
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    # Allow `python model/train.py` as well as `python -m model.train`
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from threadpoolctl import threadpool_limits
+
+from model.feature_cache import DEFAULT_CACHE_DIR, FeatureCache
+from model.feature_pipeline import (DEFAULT_BACKEND, DEFAULT_VELOCITY_WINDOWS, MODEL_BACKENDS, build_pipeline,
+                                    train_and_export)
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_GRIDS: Dict[str, Dict[str, List[Any]]] = {
+    'rf': {
+        'clf__n_estimators': [50, 100, 200],
+        'clf__max_depth': [None, 12],
+        'clf__min_samples_leaf': [1, 5],
+        'preprocess__num__scaler': ['passthrough'],
+        'preprocess__cat__onehot__min_frequency': [None, 0.01],
+    },
+    'hgb': {
+        'clf__max_iter': [100, 200],
+        'clf__learning_rate': [0.05, 0.1],
+        'clf__max_leaf_nodes': [15, 31],
+        'clf__l2_regularization': [0.0, 1.0],
+    },
+    'logreg': {
+        'clf__C': [0.1, 1.0, 10.0],
+        'clf__class_weight': [None, 'balanced'],
+    },
+}
+LATENCY_REPEATS = 20
+
+
+def _jsonable(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (v if isinstance(v, (int, float, str, bool, type(None))) else str(v)) for k, v in params.items()}
+
+
+def _load_features(cache_root: str, key: str):
+    X, y = FeatureCache(Path(cache_root)).load(key)
+    return X, y
+
+
+def run_trial(cache_root: str, key: str, train_idx: np.ndarray, params: Dict[str, Any], folds: int, seed: int,
+              velocity_windows=DEFAULT_VELOCITY_WINDOWS, backend: str = DEFAULT_BACKEND) -> dict:
+    # Runs in a worker process; the engineered matrix is memory-mapped, not pickled over.
+    # Trials already run in parallel, so each one stays single-threaded: forests via
+    # n_jobs, gradient boosting's OpenMP loops and BLAS via threadpool_limits.
+    with threadpool_limits(limits=1):
+        return _run_trial(cache_root, key, train_idx, params, folds, seed, velocity_windows, backend)
+
+
+def _run_trial(cache_root, key, train_idx, params, folds, seed, velocity_windows, backend) -> dict:
+    X, y = _load_features(cache_root, key)
+    X, y = X.iloc[train_idx], y[train_idx]
+    skf = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    fit_s, batch_ms, single_ms, acc, f1 = [], [], [], [], []
+    for tr, va in skf.split(X, y):
+        model = build_pipeline(velocity_windows, backend)[1:]
+        model.set_params(**params)
+        if backend == 'rf':
+            model.set_params(clf__n_jobs=1)
+        t0 = time.perf_counter()
+        model.fit(X.iloc[tr], y[tr])
+        fit_s.append(time.perf_counter() - t0)
+        X_va = X.iloc[va]
+        t0 = time.perf_counter()
+        pred = model.predict(X_va)
+        batch_ms.append((time.perf_counter() - t0) * 1000.0 / len(va))
+        one = X_va.iloc[:1]
+        samples = []
+        for _ in range(LATENCY_REPEATS):
+            t0 = time.perf_counter()
+            model.predict_proba(one)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        single_ms.append(float(np.median(samples)))
+        acc.append(accuracy_score(y[va], pred))
+        f1.append(f1_score(y[va], pred, average='macro'))
+    return {
+        'params': _jsonable(params),
+        'fit_time_s': round(float(np.mean(fit_s)), 4),
+        'latency_ms_per_row': round(float(np.mean(batch_ms)), 5),
+        'single_row_latency_ms': round(float(np.mean(single_ms)), 3),
+        'accuracy': round(float(np.mean(acc)), 4),
+        'f1_macro': round(float(np.mean(f1)), 4),
+        'f1_macro_std': round(float(np.std(f1)), 4),
+    }
+
+
+def select_trial(trials: List[dict], metric: str, tolerance: float, max_latency_ms: Optional[float]) -> dict:
+    # Latency is a selection criterion, not a tie-breaker: among trials within
+    # `tolerance` of the best score, take the one with the lowest single-row latency.
+    pool = [t for t in trials if max_latency_ms is None or t['single_row_latency_ms'] <= max_latency_ms]
+    if not pool:
+        raise ValueError(f"No trial meets the latency budget of {max_latency_ms} ms")
+    best = max(t[metric] for t in pool)
+    eligible = [t for t in pool if t[metric] >= best - tolerance]
+    return min(eligible, key=lambda t: (t['single_row_latency_ms'], -t[metric]))
+
+
+def search(input_csv: Path, grid: Dict[str, List[Any]], folds: int = 5, workers: Optional[int] = None,
+           cache: Optional[FeatureCache] = None, seed: int = 42, velocity_windows=DEFAULT_VELOCITY_WINDOWS,
+           backend: str = DEFAULT_BACKEND) -> dict:
+    cache = cache or FeatureCache()
+    engineer = build_pipeline(velocity_windows, backend).named_steps['features']
+    X, y = cache.get_or_compute(input_csv, engineer)
+    if y is None:
+        raise ValueError("Missing required columns: ['Fraud_Type']")
+    key = cache.key_for(input_csv, engineer, 'Fraud_Type')
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=seed, stratify=y)
+    combos = list(ParameterGrid(grid))
+    workers = workers or min(len(combos), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_trial, str(cache.root), key, train_idx, p, folds, seed, velocity_windows, backend)
+                   for p in combos]
+        trials = [f.result() for f in futures]
+    for p, t in zip(combos, trials):
+        t['_params'] = p
+    return {'trials': trials, 'samples_train': len(train_idx), 'samples_test': len(test_idx)}
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search and model export")
+    parser.add_argument('--input', type=Path, default=BASE_DIR / 'dummy_train.csv')
+    parser.add_argument('--output', type=Path, default=Path(__file__).parent / 'model.pkl')
+    parser.add_argument('--grid', help="JSON object (or path to a JSON file) mapping pipeline params to value lists")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--metric', choices=['f1_macro', 'accuracy'], default='f1_macro')
+    parser.add_argument('--tolerance', type=float, default=0.01, help="Score slack traded for lower latency")
+    parser.add_argument('--max-latency-ms', type=float, default=None, help="Single-row latency budget")
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--report', type=Path, help="Write the full trial report as JSON")
+    parser.add_argument('--no-export', action='store_true')
+    parser.add_argument('--windows', default=','.join(DEFAULT_VELOCITY_WINDOWS),
+                        help="Comma-separated velocity look-back windows, e.g. 5min,30min,1h,24h")
+    parser.add_argument('--backend', choices=MODEL_BACKENDS, default=DEFAULT_BACKEND,
+                        help="Classifier: random forest, histogram gradient boosting or logistic regression")
+    args = parser.parse_args(argv)
+    windows = tuple(w.strip() for w in args.windows.split(',') if w.strip())
+
+    grid = DEFAULT_GRIDS[args.backend]
+    if args.grid:
+        raw = Path(args.grid).read_text() if Path(args.grid).exists() else args.grid
+        grid = json.loads(raw)
+
+    cache = FeatureCache(args.cache_dir)
+    result = search(args.input, grid, args.folds, args.workers, cache, velocity_windows=windows, backend=args.backend)
+    trials = result['trials']
+    chosen = select_trial(trials, args.metric, args.tolerance, args.max_latency_ms)
+
+    for t in sorted(trials, key=lambda t: -t[args.metric]):
+        mark = '*' if t is chosen else ' '
+        print(f"{mark} {args.metric}={t[args.metric]:.4f} acc={t['accuracy']:.4f} "
+              f"fit={t['fit_time_s']:.2f}s row={t['latency_ms_per_row']:.4f}ms "
+              f"single={t['single_row_latency_ms']:.2f}ms {t['params']}", file=sys.stderr)
+
+    report = {
+        'metric': args.metric,
+        'backend': args.backend,
+        'velocity_windows': list(windows),
+        'chosen': {k: v for k, v in chosen.items() if k != '_params'},
+        'trials': [{k: v for k, v in t.items() if k != '_params'} for t in trials],
+    }
+    if not args.no_export:
+        report['export'] = train_and_export(args.input, args.output, cache=cache, params=chosen['_params'],
+                                            velocity_windows=windows, backend=args.backend)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+    print(json.dumps({'chosen': report['chosen'], 'export': report.get('export')}))
+    return report
+
+
+if __name__ == "__main__":
+    main()
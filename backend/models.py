@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Integer, Float, Boolean, DateTime
+from sqlalchemy import String, Integer, Float, Boolean, DateTime, Index, Text
 from datetime import datetime
 
 class Base(DeclarativeBase):
@@ -14,6 +14,8 @@ class User(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    # Per-user history lookups (/predict) and user-keyset scans (rescore, export)
+    __table_args__ = (Index("ix_transactions_user_id_timestamp", "user_id", "timestamp"),)
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime, index=True)
     amount: Mapped[float] = mapped_column(Float)
@@ -26,6 +28,20 @@ class Transaction(Base):
     flag_reason: Mapped[str] = mapped_column(String(1000), nullable=True)
     is_training_data: Mapped[bool] = mapped_column(Boolean, default=False)
     notification_sent: Mapped[bool] = mapped_column(Boolean, default=False)
+    model_version: Mapped[str] = mapped_column(String(64), nullable=True, index=True)  # registry.model_version() that scored the row
+    batch_id: Mapped[str] = mapped_column(String(64), nullable=True, index=True)  # UploadBatch.id for /upload rows
+    explanation: Mapped[str] = mapped_column(String(2000), nullable=True)  # JSON feature contributions (/upload?explain=true)
+    dedup_key: Mapped[str] = mapped_column(String(32), nullable=True, unique=True, index=True)  # dedup.dedup_key; NULL for flagged duplicates
+
+class UploadBatch(Base):
+    __tablename__ = "upload_batches"
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=True)
+    uploaded_by: Mapped[str] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    flagged: Mapped[int] = mapped_column(Integer, default=0)
+    model_version: Mapped[str] = mapped_column(String(64), nullable=True)
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -37,3 +53,19 @@ class AuditLog(Base):
     resource_id: Mapped[str] = mapped_column(String(255), nullable=True)
     details: Mapped[str] = mapped_column(String(2000), nullable=True)
 
+class IngestOffset(Base):
+    # Consumer position per ingest source, committed with the rows it covers
+    __tablename__ = "ingest_offsets"
+    source: Mapped[str] = mapped_column(String(512), primary_key=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)  # byte offset (files) or line count (streams)
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class SketchState(Base):
+    # Serialized summaries shared by every worker (heavy_hitters); version guards concurrent merges
+    __tablename__ = "sketch_states"
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    data: Mapped[str] = mapped_column(Text, nullable=True)  # JSON; NULL once invalidated, rebuilt on next read
+    rebuilt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
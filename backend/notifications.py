@@ -0,0 +1,234 @@
+import asyncio
+import json
+import smtplib
+import time
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update
+
+from config import settings
+from database import SessionLocal
+from models import Transaction
+
+# Analyst alerts. Endpoints only enqueue (recipient, transaction ids); one asyncio
+# worker per process waits a short window so bursts coalesce into one digest per
+# recipient, sends through the configured transport under a token-bucket rate
+# limit, and marks everything it sent with a few batched UPDATEs.
+
+UPDATE_CHUNK = 500
+MAX_ATTEMPTS = 3
+DIGEST_MAX_LINES = 200  # longer digests list the first rows and a count
+
+
+@dataclass
+class Digest:
+    recipient: str
+    subject: str
+    body: str
+    transaction_ids: List[str] = field(default_factory=list)
+
+
+class LogTransport:
+    async def send(self, digest: Digest) -> None:
+        print(f"Sending email to {digest.recipient}: {digest.subject}")
+
+
+class MemoryTransport:
+    # Keeps digests in memory; used by tests and local development
+    def __init__(self):
+        self.sent: List[Digest] = []
+
+    async def send(self, digest: Digest) -> None:
+        self.sent.append(digest)
+
+
+class SmtpTransport:
+    def __init__(self, host: str, port: int, sender: str):
+        self.host, self.port, self.sender = host, port, sender
+
+    def _send_sync(self, digest: Digest) -> None:
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = digest.recipient
+        msg["Subject"] = digest.subject
+        msg.set_content(digest.body)
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(msg)
+
+    async def send(self, digest: Digest) -> None:
+        await asyncio.to_thread(self._send_sync, digest)
+
+
+def make_transport(name: Optional[str] = None):
+    name = (name or settings.NOTIFY_TRANSPORT).lower()
+    if name == "smtp":
+        return SmtpTransport(settings.SMTP_HOST, settings.SMTP_PORT, settings.SMTP_FROM)
+    if name == "memory":
+        return MemoryTransport()
+    if name == "log":
+        return LogTransport()
+    raise ValueError(f"Unknown notification transport: {name}")
+
+
+class RateLimiter:
+    # Token bucket: `rate` sends per second with bursts of up to `burst`
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _load_rows(ids: List[str]) -> List[Any]:
+    rows: List[Any] = []
+    with SessionLocal() as db:
+        for i in range(0, len(ids), UPDATE_CHUNK):
+            rows.extend(db.execute(
+                select(Transaction.id, Transaction.timestamp, Transaction.amount, Transaction.user_id,
+                       Transaction.city, Transaction.flag_type, Transaction.risk_score)
+                .where(Transaction.id.in_(ids[i:i + UPDATE_CHUNK]))
+            ).all())
+    rows.sort(key=lambda r: (r.timestamp is None, r.timestamp))
+    return rows
+
+
+def _mark_sent(ids: List[str]) -> None:
+    with SessionLocal() as db:
+        for i in range(0, len(ids), UPDATE_CHUNK):
+            db.execute(
+                update(Transaction).where(Transaction.id.in_(ids[i:i + UPDATE_CHUNK])).values(notification_sent=True),
+                execution_options={"synchronize_session": False},
+            )
+        db.commit()
+
+
+def _primary_flag(flag_type: Optional[str]) -> str:
+    if flag_type and flag_type.startswith("["):
+        try:
+            flags = json.loads(flag_type)
+            return flags[0].get("type", "") if flags else ""
+        except ValueError:
+            pass
+    return flag_type or ""
+
+
+def build_digest(recipient: str, rows: List[Any]) -> Digest:
+    n = len(rows)
+    subject = f"Anomalyse alert: {n} flagged transaction{'s' if n != 1 else ''}"
+    lines = [f"{n} transaction(s) need review:", ""]
+    for r in rows[:DIGEST_MAX_LINES]:
+        ts = r.timestamp.isoformat() if r.timestamp else ""
+        lines.append(f"- {r.id}  {ts}  {float(r.amount or 0):.2f}  user {r.user_id}  {r.city}  "
+                     f"{_primary_flag(r.flag_type) or 'flagged'} (risk {r.risk_score})")
+    if n > DIGEST_MAX_LINES:
+        lines.append(f"... and {n - DIGEST_MAX_LINES} more")
+    return Digest(recipient, subject, "\n".join(lines) + "\n", [r.id for r in rows])
+
+
+class NotificationDispatcher:
+    def __init__(self, transport=None, rate_per_sec: Optional[float] = None, burst: Optional[int] = None,
+                 window_sec: Optional[float] = None):
+        self.transport = transport or make_transport()
+        self.limiter = RateLimiter(
+            settings.NOTIFY_RATE_PER_SEC if rate_per_sec is None else rate_per_sec,
+            settings.NOTIFY_BURST if burst is None else burst,
+        )
+        self.window_sec = settings.NOTIFY_DIGEST_WINDOW_SEC if window_sec is None else window_sec
+        self._pending: Dict[str, Dict[str, int]] = {}  # recipient -> {txn id: attempts}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {"queued": 0, "sent": 0, "digests": 0, "failed": 0}
+
+    @property
+    def pending(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    def enqueue(self, recipient: str, transaction_ids: Iterable[str]) -> int:
+        bucket = self._pending.setdefault(recipient, {})
+        added = 0
+        for tid in transaction_ids:
+            if tid not in bucket:
+                bucket[tid] = 0
+                added += 1
+        self.stats["queued"] += added
+        if self._wake is not None:
+            self._wake.set()
+        return added
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            if self._pending:
+                self._wake.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, drain: bool = True) -> None:
+        # The worker is never cancelled mid-send; it finishes the round, flushing
+        # whatever is still queued when drain is set.
+        if self._task is None:
+            return
+        if not drain:
+            self._pending = {}
+        self._stopping = True
+        self._wake.set()
+        task, self._task = self._task, None
+        await task
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            if not self._stopping:
+                # Let a burst of enqueues settle into one digest per recipient
+                await asyncio.sleep(self.window_sec)
+            self._wake.clear()
+            await self.flush()
+            if self._stopping:
+                return
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, {}
+        sent_ids: List[str] = []
+        try:
+            for recipient, ids in batch.items():
+                rows = await asyncio.to_thread(_load_rows, list(ids))
+                if not rows:
+                    continue
+                digest = build_digest(recipient, rows)
+                await self.limiter.acquire()
+                try:
+                    await self.transport.send(digest)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    print(f"Notification to {recipient} failed: {e}")
+                    retry = self._pending.setdefault(recipient, {})
+                    for tid, attempts in ids.items():
+                        if attempts + 1 < MAX_ATTEMPTS:
+                            retry.setdefault(tid, attempts + 1)
+                    if self._wake is not None and retry:
+                        self._wake.set()
+                    continue
+                sent_ids.extend(digest.transaction_ids)
+                self.stats["digests"] += 1
+                self.stats["sent"] += len(digest.transaction_ids)
+        finally:
+            if sent_ids:
+                await asyncio.to_thread(_mark_sent, sent_ids)
+
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+import dedup
+import heavy_hitters
+from database import SessionLocal
+from models import Transaction
+from model import registry
+from scoring import flags_to_columns, risk_scores, rule_flags
+
+DEFAULT_CHUNK_ROWS = 5000
+USER_PAGE = 1000  # stale user ids read per chunk
+DEFAULT_CHECKPOINT = Path(__file__).parent / "rescore_checkpoint.json"
+_COLUMNS = [
+    Transaction.id, Transaction.timestamp, Transaction.user_id, Transaction.amount,
+    Transaction.city, Transaction.category, Transaction.model_version, Transaction.dedup_key, Transaction.flag_type,
+]
+_ORDER = (Transaction.user_id, Transaction.timestamp, Transaction.id)
+
+
+def _stale(version: str, force: bool):
+    if force:
+        return Transaction.id.isnot(None)
+    return or_(Transaction.model_version.is_(None), Transaction.model_version != version)
+
+
+def _fetch_chunk(db: Session, stale, after: Optional[str], limit: int) -> List[Any]:
+    # Keyset over whole users: the next stale user ids after `after` come off the
+    # (user_id, timestamp) index, then every row of those users is loaded, so
+    # features see the same history a full pass would. Users are taken until the
+    # chunk would pass `limit` rows; a user larger than that is a chunk of its own.
+    users_q = select(Transaction.user_id).where(stale).distinct()
+    if after is not None:
+        users_q = users_q.where(Transaction.user_id > after)
+    users = db.scalars(users_q.order_by(Transaction.user_id).limit(min(limit, USER_PAGE))).all()
+    if not users:
+        return []
+    counts = dict(db.execute(
+        select(Transaction.user_id, func.count()).where(Transaction.user_id.in_(users)).group_by(Transaction.user_id)
+    ).all())
+    take, total = [], 0
+    for user in users:
+        if take and total + counts[user] > limit:
+            break
+        take.append(user)
+        total += counts[user]
+    return db.execute(select(*_COLUMNS).where(Transaction.user_id.in_(take)).order_by(*_ORDER)).all()
+
+
+def _score_chunk(pipeline: Any, rows: List[Any]):
+    import pandas as pd
+    df = pd.DataFrame({
+        "Timestamp": [r.timestamp for r in rows],
+        "UserID": [r.user_id for r in rows],
+        "Amount": [r.amount for r in rows],
+        "City": [r.city for r in rows],
+        "Category": [r.category for r in rows],
+    })
+    return risk_scores(pipeline, df), rule_flags(df)
+
+
+def _read_checkpoint(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def rescore(
+    model_path: Path = registry.MODEL_PATH,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    max_rows_per_sec: Optional[float] = None,
+    pause_sec: float = 0.0,
+    checkpoint: Optional[Path] = DEFAULT_CHECKPOINT,
+    restart: bool = False,
+    force: bool = False,
+    session_factory: Callable[[], Session] = SessionLocal,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    pipeline = registry.load_pipeline(model_path)
+    version = registry.model_version(model_path)
+    stale = _stale(version, force)
+
+    state = {"version": version, "force": force, "last_user_id": None, "rows_updated": 0, "rows_scored": 0, "chunks": 0}
+    if checkpoint is not None and not restart:
+        saved = _read_checkpoint(checkpoint)
+        if saved.get("version") == version and saved.get("force") == force:
+            state.update(saved)
+            log(f"Resuming after user {state['last_user_id']!r} ({state['rows_updated']} rows already updated)")
+
+    started = time.monotonic()
+    scored_this_run = 0
+    while True:
+        with session_factory() as db:
+            rows = _fetch_chunk(db, stale, state["last_user_id"], chunk_rows)
+            if not rows:
+                break
+            risks, flags = _score_chunk(pipeline, rows)
+            updates = [
+                # A stored explanation describes the old model's score; /upload?explain=true makes a new one
+                {"id": r.id, "risk_score": int(risk), "model_version": version, "explanation": None,
+                 **dedup.rescored_columns(flags_to_columns(f), r.dedup_key, r.flag_type)}
+                for r, risk, f in zip(rows, risks, flags)
+                if force or r.model_version != version
+            ]
+            if updates:
+                db.execute(update(Transaction), updates)
+            db.commit()
+        state["last_user_id"] = rows[-1].user_id
+        state["rows_updated"] += len(updates)
+        state["rows_scored"] += len(rows)
+        state["chunks"] += 1
+        scored_this_run += len(rows)
+        if checkpoint is not None:
+            _write_checkpoint(checkpoint, state)
+        log(f"chunk {state['chunks']}: scored {len(rows)} rows, updated {len(updates)} (through user {state['last_user_id']!r})")
+
+        # Throttle so a large re-score does not starve the API of the database
+        if max_rows_per_sec:
+            ahead = scored_this_run / max_rows_per_sec - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+        if pause_sec:
+            time.sleep(pause_sec)
+
+    if checkpoint is not None and checkpoint.exists():
+        checkpoint.unlink()
+    if state["rows_updated"]:
+        heavy_hitters.store.invalidate()  # statuses moved, so the flagged_* summaries did too
+    state["elapsed_s"] = round(time.monotonic() - started, 3)
+    return state
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-score stored transactions with the current model")
+    parser.add_argument("--model", type=Path, default=registry.MODEL_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--max-rows-per-sec", type=float, default=None)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    parser.add_argument("--force", action="store_true", help="Re-score rows already stamped with this model")
+    args = parser.parse_args(argv)
+    stats = rescore(args.model, args.chunk_rows, args.max_rows_per_sec, args.pause, args.checkpoint, args.restart, args.force)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
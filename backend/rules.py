@@ -0,0 +1,148 @@
+import json
+import operator
+import string
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Declarative rule engine. A rule fires when any of its clause groups holds, and a
+# group holds when all of its clauses do. Each clause compares one engineered
+# feature column with a constant, so a whole frame is evaluated as NumPy boolean
+# masks and the result is packed into one bitmask per row (bit i = rule i).
+#
+# Rules can be replaced without code changes by pointing RULES_PATH at a JSON
+# file of the form {"rules": [...]} using the same shape as DEFAULT_RULES.
+
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {
+        # Fast Location: mirror Rule_Reason pattern from ML_Model_Final_.ipynb
+        # Geo velocity > 1 implies required travel time exceeds observed gap
+        "type": "Fast Location",
+        "any": [[{"feature": "Geo_Velocity_Check", "op": ">", "value": 1.0}]],
+        "reason": "Geospatial anomaly: travel too fast (ratio {Geo_Velocity_Check:.2f}).",
+    },
+    {
+        # High Value: extreme z-score or absolute amount threshold
+        "type": "High Value",
+        "any": [
+            [{"feature": "Amount_Z_Score", "op": ">=", "value": 3.0}],
+            [{"feature": "Amount", "op": ">=", "value": 100000}],
+        ],
+        "reason": "Amount deviation detected (z-score {Amount_Z_Score:.2f}).",
+    },
+    {
+        # Velocity: only flag time differences > 0 and < 10 seconds
+        "type": "Velocity",
+        "any": [[
+            {"feature": "Time_Since_Last_TXN_Sec", "op": ">", "value": 0.0},
+            {"feature": "Time_Since_Last_TXN_Sec", "op": "<", "value": 10.0},
+        ]],
+        "reason": "last gap {Time_Since_Last_TXN_Sec!i}s between consecutive transactions.",
+    },
+]
+
+OPS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class _ReasonFormatter(string.Formatter):
+    # Adds a `!i` conversion (truncate to int) for templates such as "{gap!i}s"
+    def convert_field(self, value, conversion):
+        if conversion == "i":
+            return int(value)
+        return super().convert_field(value, conversion)
+
+
+_formatter = _ReasonFormatter()
+
+
+class RuleEngine:
+    def __init__(self, rules: Sequence[Dict[str, Any]] = DEFAULT_RULES):
+        if len(rules) > 32:
+            raise ValueError("At most 32 rules are supported")
+        for rule in rules:
+            for group in rule["any"]:
+                for clause in group:
+                    if clause["op"] not in OPS:
+                        raise ValueError(f"Unknown operator {clause['op']!r} in rule {rule['type']!r}")
+        self.rules = list(rules)
+        self.types = [r["type"] for r in self.rules]
+        self.features = sorted({c["feature"] for r in self.rules for g in r["any"] for c in g})
+        self._reason_fields = [
+            [name for _, name, _, _ in _formatter.parse(r.get("reason", "")) if name]
+            for r in self.rules
+        ]
+
+    def _column(self, frame: Mapping[str, Any], name: str, n: int) -> np.ndarray:
+        if name not in frame:
+            return np.zeros(n)
+        return np.asarray(frame[name], dtype=float)
+
+    def evaluate(self, frame: Mapping[str, Any]) -> np.ndarray:
+        n = len(next(iter(frame.values()))) if isinstance(frame, dict) else len(frame)
+        cols = {name: self._column(frame, name, n) for name in self.features}
+        bits = np.zeros(n, dtype=np.uint32)
+        for i, rule in enumerate(self.rules):
+            fired = np.zeros(n, dtype=bool)
+            for group in rule["any"]:
+                ok = np.ones(n, dtype=bool)
+                for clause in group:
+                    ok &= OPS[clause["op"]](cols[clause["feature"]], clause["value"])
+                fired |= ok
+            bits |= fired.astype(np.uint32) << np.uint32(i)
+        return bits
+
+    def masks(self, frame: Mapping[str, Any], bits: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        bits = self.evaluate(frame) if bits is None else bits
+        return {t: (bits >> np.uint32(i)) & 1 == 1 for i, t in enumerate(self.types)}
+
+    def flags(self, frame: Mapping[str, Any], bits: Optional[np.ndarray] = None) -> List[List[Dict[str, str]]]:
+        bits = self.evaluate(frame) if bits is None else bits
+        out: List[List[Dict[str, str]]] = [[] for _ in range(len(bits))]
+        n = len(bits)
+        # Reason strings are only built for the (few) rows that fired
+        for i, rule in enumerate(self.rules):
+            rows = np.flatnonzero((bits >> np.uint32(i)) & 1)
+            if not len(rows):
+                continue
+            fields = {name: self._column(frame, name, n)[rows] for name in self._reason_fields[i]}
+            template = rule.get("reason", rule["type"])
+            for k, r in enumerate(rows):
+                values = {name: float(arr[k]) for name, arr in fields.items()}
+                out[r].append({"type": rule["type"], "reason": _formatter.format(template, **values)})
+        return out
+
+
+def load_rules(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_RULES
+    data = json.loads(Path(path).read_text())
+    return data["rules"] if isinstance(data, dict) else data
+
+
+_engine: Optional[RuleEngine] = None
+_engine_lock = Lock()
+
+
+def get_engine() -> RuleEngine:
+    global _engine
+    if _engine is None:
+        from config import settings
+        with _engine_lock:
+            if _engine is None:
+                _engine = RuleEngine(load_rules(settings.RULES_PATH))
+    return _engine
+
+
+def reset_engine() -> None:
+    global _engine
+    with _engine_lock:
+        _engine = None
@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Scoring shared by /upload, /predict and the offline jobs (rescore). pandas and
+# the feature pipeline are imported lazily to keep API startup cheap.
+
+# Every status that needs an analyst's attention, for counts, filters and reports:
+# rule hits, legacy labels and duplicates held for review (dedup.DUPLICATE_STATUS)
+REVIEW_STATUS = "Review"
+FLAGGED_STATUSES = ("Suspicious", "Fake/Suspicious", REVIEW_STATUS)
+
+
+def compute_rule_reasons(features_row: dict, amount: float) -> List[Dict[str, str]]:
+    # Single-row entry point kept for /predict and existing callers
+    from rules import get_engine
+    engine = get_engine()
+    frame = {}
+    for name in engine.features:
+        try:
+            frame[name] = [float(features_row.get(name, 0))]
+        except (TypeError, ValueError):
+            frame[name] = [0.0]
+    frame['Amount'] = [float(amount)]
+    return engine.flags(frame)[0]
+
+
+def _risk_from_probs(probs, classes) -> List[float]:
+    import numpy as np
+    probs = np.asarray(probs, dtype=float)
+    classes = list(classes)
+    if 0 in classes:
+        safe = probs[:, classes.index(0)]
+    else:
+        safe = np.zeros(len(probs))
+    return [round(float(r), 2) for r in (1.0 - safe) * 100.0]
+
+
+def risk_scores(pipeline: Any, df) -> List[float]:
+    return _risk_from_probs(pipeline.predict_proba(df), pipeline.classes_)
+
+
+def _explained_probs(pipeline: Any, explainer: Any, df, top: Optional[int], tail: Optional[int]):
+    # The pipeline run step by step so the explainer reuses the preprocessed matrix
+    # the forest was given. `tail` scores only the last rows.
+    features = pipeline.named_steps['features'].transform(df)
+    if tail:
+        features = features.iloc[-tail:]
+    Xt = pipeline.named_steps['preprocess'].transform(features)
+    clf = pipeline.named_steps['clf']
+    return clf.predict_proba(Xt), clf.classes_, explainer.explain(Xt, features, top)
+
+
+def explained_risk_scores(pipeline: Any, explainer: Any, df, top: Optional[int] = None,
+                          tail: Optional[int] = None) -> Tuple[List[float], List[Dict[str, Any]]]:
+    # Same scores as risk_scores, with an explanation per scored row
+    probs, classes, explanations = _explained_probs(pipeline, explainer, df, top, tail)
+    return _risk_from_probs(probs, classes), explanations
+
+
+def predict_row(pipeline: Any, df, explainer: Any = None,
+                top: Optional[int] = None) -> Tuple[float, bool, Optional[Dict[str, Any]]]:
+    # The last row of df (the /predict row after its history context): risk score,
+    # whether the predicted class is a fraud type, and its explanation if an
+    # explainer is given. One predict_proba serves all three.
+    import numpy as np
+    if explainer is not None:
+        probs, classes, (explanation,) = _explained_probs(pipeline, explainer, df, top, tail=1)
+    else:
+        probs, classes, explanation = np.asarray(pipeline.predict_proba(df))[-1:], pipeline.classes_, None
+    pred = list(classes)[int(np.argmax(probs[0]))]
+    return _risk_from_probs(probs, classes)[0], bool(pred != 0), explanation
+
+
+def rule_flags(df, features_df=None) -> List[List[Dict[str, str]]]:
+    from rules import get_engine
+    if features_df is None:
+        from model.feature_pipeline import FeatureEngineer
+        features_df = FeatureEngineer().fit_transform(df)
+    # One vectorised pass over the whole frame; rules read the raw amount
+    frame = {name: features_df[name].to_numpy() for name in features_df.columns}
+    frame['Amount'] = df['Amount'].astype(float).to_numpy()
+    return get_engine().flags(frame)
+
+
+def flags_to_columns(flags: List[Dict[str, str]]) -> Dict[str, Optional[str]]:
+    return {
+        "status": "Suspicious" if flags else "Safe",
+        "flag_type": json.dumps(flags) if flags else None,
+        "flag_reason": None,
+    }
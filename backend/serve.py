@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Pre-fork launcher for Linux deployments. The master creates the schema once,
+# imports the app, loads the model pipeline and runs one prediction so pandas,
+# scikit-learn and the rule engine are initialised, then gc.freeze()s the heap
+# and forks the workers. Every worker starts with the warmed model already in
+# memory, and because frozen objects are never touched by the cyclic collector
+# those pages stay shared copy-on-write instead of being copied into each worker.
+#
+#   SIGHUP   reload model.pkl in the master, then roll the workers one at a time
+#            (the replacement reports ready before the old worker is drained)
+#   SIGUSR1  log the per-worker memory report now
+#   SIGTERM  graceful shutdown (SIGINT too)
+#
+# Workers are recycled after --max-requests (with jitter) or --max-age seconds.
+# Windows has no fork(); use `uvicorn main:app` there.
+
+DEFAULT_WORKERS = 2
+DEFAULT_GRACEFUL_TIMEOUT = 30
+READY_TIMEOUT_SEC = 60
+TICK_SEC = 0.2
+SHUTDOWN_DRAIN_SEC = 0.5
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def _log(msg: str) -> None:
+    print(f"[serve {os.getpid()}] {msg}", file=sys.stderr, flush=True)
+
+
+def parse_smaps(text: str) -> Dict[str, int]:
+    # smaps_rollup has one line per field; plain smaps repeats them per mapping
+    out = dict.fromkeys(SMAPS_FIELDS, 0)
+    for line in text.splitlines():
+        key, _, rest = line.partition(":")
+        if key in out:
+            out[key] += int(rest.split()[0])
+    return out
+
+
+def smaps(pid: int) -> Optional[Dict[str, int]]:
+    for name in ("smaps_rollup", "smaps"):  # smaps_rollup needs Linux 4.14+
+        try:
+            with open(f"/proc/{pid}/{name}") as fh:
+                return parse_smaps(fh.read())
+        except FileNotFoundError:
+            continue
+        except (PermissionError, ProcessLookupError):
+            return None
+    return None
+
+
+def memory_report(pids: List[int]) -> List[Dict[str, float]]:
+    report = []
+    for pid in pids:
+        m = smaps(pid)
+        if m is None:
+            continue
+        shared = m["Shared_Clean"] + m["Shared_Dirty"]
+        report.append({
+            "pid": pid,
+            "rssKb": m["Rss"],
+            "pssKb": m["Pss"],
+            "sharedKb": shared,
+            "privateKb": m["Private_Clean"] + m["Private_Dirty"],
+            "sharedRatio": round(shared / m["Rss"], 3) if m["Rss"] else 0.0,
+        })
+    return report
+
+
+def warm_model() -> Optional[str]:
+    # Load the pipeline into the registry cache and push one row through the same
+    # code /predict and /upload use, so lazy imports happen before the fork
+    import pandas as pd
+    from model import registry
+    from scoring import risk_scores, rule_flags
+
+    registry.clear()
+    try:
+        pipeline = registry.load_pipeline(registry.MODEL_PATH)
+    except FileNotFoundError:
+        _log(f"no model at {registry.MODEL_PATH}; workers will load it on first use")
+        return None
+    df = pd.DataFrame([{
+        "Timestamp": pd.Timestamp("2024-01-01 12:00:00"), "UserID": "warmup",
+        "Amount": 100.0, "City": "Mumbai", "Category": "Food",
+    }])
+    risk_scores(pipeline, df)
+    rule_flags(df)
+    registry.load_explainer(registry.MODEL_PATH)  # contribution tables, shared with the workers too
+    return registry.model_version(registry.MODEL_PATH)
+
+
+@dataclass
+class Worker:
+    pid: int
+    started: float
+    max_requests: Optional[int]
+    retire_deadline: Optional[float] = None
+
+
+class Arbiter:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, workers: int = DEFAULT_WORKERS,
+                 max_requests: Optional[int] = None, max_requests_jitter: int = 0,
+                 max_age: Optional[float] = None, graceful_timeout: int = DEFAULT_GRACEFUL_TIMEOUT,
+                 stats_interval: float = 60.0, log_level: str = "info"):
+        self.host, self.port = host, port
+        self.num_workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_age = max_age
+        self.graceful_timeout = graceful_timeout
+        self.stats_interval = stats_interval
+        self.log_level = log_level
+        self.workers: Dict[int, Worker] = {}
+        self.model_version: Optional[str] = None
+        self.sock: Optional[socket.socket] = None
+        self._signals: List[int] = []
+
+    # -- master -----------------------------------------------------------------
+
+    def run(self) -> int:
+        from init_db import init_db
+        import main  # noqa: F401  (imported here so every worker inherits it)
+
+        init_db(force=True)
+        self.sock = self._bind()
+        self._load_model()
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+            signal.signal(sig, self._on_signal)
+        _log(f"listening on http://{self.host}:{self.port} with {self.num_workers} workers")
+
+        for _ in range(self.num_workers):
+            self._spawn()
+        next_report = time.monotonic() + self.stats_interval if self.stats_interval > 0 else None
+        while True:
+            self._reap()
+            while self._signals:
+                sig = self._signals.pop(0)
+                if sig in (signal.SIGTERM, signal.SIGINT):
+                    return self._shutdown()
+                if sig == signal.SIGHUP:
+                    self._reload()
+                elif sig == signal.SIGUSR1:
+                    self._report()
+            self._recycle_old()
+            self._kill_overdue()
+            while len(self._serving()) < self.num_workers:
+                self._spawn()
+            if next_report is not None and time.monotonic() >= next_report:
+                self._report()
+                next_report = time.monotonic() + self.stats_interval
+            time.sleep(TICK_SEC)
+
+    def _on_signal(self, sig, frame) -> None:
+        self._signals.append(sig)
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.port = sock.getsockname()[1]  # port 0 picks a free one
+        return sock
+
+    def _load_model(self) -> None:
+        gc.unfreeze()
+        t0 = time.perf_counter()
+        self.model_version = warm_model()
+        gc.collect()
+        gc.freeze()
+        _log(f"model {self.model_version} warmed in {time.perf_counter() - t0:.2f}s")
+
+    def _serving(self) -> List[Worker]:
+        return [w for w in self.workers.values() if w.retire_deadline is None]
+
+    def _spawn(self, wait_ready: bool = False) -> Optional[Worker]:
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            code = 1
+            try:
+                code = self._worker_main(ready_w, max_requests)
+            except BaseException as e:  # never fall back into the master loop
+                print(f"worker {os.getpid()} crashed: {e!r}", file=sys.stderr, flush=True)
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        worker = Worker(pid, time.monotonic(), max_requests)
+        self.workers[pid] = worker
+        _log(f"worker started pid={pid}")
+        try:
+            if wait_ready:
+                readable, _, _ = select.select([ready_r], [], [], READY_TIMEOUT_SEC)
+                if not readable or not os.read(ready_r, 1):
+                    _log(f"worker {pid} did not report ready")
+                    return None
+        finally:
+            os.close(ready_r)
+        return worker
+
+    def _retire(self, worker: Worker) -> None:
+        # uvicorn finishes in-flight requests on SIGTERM; past the deadline it is killed
+        if worker.retire_deadline is not None:
+            return
+        worker.retire_deadline = time.monotonic() + self.graceful_timeout + 5
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is not None:
+                code = os.waitstatus_to_exitcode(status)
+                reason = "retired" if worker.retire_deadline is not None else f"exited ({code})"
+                _log(f"worker {pid} {reason}")
+
+    def _reload(self) -> None:
+        _log("SIGHUP: reloading model")
+        try:
+            self._load_model()
+        except Exception as e:
+            _log(f"model reload failed, keeping current workers: {e!r}")
+            return
+        for old in list(self._serving()):
+            if self._spawn(wait_ready=True) is None:
+                _log("replacement worker not ready, stopping the roll")
+                return
+            self._retire(old)
+        _log(f"workers now serving model {self.model_version}")
+
+    def _recycle_old(self) -> None:
+        # One worker at a time, and only when nothing else is being rolled
+        if not self.max_age or len(self.workers) != self.num_workers:
+            return
+        now = time.monotonic()
+        oldest = min(self.workers.values(), key=lambda w: w.started)
+        if now - oldest.started >= self.max_age:
+            _log(f"recycling worker {oldest.pid} after {now - oldest.started:.0f}s")
+            if self._spawn(wait_ready=True) is not None:
+                self._retire(oldest)
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for w in list(self.workers.values()):
+            if w.retire_deadline is not None and now > w.retire_deadline:
+                _log(f"worker {w.pid} did not drain in time, killing it")
+                try:
+                    os.kill(w.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _report(self) -> None:
+        report = memory_report(list(self.workers))
+        master = memory_report([os.getpid()])
+        _log(json.dumps({
+            "event": "memory",
+            "modelVersion": self.model_version,
+            "master": master[0] if master else None,
+            "workers": report,
+            "totalRssKb": sum(r["rssKb"] for r in report),
+            "totalPssKb": sum(r["pssKb"] for r in report),
+        }))
+
+    def _shutdown(self) -> int:
+        _log("shutting down")
+        for w in list(self.workers.values()):
+            self._retire(w)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(TICK_SEC)
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGKILL)
+        self._reap()
+        self.sock.close()
+        return 0
+
+    # -- worker -----------------------------------------------------------------
+
+    def _worker_main(self, ready_fd: int, max_requests: Optional[int]) -> int:
+        import uvicorn
+        from database import engine
+        from main import app
+
+        for sig in (signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, signal.SIG_IGN)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)  # uvicorn installs its own while serving
+        # Pooled connections opened by the master must not be shared across processes
+        engine.dispose(close=False)
+
+        class _Server(uvicorn.Server):
+            async def startup(self, sockets=None):
+                await super().startup(sockets=sockets)
+                try:
+                    if not self.should_exit:
+                        os.write(ready_fd, b"1")
+                except BrokenPipeError:
+                    pass  # the master only listens while rolling workers
+                os.close(ready_fd)
+
+            async def shutdown(self, sockets=None):
+                # uvicorn closes connections that have not sent a request yet; a
+                # connection accepted just before SIGTERM would be reset. Stop
+                # accepting, give those requests a moment to arrive, then drain.
+                for server in self.servers:
+                    server.close()
+                await asyncio.sleep(SHUTDOWN_DRAIN_SEC)
+                await super().shutdown(sockets=sockets)
+
+        config = uvicorn.Config(
+            app, log_level=self.log_level, limit_max_requests=max_requests,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        _Server(config).run(sockets=[self.sock])
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-fork launcher: load the model once, then fork uvicorn workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", DEFAULT_WORKERS)))
+    parser.add_argument("--max-requests", type=int, default=None, help="Recycle a worker after this many requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=0, help="Random extra requests per worker")
+    parser.add_argument("--max-age", type=float, default=None, help="Recycle a worker after this many seconds")
+    parser.add_argument("--graceful-timeout", type=int, default=DEFAULT_GRACEFUL_TIMEOUT)
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between memory reports (0: off)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        parser.exit(2, "serve.py needs fork(); on this platform run `uvicorn main:app` instead\n")
+    arbiter = Arbiter(
+        args.host, args.port, args.workers, max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter, max_age=args.max_age,
+        graceful_timeout=args.graceful_timeout, stats_interval=args.stats_interval, log_level=args.log_level,
+    )
+    return arbiter.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _init_database():
+    # TestClient is used without a context manager, so the app lifespan never runs
+    from init_db import init_db
+    init_db()
+
+
+@pytest.fixture(autouse=True)
+def _drift_to_tmp(tmp_path, monkeypatch):
+    # /upload and /predict feed drift.monitor; keep their live files out of backend/drift
+    import drift
+    monkeypatch.setattr(drift, "monitor", drift.DriftMonitor(directory=str(tmp_path / "drift-live")))
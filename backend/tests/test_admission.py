@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import admission
+import main
+from admission import AdmissionController, Lane, Rejected
+
+client = TestClient(main.app)
+
+
+def _controller(max_concurrent=1, max_queue=8, predict_wait=1.0, upload_wait=1.0):
+    return AdmissionController(max_concurrent, max_queue, [
+        Lane("predict", 0, max_concurrent, predict_wait, 0.01),
+        Lane("upload", 1, max_concurrent, upload_wait, 0.01),
+    ])
+
+
+def test_predict_goes_ahead_of_queued_uploads():
+    async def scenario():
+        ctl = _controller()
+        order = []
+
+        async def request(lane, tag):
+            async with ctl.slot(lane):
+                order.append(tag)
+                await asyncio.sleep(0.01)
+
+        await ctl.acquire("upload")  # the one slot is busy
+        tasks = [asyncio.create_task(request("upload", "u1")), asyncio.create_task(request("upload", "u2"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("predict", "p1")))
+        await asyncio.sleep(0)
+        assert ctl.stats()["queued"] == 3
+        ctl.release("upload", 0.01)
+        await asyncio.gather(*tasks)
+        return order, ctl.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["p1", "u1", "u2"]
+    assert stats["active"] == 0 and stats["lanes"]["upload"]["admitted"] == 3
+
+
+def test_sheds_on_estimate_full_queue_and_timeout():
+    async def scenario():
+        ctl = _controller(max_queue=1, predict_wait=0.05)
+        await ctl.acquire("upload")
+        ctl.lanes["predict"].service_sec = 1.0
+        with pytest.raises(Rejected) as est:
+            await ctl.acquire("predict")  # a second of queued work against a 50ms budget
+        ctl.lanes["predict"].service_sec = 0.01
+        with pytest.raises(Rejected) as timeout:
+            await ctl.acquire("predict")  # the upload never finishes
+        waiting = asyncio.create_task(ctl.acquire("upload"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await ctl.acquire("predict")
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return est.value, timeout.value, full.value, ctl.stats()
+
+    est, timeout, full, stats = asyncio.run(scenario())
+    assert (est.reason, timeout.reason, full.reason) == ("wait_estimate", "timeout", "queue_full")
+    assert est.retry_after >= 1.0
+    assert stats["queued"] == 0 and stats["lanes"]["predict"]["rejected"] == {"queue_full": 1, "wait_estimate": 1, "timeout": 1}
+
+
+def test_busy_predict_returns_503_with_retry_after(monkeypatch):
+    ctl = _controller(predict_wait=0.01)
+    ctl.active = ctl.max_concurrent  # every slot taken
+    ctl.lanes["predict"].service_sec = 2.5
+    monkeypatch.setattr(admission, "controller", ctl)
+    res = client.post("/predict", json={
+        "timestamp": "2024-03-01 10:00:00", "amount": 10.0, "user_id": "busy-user", "city": "Mumbai", "category": "Food",
+    })
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "3"
+    assert client.get("/health/admission").json()["lanes"]["predict"]["rejected"]["wait_estimate"] == 1
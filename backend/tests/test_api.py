@@ -3,7 +3,10 @@ from fastapi.testclient import TestClient
 from main import app
 from database import engine, SessionLocal
 from models import Base
-from sqlalchemy import text
+from sqlalchemy import text, select
+from unittest.mock import patch
+from auth_utils import decode_token
+import time
 
 # Create a test client
 client = TestClient(app)
@@ -65,3 +68,50 @@ def test_get_metrics_authorized():
     assert "avgAmountFraud" in data
     assert "avgAmountSafe" in data
     assert isinstance(data["topUsers"], list)
+
+def test_token_claims_are_cached():
+    from auth_utils import claims_cache
+    login_res = client.post("/auth/login", json={
+        "email": "analyst@anomalyse.bank",
+        "password": "password123"
+    })
+    token = login_res.json()["access_token"]
+    claims_cache.invalidate(token)
+
+    with patch("main.decode_token", wraps=decode_token) as mock_decode:
+        for _ in range(3):
+            response = client.get("/dashboard/metrics", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+        assert mock_decode.call_count == 1
+
+def test_user_cache_invalidated_on_update():
+    from auth_utils import user_cache
+    from models import User
+    user_cache.clear()
+    login_res = client.post("/auth/login", json={
+        "email": "analyst@anomalyse.bank",
+        "password": "password123"
+    })
+    token = login_res.json()["access_token"]
+    response = client.get("/reports/fraud.pdf", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert user_cache.get("analyst@anomalyse.bank") is not None
+
+    with SessionLocal() as db:
+        user = db.scalar(select(User).where(User.email == "analyst@anomalyse.bank"))
+        user.role = "admin" if user.role == "analyst" else "analyst"
+        db.commit()
+        assert user_cache.get("analyst@anomalyse.bank") is None
+        user.role = "analyst"
+        db.commit()
+
+def test_ttl_cache_respects_expiry_and_bound():
+    from auth_utils import TTLCache
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, expires_at=time.time() - 1)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
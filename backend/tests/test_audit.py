@@ -0,0 +1,97 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select
+
+import audit
+from database import SessionLocal
+from main import app
+from models import AuditLog
+
+client = TestClient(app)
+
+
+def _rows(user):
+    with SessionLocal() as db:
+        return db.scalars(select(AuditLog).where(AuditLog.user_email == user).order_by(AuditLog.id)).all()
+
+
+def _cleanup(user):
+    with SessionLocal() as db:
+        db.execute(delete(AuditLog).where(AuditLog.user_email == user))
+        db.commit()
+
+
+def test_size_trigger_flushes_in_record_order():
+    user = f"audit-{uuid.uuid4().hex[:8]}@test"
+    w = audit.AuditWriter(flush_rows=5, flush_interval_sec=60)
+    try:
+        for i in range(5):
+            w.record(user, "action", "thing", str(i), {"i": i})
+        deadline = time.monotonic() + 5
+        while len(_rows(user)) < 5 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        rows = _rows(user)
+        assert [r.resource_id for r in rows] == ["0", "1", "2", "3", "4"]
+        assert [r.timestamp for r in rows] == sorted(r.timestamp for r in rows)
+        assert rows[0].details == '{"i": 0}'
+        assert w.stats["flushes"] == 1
+    finally:
+        w.stop()
+        _cleanup(user)
+
+
+def test_time_trigger_and_stop_flush():
+    user = f"audit-{uuid.uuid4().hex[:8]}@test"
+    w = audit.AuditWriter(flush_rows=1000, flush_interval_sec=0.05)
+    try:
+        w.record(user, "tick", "thing")
+        deadline = time.monotonic() + 5
+        while not _rows(user) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(_rows(user)) == 1
+        slow = audit.AuditWriter(flush_rows=1000, flush_interval_sec=60)
+        slow.record(user, "late", "thing")
+        slow.stop()  # shutdown must not lose buffered events
+        assert [r.action for r in _rows(user)] == ["tick", "late"]
+    finally:
+        w.stop()
+        _cleanup(user)
+
+
+def test_failed_flush_keeps_events_in_order():
+    user = f"audit-{uuid.uuid4().hex[:8]}@test"
+
+    def broken():
+        raise ConnectionError("db down")
+
+    w = audit.AuditWriter(flush_rows=1000, flush_interval_sec=60, session_factory=broken)
+    w._thread = object()  # keep the background thread out of this test
+    w.record(user, "first", "thing")
+    assert w.flush() == 0
+    w.record(user, "second", "thing")
+    w.session_factory = SessionLocal
+    try:
+        assert w.flush() == 2
+        assert [r.action for r in _rows(user)] == ["first", "second"]
+    finally:
+        _cleanup(user)
+
+
+def test_record_is_cheap():
+    w = audit.AuditWriter(flush_rows=10**9, flush_interval_sec=60)
+    w._thread = object()
+    t0 = time.perf_counter()
+    for i in range(10_000):
+        w.record("bench@test", "action", "thing", str(i))
+    assert (time.perf_counter() - t0) / 10_000 < 1e-4
+    assert w.pending == 10_000
+
+
+def test_logins_are_audited():
+    client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "wrong"})
+    client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    audit.writer.flush()
+    actions = [r.action for r in _rows("analyst@anomalyse.bank")]
+    assert actions[-2:] == ["login_failed", "login"]
@@ -19,8 +19,10 @@ def test_upload_csv_success():
     csv_content = "Timestamp,UserID,Amount,City,Category\n2024-01-01 10:00:00,User123,100.50,New York,Food\n"
     files = {"file": ("test.csv", csv_content, "text/csv")}
     
+    # The row is left in place for the next test; replace keeps re-runs from skipping it as a duplicate
     response = client.post("/upload", 
                            headers={"Authorization": f"Bearer {token}"},
+                           params={"duplicates": "replace"},
                            files=files)
     
     if response.status_code != 200:
@@ -0,0 +1,154 @@
+import hashlib
+import io
+import json
+import uuid
+from datetime import datetime
+
+import pandas as pd
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import dedup
+import heavy_hitters
+import ingest
+import rescore
+from database import SessionLocal
+from main import app
+from models import Base, IngestOffset, Transaction, UploadBatch
+
+client = TestClient(app)
+USER = f"dedup-{uuid.uuid4().hex[:8]}"
+
+
+def _headers():
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+def _upload(body, mode):
+    csv = "Timestamp,UserID,Amount,City,Category\n" + body
+    return client.post("/upload", headers=_headers(), params={"duplicates": mode},
+                       files={"file": ("d.csv", csv, "text/csv")})
+
+
+def _stored():
+    with SessionLocal() as db:
+        return db.execute(
+            select(Transaction.amount, Transaction.status, Transaction.dedup_key, Transaction.batch_id)
+            .where(Transaction.user_id == USER).order_by(Transaction.timestamp, Transaction.amount)
+        ).all()
+
+
+def test_frame_and_row_keys_agree():
+    df = pd.DataFrame({
+        "Timestamp": ["2024-01-01 10:00:00.000000", "2024-01-01 10:00:00.250000"],
+        "UserID": ["u1", "u1"], "Amount": [10, 10.0], "City": ["Pune", "Pune"], "Category": ["Food", "Food"],
+    }).astype({"UserID": "category"})
+    keys = dedup.frame_keys(df)
+    assert keys[0] == dedup.dedup_key("u1", pd.Timestamp("2024-01-01 10:00:00").to_pydatetime(), 10.0, "Pune", "Food")
+    assert keys[0] != keys[1] and len(keys[0]) == 32
+
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [hashlib.blake2b(str(i).encode(), digest_size=16).hexdigest() for i in range(40_000)]
+    bloom = dedup.BloomFilter(20_000, fp_rate=0.01)
+    bloom.add(dedup._hashes(keys[:20_000]))
+    assert bloom.might_contain(dedup._hashes(keys[:20_000])).all()
+    assert bloom.might_contain(dedup._hashes(keys[20_000:])).mean() < 0.02
+
+
+def test_index_builds_its_filter_in_chunks(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    keys = [hashlib.blake2b(f"k{i}".encode(), digest_size=16).hexdigest() for i in range(25)]
+    with engine.begin() as conn:
+        conn.execute(insert(Transaction), [
+            {"id": str(i), "timestamp": datetime(2024, 1, 1), "amount": 1.0, "user_id": "u", "city": "Pune",
+             "category": "Food", "risk_score": 0, "status": "Safe", "dedup_key": k} for i, k in enumerate(keys)
+        ])
+    chunks = []
+    monkeypatch.setattr(dedup, "BUILD_CHUNK", 7)
+    monkeypatch.setattr(dedup.BloomFilter, "add", lambda self, h, add=dedup.BloomFilter.add: (chunks.append(len(h)), add(self, h)))
+    bloom = dedup.DuplicateIndex(sessionmaker(bind=engine))._build()
+    assert chunks == [7, 7, 7, 4] and bloom.count == 25
+    assert bloom.might_contain(dedup._hashes(keys)).all()
+
+
+def test_upload_modes_and_ingest_skip_duplicates():
+    rows = "".join(f"2024-02-01 10:0{i}:00,{USER},{100 + i}.0,Pune,Food\n" for i in range(3))
+    try:
+        first = _upload(rows + rows.splitlines(True)[0], "skip").json()
+        assert first["rowsProcessed"] == 3
+        assert first["duplicates"] == {"mode": "skip", "inFile": 1, "existing": 0, "skipped": 1, "flagged": 0, "replaced": 0}
+
+        again = _upload(rows, "skip").json()
+        assert again["rowsProcessed"] == 0 and again["batchId"] is None
+        assert again["duplicates"]["existing"] == 3
+
+        flagged = _upload(rows.splitlines(True)[1], "flag").json()
+        assert flagged["rowsProcessed"] == 1 and flagged["duplicates"]["flagged"] == 1
+        dupe = [r for r in _stored() if r.dedup_key is None]
+        assert len(dupe) == 1 and dupe[0].status == dedup.DUPLICATE_STATUS
+
+        replaced = _upload(rows.splitlines(True)[2], "replace").json()
+        assert replaced["duplicates"]["replaced"] == 1
+        stored = _stored()
+        assert len(stored) == 4
+        assert [r.batch_id for r in stored if r.amount == 102.0] == [replaced["batchId"]]
+
+        feed = "".join(json.dumps({"timestamp": f"2024-02-01T10:0{i}:00", "user_id": USER, "amount": 100 + i,
+                                   "city": "Pune", "category": "Food"}) + "\n" for i in range(2, 5))
+        stats = ingest.ingest("-", stream=io.BytesIO(feed.encode()), name=USER, log=lambda m: None)
+        assert (stats["rows"], stats["duplicates"]) == (2, 1)
+        assert len(_stored()) == 6
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == USER))
+            db.execute(delete(IngestOffset).where(IngestOffset.source == USER))
+            db.commit()
+
+
+def test_rescoring_keeps_flagged_duplicates_in_review():
+    row = f"2024-02-02 09:00:00,{USER},77.0,Pune,Food\n"
+    try:
+        batch_id = _upload(row + row, "flag").json()["batchId"]
+
+        def dupe():
+            with SessionLocal() as db:
+                return db.execute(select(Transaction.status, Transaction.flag_type).where(
+                    Transaction.user_id == USER, Transaction.dedup_key.is_(None))).one()
+
+        assert client.post(f"/batches/{batch_id}/rescore", headers=_headers()).status_code == 200
+        status, flag_type = dupe()
+        assert status == dedup.DUPLICATE_STATUS and "Duplicate" in [f["type"] for f in json.loads(flag_type)]
+
+        with SessionLocal() as db:
+            db.execute(update(Transaction).where(Transaction.user_id == USER).values(model_version="old"))
+            db.commit()
+        rescore.rescore(checkpoint=None, log=lambda m: None)
+        status, flag_type = dupe()
+        assert status == dedup.DUPLICATE_STATUS and "Duplicate" in [f["type"] for f in json.loads(flag_type)]
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == USER))
+            db.commit()
+
+
+def test_review_rows_count_as_flagged_everywhere():
+    row = f"2024-02-03 09:00:00,{USER},55.0,Pune,Food\n"
+    before = client.get("/dashboard/metrics", headers=_headers()).json()["flaggedTransactions"]
+    try:
+        batch_id = _upload(row + row, "flag").json()["batchId"]
+        with SessionLocal() as db:
+            assert db.get(UploadBatch, batch_id).flagged == 1
+        listed = [b for b in client.get("/batches", headers=_headers()).json() if b["id"] == batch_id]
+        assert listed[0]["flagged"] == 1
+        assert client.get("/dashboard/metrics", headers=_headers()).json()["flaggedTransactions"] == before + 1
+        assert USER in [r["value"] for r in heavy_hitters.store.top("user", k=1000, flagged=True)]
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == USER))
+            db.commit()
+        heavy_hitters.store.invalidate()
@@ -0,0 +1,146 @@
+import json
+import socket
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import drift
+import main
+from config import settings
+from database import SessionLocal
+from model.feature_pipeline import train_and_export
+from model.sketch import KLLSketch, ks_distance, load_reference
+from models import Transaction
+
+TRAIN_CSV = Path(__file__).parent.parent / "dummy_train.csv"
+client = TestClient(main.app)
+
+
+def _rank_error(sketch, data):
+    qs = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(np.sort(data), sketch.quantile(qs)) / len(data)
+    return np.abs(ranks - qs).max()
+
+
+def test_sketch_stays_small_and_accurate():
+    rng = np.random.default_rng(0)
+    data = rng.lognormal(5, 1, 200_000)
+    sketch = KLLSketch(seed=1)
+    for chunk in np.array_split(data, 50):
+        sketch.update(chunk)
+    sketch.update([np.nan, np.inf])  # non-finite values are skipped
+    assert sketch.n == len(data)
+    assert sketch.size < 3 * sketch.k
+    assert _rank_error(sketch, data) < 0.02
+
+
+def test_sketches_merge_and_round_trip():
+    rng = np.random.default_rng(1)
+    data = rng.normal(0, 1, 60_000)
+    parts = []
+    for i, chunk in enumerate(np.array_split(data, 3)):
+        s = KLLSketch(seed=i)
+        s.update(chunk)
+        parts.append(KLLSketch.from_dict(json.loads(json.dumps(s.to_dict()))))
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert merged.n == len(data)
+    assert _rank_error(merged, data) < 0.02
+
+    same, shifted = KLLSketch(seed=3), KLLSketch(seed=4)
+    same.update(rng.normal(0, 1, 20_000))
+    shifted.update(rng.normal(1, 1, 20_000))
+    assert ks_distance(merged, same) < 0.05
+    assert 0.3 < ks_distance(merged, shifted) < 0.45  # true KS for a 1 sigma shift is ~0.38
+
+
+def test_monitor_merges_worker_files(tmp_path):
+    mon = drift.DriftMonitor(directory=str(tmp_path), save_interval_sec=0)
+    mon.update(pd.DataFrame({"Amount": [1.0, 2.0, 3.0], "City": ["a", "b", "c"]}))
+    other = KLLSketch()
+    other.update([4.0, 5.0])
+    (tmp_path / "live-otherhost-1.json").write_text(json.dumps({"features": {"Amount": other.to_dict()}}))
+    merged = mon.merged()
+    assert merged["sources"] == 2
+    assert set(merged["features"]) == {"Amount"}
+    assert merged["features"]["Amount"].n == 5
+    assert mon.reset() == 2
+    assert mon.merged()["sources"] == 0
+
+
+def test_monitor_keeps_model_versions_apart_and_compacts_exited_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(drift.registry, "model_version", lambda path=None: "v2")
+    mon = drift.DriftMonitor(directory=str(tmp_path), save_interval_sec=0, compact_interval_sec=3600)
+    mon.update(pd.DataFrame({"Amount": [1.0, 2.0]}), "v1")
+    mon.update(pd.DataFrame({"Amount": [3.0, 4.0, 5.0]}), "v2")  # reloaded model: v1 sketches dropped
+    assert json.loads(mon._own_file().read_text())["model_version"] == "v2"
+
+    host = socket.gethostname()
+    files = [  # two exited workers on v2, one on v1, and a worker on another host
+        (f"live-{host}-999999991.json", {"pid": 999999991, "host": host, "model_version": "v2"}, [6.0]),
+        (f"live-{host}-999999992.json", {"pid": 999999992, "host": host, "model_version": "v2"}, [7.0, 8.0]),
+        (f"live-{host}-999999993.json", {"pid": 999999993, "host": host, "model_version": "v1"}, [9.0]),
+        ("live-otherhost-5.json", {"pid": 5, "host": "otherhost", "model_version": "v2"}, [10.0]),
+    ]
+    for name, meta, values in files:
+        sketch = KLLSketch()
+        sketch.update(values)
+        (tmp_path / name).write_text(json.dumps({**meta, "features": {"Amount": sketch.to_dict()}}))
+    assert mon.merged("v2")["features"]["Amount"].n == 3 + 1 + 2 + 1
+    assert mon.merged("v1")["sources"] == 1
+
+    assert mon.compact() == {"folded": 2, "removed": 1}
+    names = sorted(p.name for p in tmp_path.glob("live-*.json"))
+    assert names == sorted([drift.COMPACTED_FILE, mon._own_file().name, "live-otherhost-5.json"])
+    assert mon.merged("v2")["features"]["Amount"].n == 7
+
+
+def test_compaction_never_fails_a_save(tmp_path, monkeypatch):
+    mon = drift.DriftMonitor(directory=str(tmp_path), save_interval_sec=0, compact_interval_sec=0)
+    dead = tmp_path / f"live-{socket.gethostname()}-999999991.json"
+    dead.write_text(json.dumps({"pid": 999999991, "host": socket.gethostname(), "features": {}}))
+    monkeypatch.setattr(drift, "fcntl", None)  # as on Windows: no flock, no signal-0 liveness check
+    assert mon.compact() == {"folded": 0, "removed": 0}
+    assert dead.exists()
+
+    def broken():
+        raise ImportError("no fcntl")
+    monkeypatch.setattr(mon, "compact", broken)
+    mon.update(pd.DataFrame({"Amount": [1.0, 2.0]}), "v1")
+    assert json.loads(mon._own_file().read_text())["model_version"] == "v1"
+
+
+def test_training_reference_and_drift_endpoint(tmp_path, monkeypatch):
+    model_path = tmp_path / "model.pkl"
+    info = train_and_export(TRAIN_CSV, model_path, params={"clf__n_estimators": 10, "clf__n_jobs": 1})
+    reference = load_reference(model_path)
+    assert info["drift_reference"].endswith("model_drift_reference.json")
+    assert {"Amount_Z_Score", "Geo_Velocity_Check", "Txn_Count_30_Min"} <= set(reference["features"])
+    assert reference["rows"] == info["samples_train"]
+
+    monkeypatch.setattr(main, "MODEL_PATH", model_path)
+    monkeypatch.setattr(drift, "monitor", drift.DriftMonitor(directory=str(tmp_path / "live"), save_interval_sec=0))
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    # Amounts far above anything in training
+    rows = "".join(f"2024-04-01 10:{i:02d}:00,drift-user,{50000 + i}.0,Mumbai,Food\n" for i in range(40))
+    res = client.post("/upload", headers=headers,
+                      files={"file": ("d.csv", "Timestamp,UserID,Amount,City,Category\n" + rows, "text/csv")})
+    try:
+        assert res.status_code == 200
+        report = client.get("/drift", headers=headers).json()
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == "drift-user"))
+            db.commit()
+    by_name = {f["feature"]: f for f in report["features"]}
+    assert report["liveSources"] == 1
+    assert by_name["Amount"]["liveCount"] == 40
+    assert by_name["Amount"]["ks"] > settings.DRIFT_KS_THRESHOLD
+    assert "Amount" in report["drifted"]
+    assert list(tmp_path.joinpath("live").glob("live-*.json"))
+
+    monkeypatch.setattr(main, "MODEL_PATH", tmp_path / "missing.pkl")
+    assert client.get("/drift", headers=headers).status_code == 404
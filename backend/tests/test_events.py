@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import events
+from database import SessionLocal
+from main import app
+from models import Transaction
+
+client = TestClient(app)
+
+
+def _frames_data(frame):
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+def test_publish_without_subscribers_is_a_noop():
+    b = events.Broadcaster()
+    assert b.publish("transactions", {"x": 1}) == 0
+
+
+def test_slow_subscriber_drops_oldest():
+    async def run():
+        b = events.Broadcaster(queue_size=3)
+        sub = b.subscribe()
+        for i in range(5):
+            b.publish("transactions", {"i": i})
+        frames = [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+        return sub.dropped, [_frames_data(f)["i"] for f in frames]
+
+    dropped, seen = asyncio.run(run())
+    assert dropped == 2
+    assert seen == [2, 3, 4]
+
+
+def test_sse_stream_delivers_events_and_unsubscribes():
+    async def run():
+        b = events.Broadcaster()
+        stream = events.sse_stream(b, ping_interval=0.05, max_events=2)
+        assert (await stream.__anext__()).startswith("retry:")
+        assert b.subscriber_count == 1
+        assert await stream.__anext__() == ": ping\n\n"
+        b.publish("transactions", {"n": 1})
+        # Publishing from another thread is handed over to the subscriber's loop
+        t = threading.Thread(target=b.publish, args=("prediction", {"n": 2}))
+        t.start()
+        t.join()
+        first = await asyncio.wait_for(stream.__anext__(), 1)
+        second = await asyncio.wait_for(stream.__anext__(), 1)
+        rest = [f async for f in stream]
+        return first, second, rest, b.subscriber_count
+
+    first, second, rest, remaining = asyncio.run(run())
+    assert first.startswith("event: transactions\n") and _frames_data(first) == {"n": 1}
+    assert second.startswith("event: prediction\n") and _frames_data(second) == {"n": 2}
+    assert rest == []
+    assert remaining == 0
+
+
+def test_stream_requires_token():
+    res = client.get("/transactions/stream")
+    assert res.status_code == 401
+    res = client.get("/transactions/stream", params={"token": "not-a-token"})
+    assert res.status_code == 401
+
+
+def test_upload_publishes_scored_rows(monkeypatch):
+    fake = SimpleNamespace(subscriber_count=1, publish=MagicMock())
+    monkeypatch.setattr(events, "broadcaster", fake)
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    csv_content = "Timestamp,UserID,Amount,City,Category\n2024-02-01 10:00:00,stream-user,42.0,Mumbai,Food\n"
+    res = client.post("/upload", headers=headers, files={"file": ("s.csv", csv_content, "text/csv")})
+    with SessionLocal() as db:
+        db.execute(delete(Transaction).where(Transaction.user_id == "stream-user"))
+        db.commit()
+    assert res.status_code == 200
+    name, payload = fake.publish.call_args.args
+    assert name == "transactions"
+    assert payload["metrics"]["totalTransactions"] == 1
+    assert payload["transactions"][0]["user_id"] == "stream-user"
+    assert payload["truncated"] is False
@@ -0,0 +1,127 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select
+
+from database import SessionLocal
+from main import app
+from model.explain import ForestExplainer, _input_columns
+from model.feature_pipeline import build_pipeline
+from models import Transaction
+from scoring import explained_risk_scores, predict_row, risk_scores
+
+TRAIN_CSV = Path(__file__).parent.parent / "dummy_train.csv"
+client = TestClient(app)
+
+
+def _small_forest():
+    df = pd.read_csv(TRAIN_CSV)
+    pipe = build_pipeline().set_params(clf__n_estimators=15, clf__max_depth=6, clf__n_jobs=1)
+    pipe.fit(df.drop(columns=["Fraud_Type"]), df["Fraud_Type"])
+    return pipe, df.drop(columns=["Fraud_Type"]).iloc[:200]
+
+
+def test_contributions_add_up_to_the_risk_score():
+    pipe, X = _small_forest()
+    explainer = ForestExplainer(pipe)
+    assert explainer.feature_names[-2:] == ["City", "Category"]  # one-hot columns folded back
+
+    features = pipe.named_steps["features"].transform(X)
+    contrib = explainer.contributions(pipe.named_steps["preprocess"].transform(features))
+    risk = 100.0 * (1.0 - pipe.predict_proba(X)[:, list(pipe.classes_).index(0)])
+    assert contrib.shape == (len(X), len(explainer.feature_names))
+    np.testing.assert_allclose(explainer.base + contrib.sum(axis=1), risk, atol=1e-9)
+
+    risks, explanations = explained_risk_scores(pipe, explainer, X, top=3)
+    assert risks == risk_scores(pipe, X)
+    first = explanations[0]["contributions"]
+    assert len(first) == 3
+    assert [abs(c["contribution"]) for c in first] == sorted((abs(c["contribution"]) for c in first), reverse=True)
+
+
+def test_infrequent_categories_fold_back_into_their_column():
+    df = pd.read_csv(TRAIN_CSV)
+    pipe = build_pipeline().set_params(preprocess__cat__onehot__min_frequency=0.19, clf__n_estimators=15,
+                                       clf__max_depth=6, clf__n_jobs=1)
+    pipe.fit(df.drop(columns=["Fraud_Type"]), df["Fraud_Type"])
+    onehot = pipe.named_steps["preprocess"].named_transformers_["cat"][-1]
+    assert any(c is not None for c in onehot.infrequent_categories_)
+    explainer = ForestExplainer(pipe)
+    X = df.drop(columns=["Fraud_Type"]).iloc[:200]
+    features = pipe.named_steps["features"].transform(X)
+    Xt = pipe.named_steps["preprocess"].transform(features)
+    contrib = explainer.contributions(Xt)
+    risk = 100.0 * (1.0 - pipe.predict_proba(X)[:, list(pipe.classes_).index(0)])
+    np.testing.assert_allclose(explainer.base + contrib.sum(axis=1), risk, atol=1e-9)
+    # Every output column credits the input it was encoded from
+    out_names = pipe.named_steps["preprocess"].get_feature_names_out()
+    _, column_of = _input_columns(pipe.named_steps["preprocess"])
+    assert len(column_of) == len(out_names)
+    for out_name, col in zip(out_names, column_of):
+        if out_name.startswith("cat__"):
+            assert out_name.startswith(f"cat__{explainer.feature_names[col]}_")
+
+
+def test_tail_explains_only_the_last_rows():
+    pipe, X = _small_forest()
+    explainer = ForestExplainer(pipe)
+    _, full = explained_risk_scores(pipe, explainer, X)
+    risks, last = explained_risk_scores(pipe, explainer, X, tail=1)
+    assert len(risks) == 1 and last == full[-1:]
+
+
+def test_predict_row_runs_the_features_once():
+    pipe, X = _small_forest()
+    explainer = ForestExplainer(pipe)
+    fe = pipe.named_steps["features"]
+    with patch.object(type(fe), "transform", autospec=True, side_effect=type(fe).transform) as transform:
+        risk, is_fraud, explanation = predict_row(pipe, X, explainer, top=3)
+    assert transform.call_count == 1
+    assert risk == risk_scores(pipe, X)[-1]
+    assert is_fraud == (pipe.predict(X)[-1] != 0)
+    assert explanation == explained_risk_scores(pipe, explainer, X, top=3, tail=1)[1][0]
+    assert predict_row(pipe, X) == (risk, is_fraud, None)
+
+
+def test_non_forest_pipelines_are_not_supported():
+    assert not ForestExplainer.supports(MagicMock(named_steps={}))
+    pipe, X = _small_forest()
+    assert ForestExplainer.supports(pipe)
+    df = pd.read_csv(TRAIN_CSV)
+    for backend, params in (("hgb", {"clf__max_iter": 20}), ("logreg", {})):
+        other = build_pipeline(backend=backend).set_params(**params)
+        other.fit(df.drop(columns=["Fraud_Type"]), df["Fraud_Type"])
+        assert not ForestExplainer.supports(other)
+        assert len(risk_scores(other, X)) == len(X)
+
+
+def test_predict_and_upload_return_explanations():
+    res = client.post("/predict", params={"explain": "true"}, json={
+        "timestamp": "2024-03-01 10:00:00", "amount": 9500.0, "user_id": "explain-user",
+        "city": "Mumbai", "category": "Electronics",
+    })
+    assert res.status_code == 200
+    body = res.json()
+    assert body["explain"]["contributions"] and "base" in body["explain"]
+    assert client.post("/predict", json={
+        "timestamp": "2024-03-01 10:00:00", "amount": 10.0, "user_id": "explain-user",
+        "city": "Mumbai", "category": "Food",
+    }).json()["explain"] is None
+
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    csv_content = "Timestamp,UserID,Amount,City,Category\n2024-03-01 10:00:00,explain-user,42.0,Mumbai,Food\n"
+    res = client.post("/upload", params={"explain": "true"}, headers=headers,
+                      files={"file": ("e.csv", csv_content, "text/csv")})
+    try:
+        assert res.status_code == 200
+        with SessionLocal() as db:
+            stored = db.scalar(select(Transaction.explanation).where(Transaction.user_id == "explain-user"))
+        assert stored and "contributions" in stored
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == "explain-user"))
+            db.commit()
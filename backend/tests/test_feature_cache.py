@@ -0,0 +1,77 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model.feature_cache import FeatureCache
+from model.feature_pipeline import INGEST_DTYPES, FeatureEngineer, split_rows, train_and_export
+
+TRAIN_CSV = Path(__file__).parent.parent / "dummy_train.csv"
+
+
+def test_cache_roundtrip_matches_fresh_transform(tmp_path):
+    cache = FeatureCache(tmp_path / "cache")
+    X, y = cache.get_or_compute(TRAIN_CSV)
+    fresh = FeatureEngineer().fit_transform(pd.read_csv(TRAIN_CSV).drop(columns=["Fraud_Type"]))
+
+    with patch.object(FeatureEngineer, "transform", side_effect=AssertionError("recomputed")):
+        X2, y2 = cache.get_or_compute(TRAIN_CSV)
+
+    # Served read-only straight from the memory-mapped block
+    assert not X2["Amount"].to_numpy().flags.writeable
+    assert set(X2.columns) == set(fresh.columns)
+    np.testing.assert_array_equal(y2, pd.read_csv(TRAIN_CSV)["Fraud_Type"].to_numpy())
+    for col in fresh.columns:
+        np.testing.assert_array_equal(X2[col].astype(fresh[col].dtype).to_numpy(), fresh[col].to_numpy())
+
+
+def test_key_changes_with_input_content(tmp_path):
+    cache = FeatureCache(tmp_path / "cache")
+    copy = tmp_path / "train.csv"
+    copy.write_bytes(TRAIN_CSV.read_bytes())
+    k1 = cache.key_for(copy)
+    with open(copy, "a") as fh:
+        fh.write("2025-03-01 10:00:00,1001,10.0,Mumbai,Food,0\n")
+    assert cache.key_for(copy) != k1
+
+
+def test_eviction_keeps_total_under_budget(tmp_path):
+    cache = FeatureCache(tmp_path / "cache", max_bytes=1)
+    frame = pd.DataFrame({"a": np.arange(1000, dtype=float), "City": ["x"] * 1000})
+    cache.store("first", frame)
+    cache.store("second", frame)
+    names = [e.name for _, _, e in cache.entries()]
+    assert names == ["second"]
+
+
+def test_retrain_on_unchanged_data_skips_feature_engineering(tmp_path):
+    cache = FeatureCache(tmp_path / "cache")
+    out = tmp_path / "model.pkl"
+    train_and_export(TRAIN_CSV, out, cache=cache)
+    with patch.object(FeatureEngineer, "transform", side_effect=AssertionError("recomputed")):
+        info = train_and_export(TRAIN_CSV, out, cache=cache)
+    assert info["samples_train"] == 800
+    pipe = joblib.load(out)
+    sample = pd.read_csv(TRAIN_CSV).head(5).drop(columns=["Fraud_Type"])
+    assert len(pipe.predict(sample)) == 5
+
+
+def test_cached_and_uncached_training_see_the_same_features(tmp_path):
+    # Both paths split the raw rows first and engineer each side from its own rows
+    cache = FeatureCache(tmp_path / "cache")
+    X_train, X_test, y_train, y_test = cache.get_or_compute_split(TRAIN_CSV)
+    raw_train, raw_test, raw_y_train, _ = split_rows(pd.read_csv(TRAIN_CSV, dtype=INGEST_DTYPES))
+    plain = {"City": str, "Category": str}
+    for cached, raw in ((X_train, raw_train), (X_test, raw_test)):
+        fresh = FeatureEngineer().fit_transform(raw).reset_index(drop=True)[list(cached.columns)]
+        pd.testing.assert_frame_equal(cached.astype(plain), fresh.astype(plain), check_dtype=False)
+    np.testing.assert_array_equal(y_train, raw_y_train.to_numpy())
+
+    with_cache = train_and_export(TRAIN_CSV, tmp_path / "cached.pkl", cache=cache)
+    without = train_and_export(TRAIN_CSV, tmp_path / "plain.pkl")
+    assert with_cache["test_accuracy"] == without["test_accuracy"]
+    sample = pd.read_csv(TRAIN_CSV).drop(columns=["Fraud_Type"])
+    np.testing.assert_array_equal(joblib.load(tmp_path / "cached.pkl").predict_proba(sample),
+                                  joblib.load(tmp_path / "plain.pkl").predict_proba(sample))
@@ -0,0 +1,90 @@
+import json
+from collections import Counter
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import heavy_hitters
+import main
+from database import SessionLocal
+from heavy_hitters import HeavyHitters, SpaceSaving
+from models import Transaction
+
+client = TestClient(main.app)
+
+
+def _zipf_stream(n, seed):
+    rng = np.random.default_rng(seed)
+    return [f"u{v}" for v in rng.zipf(1.3, n)]
+
+
+def _check_bounds(summary, truth):
+    for item, count in summary.counts.items():
+        assert count - summary.errors[item] <= truth[item] <= count
+    # Every item above n / capacity must be tracked
+    n = sum(truth.values())
+    assert {i for i, c in truth.items() if c > n / summary.capacity} <= set(summary.counts)
+
+
+def test_space_saving_bounds_and_top_items():
+    stream = _zipf_stream(50_000, seed=0)
+    truth = Counter(stream)
+    summary = SpaceSaving(100)
+    for item in stream:
+        summary.add(item)
+    assert len(summary.counts) == 100
+    _check_bounds(summary, truth)
+    assert [r[0] for r in summary.ranked()[:5]] == [i for i, _ in truth.most_common(5)]
+
+
+def test_merged_summaries_keep_their_bounds():
+    a_stream, b_stream = _zipf_stream(20_000, seed=1), _zipf_stream(20_000, seed=2)
+    a, b = SpaceSaving(80), SpaceSaving(80)
+    a.update(Counter(a_stream))
+    b.update(Counter(b_stream))
+    b = SpaceSaving.from_dict(json.loads(json.dumps(b.to_dict())))
+    merged = a.merge(b)
+    assert len(merged.counts) == 80
+    _check_bounds(merged, Counter(a_stream + b_stream))
+
+
+def test_dashboard_uses_heavy_hitters(monkeypatch):
+    store = HeavyHitters(flush_interval_sec=0)
+    monkeypatch.setattr(heavy_hitters, "store", store)
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    rows = "".join(f"2024-05-01 09:{i:02d}:00,hh-top-user,{10 + i}.0,HHCity,Food\n" for i in range(60))
+    try:
+        store.invalidate()
+        res = client.post("/upload", headers=headers,
+                          files={"file": ("hh.csv", "Timestamp,UserID,Amount,City,Category\n" + rows, "text/csv")})
+        assert res.status_code == 200
+        batch_id = res.json()["batchId"]
+
+        metrics = client.get("/dashboard/metrics", headers=headers).json()
+        assert {"user_id": "hh-top-user", "count": 60} in metrics["topUsers"]
+        assert {"city": "HHCity", "count": 60} in metrics["topCities"]
+
+        # Rows deleted behind the store's back only show up in the exact check
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == "hh-top-user", Transaction.amount < 20))
+            db.commit()
+        items = client.get("/dashboard/heavy-hitters", headers=headers,
+                           params={"dimension": "city", "k": 50, "exact": "true"}).json()["items"]
+        city = next(r for r in items if r["value"] == "HHCity")
+        assert (city["count"], city["exactCount"]) == (60, 50)
+        assert client.post("/dashboard/heavy-hitters/rebuild", headers=headers).status_code == 200
+        assert {"value": "HHCity", "count": 50} in [
+            {"value": r["value"], "count": r["count"]}
+            for r in client.get("/dashboard/heavy-hitters", headers=headers,
+                                params={"dimension": "city", "k": 50}).json()["items"]
+        ]
+
+        assert client.delete(f"/batches/{batch_id}", headers=headers).status_code == 200
+        assert "HHCity" not in [r["value"] for r in store.top("city", 50)]
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Transaction).where(Transaction.user_id == "hh-top-user"))
+            db.commit()
+        store.invalidate()
@@ -9,7 +9,7 @@ import os
 sys.path.append(str(Path(__file__).parent.parent))
 
 from main import app, get_db
-from model.feature_pipeline import haversine_distance, FeatureEngineer
+from model.feature_pipeline import INGEST_DTYPES, haversine_distance, FeatureEngineer, user_aggregates, build_pipeline, velocity_feature_names
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 
@@ -47,8 +47,96 @@ def test_preprocess_data():
     # rolling window depends on implementation details in ml_utils
     
     assert processed.iloc[2]['Geo_Velocity_Check'] > 0
+    # Single-user frames must still get per-row lookback counts
+    assert list(processed['Txn_Count_30_Min']) == [0, 1, 1]
 
-@patch('main.joblib.load')
+def _history_frame():
+    rng = np.random.default_rng(7)
+    n = 400
+    return pd.DataFrame({
+        'Timestamp': pd.Timestamp('2025-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 10**6, n)), unit='s'),
+        'UserID': rng.choice(['u1', 'u2', 'u3', 'u4'], n),
+        'Amount': np.round(rng.lognormal(5, 1, n), 2),
+        'City': rng.choice(['Mumbai', 'Delhi', 'Pune'], n),
+        'Category': rng.choice(['Food', 'Travel'], n),
+    })
+
+def test_expanding_user_stats_are_past_only():
+    df = _history_frame()
+    out = FeatureEngineer(user_stats='expanding').fit_transform(df)
+    for _, g in df.groupby('UserID'):
+        amounts = g['Amount'].to_numpy()
+        feats = out.loc[g.index]
+        # First transaction has no history: its own amount, no spread, no deviation
+        assert feats['User_Mean_Amount'].iloc[0] == amounts[0]
+        assert feats['Amount_Z_Score'].iloc[0] == 0
+        k = len(amounts) // 2
+        assert np.isclose(feats['User_Mean_Amount'].iloc[k], amounts[:k].mean())
+        assert np.isclose(feats['User_Std_Amount'].iloc[k], amounts[:k].std(ddof=1))
+
+def test_expanding_user_stats_chunked_match_full_pass():
+    df = _history_frame()
+    fe = FeatureEngineer(user_stats='expanding')
+    full = fe.transform(df)
+    prior, parts = None, []
+    for chunk in np.array_split(np.arange(len(df)), 5):
+        part = df.iloc[chunk]
+        parts.append(fe.transform(part, prior=prior))
+        prior = user_aggregates(part, prior)
+    chunked = pd.concat(parts)
+    for col in ['User_Mean_Amount', 'User_Std_Amount', 'Amount_Z_Score']:
+        np.testing.assert_allclose(chunked[col], full[col], rtol=1e-9)
+    np.testing.assert_allclose(prior.loc['u1', 'n'], (df['UserID'] == 'u1').sum())
+
+def test_feature_engineer_unpickles_without_user_stats():
+    fe = FeatureEngineer()
+    state = fe.__getstate__()
+    state.pop('user_stats')
+    state.pop('velocity_windows')
+    old = FeatureEngineer.__new__(FeatureEngineer)
+    old.__setstate__(state)
+    assert old.user_stats == 'batch'
+    # Models trained before multi-window velocity only know the 30 minute window
+    assert old.velocity_windows == ('30min',)
+    assert [c for c in old._numeric_features if c.startswith('Txn_')] == ['Txn_Count_30_Min', 'Txn_Amount_30_Min']
+
+def test_velocity_windows_match_brute_force():
+    df = _history_frame()
+    windows = ('90s', '5min', '1h', '24h')
+    out = FeatureEngineer(velocity_windows=windows).fit_transform(df)
+    assert velocity_feature_names(windows) == [
+        'Txn_Count_90_Sec', 'Txn_Amount_90_Sec', 'Txn_Count_5_Min', 'Txn_Amount_5_Min',
+        'Txn_Count_1_Hr', 'Txn_Amount_1_Hr', 'Txn_Count_24_Hr', 'Txn_Amount_24_Hr',
+    ]
+    for label, w in [('5_Min', '5min'), ('24_Hr', '24h')]:
+        for i in df.sample(60, random_state=1).index:
+            row = df.loc[i]
+            past = df[(df['UserID'] == row['UserID']) & (df['Timestamp'] < row['Timestamp'])
+                      & (df['Timestamp'] >= row['Timestamp'] - pd.Timedelta(w))]
+            assert out.loc[i, f'Txn_Count_{label}'] == len(past)
+            assert np.isclose(out.loc[i, f'Txn_Amount_{label}'], past['Amount'].sum())
+
+def test_build_pipeline_uses_configured_windows():
+    pipe = build_pipeline(velocity_windows=('10min',))
+    assert pipe.named_steps['features'].velocity_windows == ('10min',)
+    numeric = pipe.named_steps['preprocess'].transformers[0][2]
+    assert numeric[-2:] == ['Txn_Count_10_Min', 'Txn_Amount_10_Min']
+
+@pytest.mark.parametrize('dtypes', [None, INGEST_DTYPES])
+def test_feature_engineer_matches_frozen_outputs(dtypes):
+    # data/features_dummy_train.csv is the pre-vectorisation FeatureEngineer's output on
+    # dummy_train.csv plus 30 same-user, same-second twins, shuffled. Ties keep input
+    # order: the old per-user category sort was an unstable quicksort, so it was
+    # frozen with kind='stable' to match the order the rest of its features used.
+    frozen = pd.read_csv(Path(__file__).parent / 'data' / 'features_dummy_train.csv', dtype=dtypes)
+    x = frozen[['Timestamp', 'UserID', 'Amount', 'City', 'Category']]
+    expected = frozen.drop(columns=['Timestamp', 'UserID'])
+    out = FeatureEngineer(velocity_windows=('30min',)).transform(x)[expected.columns]
+    for col in ('City', 'Category'):
+        out[col], expected[col] = out[col].astype(str), expected[col].astype(str)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False, rtol=1e-6)
+
+@patch('main.load_pipeline')
 @patch('main.MODEL_PATH')
 def test_predict_endpoint(mock_path, mock_load):
     # Mock model
@@ -80,9 +168,10 @@ def test_predict_endpoint(mock_path, mock_load):
         assert data['status'] == 'Safe'
         assert data['is_fraud'] == False
         
-@patch('main.joblib.load')
+@patch('main.current_model_version', return_value='test-version')
+@patch('main.load_pipeline')
 @patch('main.MODEL_PATH')
-def test_upload_endpoint(mock_path, mock_load):
+def test_upload_endpoint(mock_path, mock_load, mock_version):
     # Mock model
     mock_pipeline = MagicMock()
     # Mock predict for batch of 2 rows
@@ -0,0 +1,172 @@
+import asyncio
+import socketserver
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+
+import main
+import notifications
+from database import SessionLocal
+from main import app
+from models import Base, Transaction
+
+client = TestClient(app)
+PREFIX = f"notify-{uuid.uuid4().hex[:8]}-"
+
+
+class _SmtpSink(socketserver.StreamRequestHandler):
+    # Just enough SMTP to accept messages from smtplib
+    def handle(self):
+        self.wfile.write(b"220 sink\r\n")
+        data = False
+        lines = []
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if data:
+                if line == ".":
+                    self.server.messages.append("\n".join(lines))
+                    lines, data = [], False
+                    self.wfile.write(b"250 OK\r\n")
+                else:
+                    lines.append(line)
+                continue
+            cmd = line.split(" ", 1)[0].upper()
+            if cmd == "DATA":
+                data = True
+                self.wfile.write(b"354 go\r\n")
+            elif cmd == "QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+@pytest.fixture
+def smtp_sink():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpSink)
+    server.messages = []
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _seed_flagged(Session=SessionLocal):
+    ids = []
+    with Session() as db:
+        for i in range(6):
+            tid = str(uuid.uuid4())
+            ids.append(tid)
+            db.add(Transaction(
+                id=tid, timestamp=datetime(2022, 1, 1) + timedelta(minutes=i), amount=10.0 + i,
+                user_id=PREFIX + "u", city="Pune", category="Food", risk_score=90, status="Suspicious",
+                flag_type='[{"type": "Velocity", "reason": "x"}]', flag_reason=None,
+                is_training_data=False, notification_sent=False,
+            ))
+        db.commit()
+    return ids
+
+
+@pytest.fixture
+def flagged_ids():
+    yield _seed_flagged()
+    with SessionLocal() as db:
+        db.execute(delete(Transaction).where(Transaction.user_id.like(PREFIX + "%")))
+        db.commit()
+
+
+def _sent_flags(ids, Session=SessionLocal):
+    with Session() as db:
+        return [bool(v) for v in db.scalars(select(Transaction.notification_sent).where(Transaction.id.in_(ids)))]
+
+
+def test_dispatcher_coalesces_per_recipient_and_marks_sent(flagged_ids):
+    transport = notifications.MemoryTransport()
+    d = notifications.NotificationDispatcher(transport, rate_per_sec=0, window_sec=0.05)
+
+    async def run():
+        d.start()
+        d.enqueue("a@x", flagged_ids[:4])
+        d.enqueue("b@x", flagged_ids[4:])
+        d.enqueue("a@x", flagged_ids[:2])  # duplicates coalesce
+        await d.stop(drain=True)
+
+    asyncio.run(run())
+    by_recipient = {m.recipient: m for m in transport.sent}
+    assert set(by_recipient) == {"a@x", "b@x"}
+    assert len(by_recipient["a@x"].transaction_ids) == 4
+    assert "Velocity" in by_recipient["a@x"].body
+    assert all(_sent_flags(flagged_ids))
+
+
+def test_smtp_transport_delivers_to_sink(flagged_ids, smtp_sink):
+    transport = notifications.SmtpTransport("127.0.0.1", smtp_sink.server_address[1], "alerts@test")
+    d = notifications.NotificationDispatcher(transport, rate_per_sec=0, window_sec=0)
+    d.enqueue("ops@test", flagged_ids)
+    asyncio.run(d.flush())
+    assert len(smtp_sink.messages) == 1
+    assert "6 flagged transactions" in smtp_sink.messages[0]
+
+
+def test_failed_send_is_retried_then_dropped(flagged_ids):
+    class Failing:
+        calls = 0
+
+        async def send(self, digest):
+            Failing.calls += 1
+            raise ConnectionError("down")
+
+    d = notifications.NotificationDispatcher(Failing(), rate_per_sec=0, window_sec=0)
+    d.enqueue("a@x", flagged_ids[:1])
+    for _ in range(notifications.MAX_ATTEMPTS + 1):
+        asyncio.run(d.flush())
+    assert Failing.calls == notifications.MAX_ATTEMPTS
+    assert d.pending == 0
+    assert not any(_sent_flags(flagged_ids[:1]))
+
+
+def test_rate_limiter_bounds_send_rate():
+    limiter = notifications.RateLimiter(rate=20, burst=1)
+
+    async def run():
+        t0 = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - t0
+
+    assert asyncio.run(run()) >= 0.14
+
+
+def test_bulk_notify_endpoint_queues_by_status(tmp_path, monkeypatch):
+    transport = notifications.MemoryTransport()
+    d = notifications.NotificationDispatcher(transport, rate_per_sec=0, window_sec=0)
+    monkeypatch.setattr(notifications, "dispatcher", d)
+    login = client.post("/auth/login", json={"email": "analyst@anomalyse.bank", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    # A status filter matches every unsent flagged row, so the rows it marks sent
+    # must all be this test's: the endpoint and dispatcher use a throwaway database
+    engine = create_engine(f"sqlite:///{tmp_path / 'notify.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(main, "SessionLocal", Session)
+    monkeypatch.setattr(notifications, "SessionLocal", Session)
+    flagged_ids = _seed_flagged(Session)
+
+    res = client.post("/transactions/notify/bulk", json={"ids": flagged_ids[:3] + ["nope"], "email": "lead@x"}, headers=headers)
+    assert res.status_code == 202
+    assert res.json()["queued"] == 3 and res.json()["missing"] == ["nope"]
+
+    res = client.post("/transactions/notify/bulk", json={"status": ["Suspicious"], "email": "lead@x"}, headers=headers)
+    assert res.json()["queued"] == 3  # the seeded rows not queued above
+    assert client.post("/transactions/notify/bulk", json={}, headers=headers).status_code == 400
+
+    asyncio.run(d.flush())
+    assert len(transport.sent) == 1
+    assert _sent_flags(flagged_ids, Session) == [True] * 6
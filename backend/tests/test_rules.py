@@ -0,0 +1,70 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from rules import DEFAULT_RULES, RuleEngine, load_rules
+
+
+def _legacy_rule_reasons(features_row, amount):
+    # Row-at-a-time implementation the engine replaced
+    flags = []
+    gv = float(features_row.get('Geo_Velocity_Check', 0))
+    z = float(features_row.get('Amount_Z_Score', 0))
+    tsl = float(features_row.get('Time_Since_Last_TXN_Sec', 0))
+    if gv > 1.0:
+        flags.append({"type": "Fast Location", "reason": f"Geospatial anomaly: travel too fast (ratio {gv:.2f})."})
+    if z >= 3.0 or amount >= 100000:
+        flags.append({"type": "High Value", "reason": f"Amount deviation detected (z-score {z:.2f})."})
+    if (tsl > 0.0) and (tsl < 10.0):
+        flags.append({"type": "Velocity", "reason": f"last gap {int(tsl)}s between consecutive transactions."})
+    return flags
+
+
+def _random_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Amount': rng.choice([50.0, 2500.0, 100000.0, 250000.0], n),
+        'Amount_Z_Score': rng.normal(0, 2, n),
+        'Geo_Velocity_Check': rng.exponential(0.7, n),
+        'Time_Since_Last_TXN_Sec': rng.choice([0.0, 3.7, 9.99, 10.0, 600.0], n),
+        'Txn_Count_30_Min': rng.integers(0, 5, n),
+    })
+
+
+def test_engine_matches_legacy_flags():
+    frame = _random_frame(5000)
+    flags = RuleEngine().flags(frame)
+    for row, got in zip(frame.to_dict('records'), flags):
+        assert got == _legacy_rule_reasons(row, row['Amount'])
+
+
+def test_bitmask_and_masks_agree():
+    frame = _random_frame(1000, seed=1)
+    engine = RuleEngine()
+    bits = engine.evaluate(frame)
+    masks = engine.masks(frame, bits)
+    np.testing.assert_array_equal(masks['Fast Location'], frame['Geo_Velocity_Check'].to_numpy() > 1.0)
+    assert bits.dtype == np.uint32
+
+
+def test_rules_load_from_config(tmp_path):
+    custom = json.loads(json.dumps(DEFAULT_RULES))
+    custom[1]['any'][1][0]['value'] = 1000
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'rules': custom}))
+    engine = RuleEngine(load_rules(str(path)))
+    frame = {'Amount': np.array([2500.0]), 'Amount_Z_Score': np.array([0.0])}
+    assert [f['type'] for f in engine.flags(frame)[0]] == ['High Value']
+
+
+def test_million_row_pass_is_fast():
+    frame = {k: v.to_numpy() for k, v in _random_frame(1_000_000, seed=2).items()}
+    engine = RuleEngine()
+    engine.evaluate(frame)
+    t0 = time.perf_counter()
+    engine.evaluate(frame)
+    elapsed = time.perf_counter() - t0
+    print(f"1M-row rule pass: {elapsed * 1000:.1f} ms")
+    assert elapsed < 0.5
@@ -0,0 +1,100 @@
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+import serve
+
+BACKEND_DIR = Path(__file__).parent.parent
+linux_only = pytest.mark.skipif(not Path("/proc/self/smaps").exists(), reason="needs /proc smaps")
+
+
+def test_parse_smaps_sums_mappings():
+    text = (
+        "55d0-55d1 r--p 00000000 08:01 1 /usr/bin/python\n"
+        "Rss:                 100 kB\nPss:                  40 kB\n"
+        "Shared_Clean:         80 kB\nShared_Dirty:          0 kB\nPrivate_Clean:        20 kB\n"
+        "7f00-7f01 rw-p 00000000 00:00 0\n"
+        "Rss:                  50 kB\nPss:                  50 kB\nPrivate_Dirty:        50 kB\n"
+    )
+    m = serve.parse_smaps(text)
+    assert m["Rss"] == 150 and m["Pss"] == 90
+    assert m["Shared_Clean"] == 80 and m["Private_Clean"] + m["Private_Dirty"] == 70
+
+
+@linux_only
+def test_memory_report_for_this_process():
+    (row,) = serve.memory_report([os.getpid(), 2 ** 22 + 7])  # the second pid does not exist
+    assert row["pid"] == os.getpid()
+    assert row["rssKb"] > 0
+    assert 0.0 <= row["sharedRatio"] <= 1.0
+
+
+def _get(port, path="/health/app"):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as res:
+        return res.status
+
+
+@linux_only
+def test_prefork_reload_rolls_workers_without_downtime():
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", "0", "--workers", "2", "--stats-interval", "0",
+         "--graceful-timeout", "5", "--log-level", "warning"],
+        cwd=BACKEND_DIR, stderr=subprocess.PIPE, text=True,
+    )
+    lines = []
+    reader = threading.Thread(target=lambda: lines.extend(iter(proc.stderr.readline, "")), daemon=True)
+    reader.start()
+
+    def wait_for(pattern, count=1, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            found = [m for line in list(lines) for m in re.findall(pattern, line)]
+            if len(found) >= count:
+                return found
+            time.sleep(0.1)
+        raise AssertionError(f"{pattern!r} not seen:\n{''.join(lines)}")
+
+    try:
+        port = int(wait_for(r"listening on http://127\.0\.0\.1:(\d+)")[0])
+        first = set(wait_for(r"worker started pid=(\d+)", 2))
+        deadline = time.time() + 30
+        while True:
+            try:
+                assert _get(port) == 200
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+
+        failures = []
+        stop = threading.Event()
+
+        def hammer():
+            while not stop.is_set():
+                try:
+                    _get(port)
+                except OSError as e:
+                    failures.append(e)
+
+        t = threading.Thread(target=hammer)
+        t.start()
+        proc.send_signal(signal.SIGHUP)
+        wait_for(r"workers now serving model")
+        stop.set()
+        t.join()
+        started = set(wait_for(r"worker started pid=(\d+)", 4))
+        assert failures == []
+        assert len(started - first) == 2
+        assert sorted(wait_for(r"worker (\d+) retired", 2)) == sorted(first)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=30) == 0
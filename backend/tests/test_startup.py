@@ -0,0 +1,34 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+HEAVY_MODULES = ["pandas", "sklearn", "joblib", "fpdf"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    pass
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t2 - t1,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def test_import_is_lazy_and_fast():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"import main: {report['import_s'] * 1000:.1f} ms, lifespan startup: {report['startup_s'] * 1000:.1f} ms")
+    assert report["loaded"] == []
+    assert report["import_s"] < 5.0
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from model import train
+
+TRAIN_CSV = Path(__file__).parent.parent / "dummy_train.csv"
+
+
+def test_select_trial_prefers_faster_model_within_tolerance():
+    trials = [
+        {"f1_macro": 0.80, "single_row_latency_ms": 9.0},
+        {"f1_macro": 0.795, "single_row_latency_ms": 2.0},
+        {"f1_macro": 0.60, "single_row_latency_ms": 0.5},
+    ]
+    assert train.select_trial(trials, "f1_macro", 0.01, None) is trials[1]
+    assert train.select_trial(trials, "f1_macro", 0.0, None) is trials[0]
+    assert train.select_trial(trials, "f1_macro", 0.01, max_latency_ms=1.0) is trials[2]
+
+
+def test_search_cli_reports_trials_and_exports(tmp_path):
+    out = tmp_path / "model.pkl"
+    report_path = tmp_path / "report.json"
+    grid = {"clf__n_estimators": [5, 10], "clf__max_depth": [4]}
+    train.main([
+        "--input", str(TRAIN_CSV), "--output", str(out), "--grid", json.dumps(grid),
+        "--folds", "2", "--workers", "2", "--cache-dir", str(tmp_path / "cache"),
+        "--report", str(report_path),
+    ])
+    report = json.loads(report_path.read_text())
+    assert len(report["trials"]) == 2
+    for t in report["trials"]:
+        for key in ("fit_time_s", "latency_ms_per_row", "single_row_latency_ms", "accuracy", "f1_macro"):
+            assert key in t
+    pipe = joblib.load(out)
+    assert pipe.named_steps["clf"].n_estimators == report["chosen"]["params"]["clf__n_estimators"]
+    sample = pd.read_csv(TRAIN_CSV).head(3).drop(columns=["Fraud_Type"])
+    assert len(pipe.predict(sample)) == 3
+
+
+def test_backend_option_trains_and_exports_that_classifier(tmp_path):
+    out = tmp_path / "model.pkl"
+    grid = {"clf__max_iter": [20], "clf__max_leaf_nodes": [7, 15]}
+    report = train.main([
+        "--input", str(TRAIN_CSV), "--output", str(out), "--grid", json.dumps(grid), "--backend", "hgb",
+        "--folds", "2", "--workers", "1", "--cache-dir", str(tmp_path / "cache"),
+    ])
+    assert report["backend"] == "hgb" and report["export"]["backend"] == "hgb"
+    clf = joblib.load(out).named_steps["clf"]
+    assert type(clf).__name__ == "HistGradientBoostingClassifier"
+    assert clf.max_leaf_nodes == report["chosen"]["params"]["clf__max_leaf_nodes"]
+    assert set(train.DEFAULT_GRIDS) == {"rf", "hgb", "logreg"}
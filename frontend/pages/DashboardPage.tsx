@@ -5,6 +5,7 @@ import {
 } from 'recharts';
 import { AlertTriangle, TrendingUp, Activity, Users, CreditCard, DollarSign } from 'lucide-react';
 import { dashboardService } from '../services/dashboardService';
+import { FALLBACK_POLL_MS, transactionService } from '../services/transactionService';
 import { FraudMetrics } from '../types';
 
 const DashboardPage: React.FC = () => {
@@ -29,8 +30,22 @@ const DashboardPage: React.FC = () => {
 
   useEffect(() => {
     fetchMetrics();
-    const interval = setInterval(fetchMetrics, 30000); // Poll every 30s
-    return () => clearInterval(interval);
+    // Refresh when new rows are scored (coalescing bursts), after a reconnect, and
+    // on a slow timer for changes the feed does not carry
+    let pending: ReturnType<typeof setTimeout> | null = null;
+    const interval = setInterval(fetchMetrics, FALLBACK_POLL_MS);
+    const unsubscribe = transactionService.subscribe((event) => {
+      if (event.type !== 'transactions' || pending) return;
+      pending = setTimeout(() => {
+        pending = null;
+        fetchMetrics();
+      }, 300);
+    }, fetchMetrics);
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+      if (pending) clearTimeout(pending);
+    };
   }, []);
 
   if (loading && !metrics) {
@@ -45,7 +45,7 @@ const FraudTransactionsPage: React.FC = () => {
     setSending(true);
     try {
       await transactionService.notifyTransaction(selectedTxn.id, emailTo);
-      setNotificationSuccess(`Email successfully sent to ${emailTo}`);
+      setNotificationSuccess(`Email queued for ${emailTo}`);
 
       // Update local state to show 'Sent' status
       setTransactions(prev => prev.map(t =>
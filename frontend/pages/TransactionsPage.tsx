@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useMemo } from 'react';
-import { transactionService } from '../services/transactionService';
+import { FALLBACK_POLL_MS, transactionService } from '../services/transactionService';
 import { Transaction } from '../types';
 import { sortTransactions } from '../utils/sorting';
 import { AlertCircle, CheckCircle, Search, Trash2, Filter, Flag, ArrowUpDown, Zap, DollarSign, AlertTriangle, Activity, Tag, Cpu } from 'lucide-react';
@@ -98,8 +98,25 @@ const TransactionsPage: React.FC = () => {
       }
     };
     fetchTransactions();
-    const interval = setInterval(fetchTransactions, 5000);
-    return () => clearInterval(interval);
+    // New rows from this worker's uploads arrive over the live feed; the slow poll
+    // and the refetch after a reconnect pick up everything else
+    const interval = setInterval(fetchTransactions, FALLBACK_POLL_MS);
+    const unsubscribe = transactionService.subscribe((event) => {
+      if (event.type !== 'transactions') return;
+      if (event.truncated) {
+        fetchTransactions();
+        return;
+      }
+      setTransactions(prev => {
+        const known = new Set(prev.map(t => t.id));
+        const fresh = event.transactions.filter(t => !known.has(t.id));
+        return fresh.length ? sortTransactions([...prev, ...fresh]) : prev;
+      });
+    }, fetchTransactions);
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+    };
   }, []);
 
   const uniqueReasons = useMemo(() => {
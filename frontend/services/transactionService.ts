@@ -1,4 +1,4 @@
-import { Transaction } from '../types';
+import { Transaction, TransactionStreamEvent } from '../types';
 import { authService } from './authService';
 import { API_CONFIG } from './config';
 
@@ -7,6 +7,22 @@ import { API_CONFIG } from './config';
 
 
 
+export const FALLBACK_POLL_MS = 60000;
+const STREAM_RETRY_MS = 5000;
+
+// Status of a plain request to the stream URL (0 when unreachable); the body is not read
+const streamStatus = async (url: string): Promise<number> => {
+  const controller = new AbortController();
+  try {
+    const resp = await fetch(url, { signal: controller.signal });
+    return resp.status;
+  } catch {
+    return 0;
+  } finally {
+    controller.abort();
+  }
+};
+
 export const transactionService = {
   getTransactions: async (): Promise<Transaction[]> => {
     const token = localStorage.getItem('anomalyse_token');
@@ -36,6 +52,26 @@ export const transactionService = {
     if (!resp.ok) throw new Error('Failed to trigger notification');
     return await resp.json();
   },
+  // Queue one digest per recipient for many rows: explicit ids, or every row with
+  // the given statuses that has not been notified yet
+  notifyBulk: async (
+    request: { ids?: string[]; status?: string[]; email?: string }
+  ): Promise<{ success: boolean; queued: number; matched: number; missing: string[] }> => {
+    const token = localStorage.getItem('anomalyse_token');
+    const resp = await fetch(`${API_CONFIG.BASE_URL}/transactions/notify/bulk`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': token ? `Bearer ${token}` : ''
+      },
+      body: JSON.stringify(request)
+    });
+    if (!resp.ok) {
+      if (resp.status === 401) authService.logout();
+      throw new Error('Failed to queue notifications');
+    }
+    return await resp.json();
+  },
   clearTransactions: async (): Promise<{ success: boolean; deleted: number }> => {
     const token = localStorage.getItem('anomalyse_token');
     const resp = await fetch(`${API_CONFIG.BASE_URL}/transactions/clear`, {
@@ -52,6 +88,55 @@ export const transactionService = {
     }
     return await resp.json();
   },
+  // Live feed of newly scored transactions (server-sent events). Returns a function
+  // that closes the stream. The feed only carries rows scored by the API worker the
+  // page is connected to, so pages still poll slowly (FALLBACK_POLL_MS) for ingest,
+  // re-scores, deletes and other workers. onResync runs after every reconnect, since
+  // events sent while the stream was down are lost. When the browser gives up on the
+  // stream (a non-200 reply), the token is checked: expired or rejected sends the
+  // user to login, anything else retries after STREAM_RETRY_MS.
+  subscribe: (
+    onEvent: (event: TransactionStreamEvent) => void,
+    onResync?: () => void
+  ): (() => void) => {
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | null = null;
+    let opened = false;
+    let closed = false;
+    const connect = () => {
+      const token = localStorage.getItem('anomalyse_token') || '';
+      const url = `${API_CONFIG.BASE_URL}/transactions/stream?token=${encodeURIComponent(token)}`;
+      const current = new EventSource(url);
+      source = current;
+      const handle = (type: TransactionStreamEvent['type']) => (e: MessageEvent) => {
+        onEvent({ type, ...JSON.parse(e.data) });
+      };
+      current.addEventListener('transactions', handle('transactions') as EventListener);
+      current.addEventListener('prediction', handle('prediction') as EventListener);
+      current.addEventListener('open', () => {
+        if (opened) onResync?.();
+        opened = true;
+      });
+      current.addEventListener('error', async () => {
+        // CONNECTING means the browser is already reconnecting; 'open' will resync
+        if (closed || current.readyState !== EventSource.CLOSED) return;
+        const status = await streamStatus(url);
+        if (closed) return;
+        if (status === 401 || status === 403) {
+          closed = true;
+          authService.logout();
+          return;
+        }
+        retry = setTimeout(connect, STREAM_RETRY_MS);
+      });
+    };
+    connect();
+    return () => {
+      closed = true;
+      source?.close();
+      if (retry) clearTimeout(retry);
+    };
+  },
   downloadFraudReport: async (): Promise<void> => {
     const token = localStorage.getItem('anomalyse_token');
     const resp = await fetch(`${API_CONFIG.BASE_URL}/reports/fraud.pdf`, {
@@ -1,10 +1,11 @@
 import { API_CONFIG } from './config';
+import { DuplicateCounts, UploadBatch } from '../types';
 
 // Future Backend API Contracts:
 // POST /api/v1/transactions/upload
 
 export const uploadService = {
-  uploadCSV: async (file: File): Promise<{ success: boolean; message: string; rowsProcessed: number }> => {
+  uploadCSV: async (file: File): Promise<{ success: boolean; message: string; rowsProcessed: number; batchId: string | null; duplicates?: DuplicateCounts }> => {
     const token = localStorage.getItem('anomalyse_token');
     console.log('Token from localStorage in uploadService:', token);
     const formData = new FormData();
@@ -22,5 +23,31 @@ export const uploadService = {
       throw new Error(msg || 'Upload failed');
     }
     return await resp.json();
+  },
+  listBatches: async (): Promise<UploadBatch[]> => {
+    const token = localStorage.getItem('anomalyse_token');
+    const resp = await fetch(`${API_CONFIG.BASE_URL}/batches`, {
+      headers: { 'Authorization': token ? `Bearer ${token}` : '' }
+    });
+    if (!resp.ok) throw new Error('Failed to load upload batches');
+    return await resp.json();
+  },
+  deleteBatch: async (batchId: string): Promise<{ success: boolean; deleted: number }> => {
+    const token = localStorage.getItem('anomalyse_token');
+    const resp = await fetch(`${API_CONFIG.BASE_URL}/batches/${encodeURIComponent(batchId)}`, {
+      method: 'DELETE',
+      headers: { 'Authorization': token ? `Bearer ${token}` : '' }
+    });
+    if (!resp.ok) throw new Error('Failed to delete batch');
+    return await resp.json();
+  },
+  rescoreBatch: async (batchId: string): Promise<{ success: boolean; rowsRescored: number; flagged: number }> => {
+    const token = localStorage.getItem('anomalyse_token');
+    const resp = await fetch(`${API_CONFIG.BASE_URL}/batches/${encodeURIComponent(batchId)}/rescore`, {
+      method: 'POST',
+      headers: { 'Authorization': token ? `Bearer ${token}` : '' }
+    });
+    if (!resp.ok) throw new Error('Failed to re-score batch');
+    return await resp.json();
   }
 };
@@ -22,6 +22,56 @@ export interface Transaction {
   time_since_last_txn?: number;
   distance_km?: number;
   notification_sent?: boolean;
+  explanation?: FeatureExplanation | null;
+}
+
+// Per-feature risk contributions: base + sum(contribution) = risk score
+export interface FeatureExplanation {
+  base: number;
+  contributions: Array<{ feature: string; value: string | number | null; contribution: number }>;
+}
+
+export type TransactionStreamEvent =
+  | {
+      type: 'transactions';
+      transactions: Transaction[];
+      // More rows were stored than sent; refetch /transactions for the rest
+      truncated: boolean;
+      metrics: { totalTransactions: number; flaggedTransactions: number; amount: number };
+    }
+  | {
+      type: 'prediction';
+      timestamp: string;
+      amount: number;
+      user_id: string;
+      city: string;
+      category: string;
+      is_fraud: boolean;
+      risk_score: number;
+      status: string;
+      flags: Array<{ type: string; reason: string }>;
+    };
+
+export interface DuplicateCounts {
+  mode: 'skip' | 'flag' | 'replace';
+  inFile: number;
+  existing: number;
+  skipped: number;
+  flagged: number;
+  replaced: number;
+}
+
+export interface UploadBatch {
+  id: string;
+  filename: string | null;
+  uploadedBy: string | null;
+  createdAt: string | null;
+  modelVersion: string | null;
+  rows: number;
+  flagged: number;
+  avgRiskScore: number;
+  firstTimestamp: string | null;
+  lastTimestamp: string | null;
 }
 
 export interface FraudMetrics {
@@ -36,6 +86,7 @@ export interface FraudMetrics {
   mostActiveUser?: string | null;
   fraudTypeCounts?: { [key: string]: number };
   topUsers?: Array<{ user_id: string; count: number }>;
+  topCities?: Array<{ city: string; count: number }>;
   avgAmountFraud?: number;
   avgAmountSafe?: number;
 }